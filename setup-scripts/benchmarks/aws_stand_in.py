@@ -0,0 +1,400 @@
+import contextlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from typing import Any, cast
+from urllib.parse import parse_qs, quote, urlsplit
+from xml.sax.saxutils import escape
+
+import boto3
+from botocore.awsrequest import AWSPreparedRequest, AWSResponse
+from botocore.compat import HTTPHeaders
+
+from utils import aws_clients
+
+STAND_IN_REGION = "us-west-2"
+STAND_IN_ACCESS_KEY_ID = "AKIASTANDINMANAGEMENT"
+ORGANIZATIONS_PAGE_SIZE = 20
+STAND_IN_ROOT_ID = "r-stin"
+STS_NAMESPACE = "https://sts.amazonaws.com/doc/2011-06-15/"
+IAM_NAMESPACE = "https://iam.amazonaws.com/doc/2010-05-08/"
+S3_NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+CREDENTIAL_PATTERN = re.compile(r"Credential=([^/,\s]+)/")
+SSE_ALGORITHM_PATTERN = re.compile(r"<SSEAlgorithm>([^<]+)</SSEAlgorithm>")
+VERSIONING_STATUS_PATTERN = re.compile(r"<Status>([^<]+)</Status>")
+# The error each service returns when it throttles, as (code, HTTP status)
+THROTTLING_ERRORS = {
+  "sts": ("Throttling", 400),
+  "iam": ("Throttling", 400),
+  "organizations": ("TooManyRequestsException", 400),
+  "s3": ("SlowDown", 503),
+}
+
+
+class UnsupportedOperationError(NotImplementedError):
+  def __init__(self, service: str, operation: str) -> None:
+    super().__init__(f"The AWS stand-in does not implement {service}.{operation}")
+
+
+class StandInRawResponse:
+  def __init__(self, body: bytes) -> None:
+    self.body = body
+
+  def stream(self, **_kwargs: Any) -> Iterator[bytes]:
+    yield self.body
+
+
+def aws_response(request: AWSPreparedRequest, status_code: int, body: bytes, content_type: str) -> AWSResponse:
+  headers = HTTPHeaders.from_dict({"Content-Type": content_type, "x-amzn-RequestId": str(uuid.uuid4())})
+  return AWSResponse(request.url, status_code, headers, StandInRawResponse(body))
+
+
+def query_response(request: AWSPreparedRequest, operation: str, namespace: str, result: str = "") -> AWSResponse:
+  result_element = f"<{operation}Result>{result}</{operation}Result>" if result else ""
+  body = (
+    f'<{operation}Response xmlns="{namespace}">{result_element}'
+    f"<ResponseMetadata><RequestId>{uuid.uuid4()}</RequestId></ResponseMetadata></{operation}Response>"
+  )
+  return aws_response(request, 200, body.encode(), "text/xml")
+
+
+def query_error_response(request: AWSPreparedRequest, status_code: int, code: str, message: str) -> AWSResponse:
+  body = (
+    f"<ErrorResponse><Error><Type>Sender</Type><Code>{code}</Code><Message>{escape(message)}</Message></Error>"
+    f"<RequestId>{uuid.uuid4()}</RequestId></ErrorResponse>"
+  )
+  return aws_response(request, status_code, body.encode(), "text/xml")
+
+
+def error_response(request: AWSPreparedRequest, service: str, status_code: int, code: str, message: str) -> AWSResponse:
+  if service == "organizations":
+    body = json.dumps({"__type": code, "Message": message}).encode()
+    return aws_response(request, status_code, body, "application/x-amz-json-1.1")
+  if service == "s3":
+    body = f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>".encode()
+    return aws_response(request, status_code, body, "application/xml")
+  return query_error_response(request, status_code, code, message)
+
+
+def request_access_key(request: AWSPreparedRequest) -> str | None:
+  # Signed headers hold bytes, even though the stubs type them as str
+  authorization = cast("str | bytes", request.headers.get("Authorization", ""))
+  if isinstance(authorization, bytes):
+    authorization = authorization.decode()
+  match = CREDENTIAL_PATTERN.search(authorization)
+  return match.group(1) if match else None
+
+
+def request_body(request: AWSPreparedRequest) -> str:
+  body = request.body
+  if body is None:
+    return ""
+  if isinstance(body, bytes):
+    return body.decode()
+  if isinstance(body, str):
+    return body
+  # Streaming bodies are only used for uploads, which the setup scripts never make
+  return ""
+
+
+def query_params(request: AWSPreparedRequest) -> dict[str, str]:
+  return {key: values[0] for key, values in parse_qs(request_body(request)).items()}
+
+
+def s3_bucket_name(request: AWSPreparedRequest) -> str:
+  url = urlsplit(request.url)
+  host_prefix = (url.hostname or "").split(".s3.", 1)[0]
+  if host_prefix and host_prefix != url.hostname and not host_prefix.startswith("s3"):
+    return host_prefix
+  return url.path.lstrip("/").split("/", 1)[0]
+
+
+def role_element(account_id: str, role_name: str, trust_policy: str | None = None) -> str:
+  created = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+  # IAM returns policy documents as URL-encoded JSON, which botocore decodes
+  trust_policy_element = (
+    f"<AssumeRolePolicyDocument>{quote(trust_policy)}</AssumeRolePolicyDocument>" if trust_policy else ""
+  )
+  return (
+    f"<Role><Path>/</Path><RoleName>{escape(role_name)}</RoleName><RoleId>AROASTANDIN</RoleId>"
+    f"<Arn>arn:aws:iam::{account_id}:role/{escape(role_name)}</Arn><CreateDate>{created}</CreateDate>"
+    f"{trust_policy_element}</Role>"
+  )
+
+
+class AWSStandIn:
+  # Answers STS, IAM, Organizations and S3 requests in process, after the client has serialized and
+  # signed them, so botocore's retry handling and response parsing run exactly as against AWS.
+  def __init__(  # noqa: PLR0913
+    self,
+    org_accounts: dict[str, str],
+    management_account_id: str,
+    *,
+    latency_seconds: float = 0.0,
+    jitter_seconds: float = 0.0,
+    throttle_rate: float = 0.0,
+    seed: int | None = None,
+    organizational_units: dict[str, list[str]] | None = None,
+  ) -> None:
+    self.org_accounts = dict(org_accounts)
+    # Accounts sit directly under the root unless they are placed in one of the OUs, which are root children
+    self.organizational_units = {
+      f"ou-stin-{position:08d}": name for position, name in enumerate(organizational_units or {})
+    }
+    self.account_parents = dict.fromkeys(self.org_accounts, STAND_IN_ROOT_ID)
+    for unit_id, name in self.organizational_units.items():
+      for account_name in (organizational_units or {})[name]:
+        self.account_parents[account_name] = unit_id
+    self.management_account_id = management_account_id
+    self.latency_seconds = latency_seconds
+    self.jitter_seconds = jitter_seconds
+    self.throttle_rate = throttle_rate
+    self.calls: Counter[str] = Counter()
+    self.throttled_calls: Counter[str] = Counter()
+    # Trust and inline policy documents are kept as the JSON strings they were sent as
+    self.roles: dict[str, dict[str, str]] = {}
+    self.role_policies: dict[tuple[str, str], dict[str, str]] = {}
+    self.buckets: dict[str, dict[str, str | None]] = {}
+    self._access_keys = {STAND_IN_ACCESS_KEY_ID: management_account_id}
+    self._random = random.Random(seed)
+    self._lock = threading.Lock()
+
+  def session(self) -> boto3.Session:
+    session = boto3.Session(
+      aws_access_key_id=STAND_IN_ACCESS_KEY_ID,
+      aws_secret_access_key="stand-in-secret",
+      region_name=STAND_IN_REGION,
+    )
+    # A before-send handler that returns a response replaces the HTTP request
+    session.events.register("before-send", self.handle_request)  # type: ignore[arg-type]
+    return session
+
+  def handle_request(self, request: AWSPreparedRequest, event_name: str, **_kwargs: Any) -> AWSResponse:
+    _, service, operation = event_name.split(".", 2)
+    with self._lock:
+      self.calls[f"{service}.{operation}"] += 1
+      delay = self.latency_seconds + self._random.uniform(0, self.jitter_seconds)
+      throttled = service in THROTTLING_ERRORS and self._random.random() < self.throttle_rate
+      if throttled:
+        self.throttled_calls[f"{service}.{operation}"] += 1
+
+    time.sleep(delay)
+    if throttled:
+      code, status_code = THROTTLING_ERRORS[service]
+      return error_response(request, service, status_code, code, "Rate exceeded")
+
+    handler = getattr(self, f"handle_{service}_{operation}", None)
+    if handler is None:
+      raise UnsupportedOperationError(service, operation)
+    response: AWSResponse = handler(request)
+    return response
+
+  def caller_account_id(self, request: AWSPreparedRequest) -> str:
+    access_key = request_access_key(request)
+    with self._lock:
+      return self._access_keys.get(access_key or "", self.management_account_id)
+
+  def handle_sts_GetCallerIdentity(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    account_id = self.caller_account_id(request)
+    result = (
+      f"<Arn>arn:aws:iam::{account_id}:user/stand-in</Arn><UserId>AIDASTANDIN</UserId><Account>{account_id}</Account>"
+    )
+    return query_response(request, "GetCallerIdentity", STS_NAMESPACE, result)
+
+  def handle_sts_AssumeRole(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    role_arn = query_params(request)["RoleArn"]
+    account_id = role_arn.split(":")[4]
+    access_key = f"ASIA{uuid.uuid4().hex[:16].upper()}"
+    with self._lock:
+      self._access_keys[access_key] = account_id
+
+    expiration = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    result = (
+      f"<Credentials><AccessKeyId>{access_key}</AccessKeyId><SecretAccessKey>stand-in-secret</SecretAccessKey>"
+      f"<SessionToken>stand-in-token</SessionToken><Expiration>{expiration}</Expiration></Credentials>"
+      f"<AssumedRoleUser><AssumedRoleId>AROASTANDIN:session</AssumedRoleId><Arn>{escape(role_arn)}</Arn>"
+      "</AssumedRoleUser>"
+    )
+    return query_response(request, "AssumeRole", STS_NAMESPACE, result)
+
+  def handle_iam_CreateRole(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    account_id = self.caller_account_id(request)
+    params = query_params(request)
+    role_name = params["RoleName"]
+    with self._lock:
+      roles = self.roles.setdefault(account_id, {})
+      if role_name in roles:
+        return error_response(request, "iam", 409, "EntityAlreadyExists", f"Role with name {role_name} already exists.")
+      roles[role_name] = params["AssumeRolePolicyDocument"]
+    return query_response(request, "CreateRole", IAM_NAMESPACE, role_element(account_id, role_name))
+
+  def handle_iam_GetRole(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    account_id = self.caller_account_id(request)
+    role_name = query_params(request)["RoleName"]
+    with self._lock:
+      trust_policy = self.roles.get(account_id, {}).get(role_name)
+    if trust_policy is None:
+      return error_response(request, "iam", 404, "NoSuchEntity", f"The role with name {role_name} cannot be found.")
+    return query_response(request, "GetRole", IAM_NAMESPACE, role_element(account_id, role_name, trust_policy))
+
+  def handle_iam_UpdateAssumeRolePolicy(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    account_id = self.caller_account_id(request)
+    params = query_params(request)
+    with self._lock:
+      roles = self.roles.get(account_id, {})
+      if params["RoleName"] not in roles:
+        return error_response(request, "iam", 404, "NoSuchEntity", f"The role {params['RoleName']} cannot be found.")
+      roles[params["RoleName"]] = params["PolicyDocument"]
+    return query_response(request, "UpdateAssumeRolePolicy", IAM_NAMESPACE)
+
+  def handle_iam_PutRolePolicy(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    account_id = self.caller_account_id(request)
+    params = query_params(request)
+    with self._lock:
+      policies = self.role_policies.setdefault((account_id, params["RoleName"]), {})
+      policies[params["PolicyName"]] = params["PolicyDocument"]
+    return query_response(request, "PutRolePolicy", IAM_NAMESPACE)
+
+  def handle_iam_GetRolePolicy(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    account_id = self.caller_account_id(request)
+    params = query_params(request)
+    with self._lock:
+      document = self.role_policies.get((account_id, params["RoleName"]), {}).get(params["PolicyName"])
+    if document is None:
+      return error_response(
+        request, "iam", 404, "NoSuchEntity", f"The role policy with name {params['PolicyName']} cannot be found."
+      )
+    result = (
+      f"<RoleName>{escape(params['RoleName'])}</RoleName><PolicyName>{escape(params['PolicyName'])}</PolicyName>"
+      f"<PolicyDocument>{quote(document)}</PolicyDocument>"
+    )
+    return query_response(request, "GetRolePolicy", IAM_NAMESPACE, result)
+
+  def organizations_account(self, name: str) -> dict[str, str]:
+    account_id = self.org_accounts[name]
+    return {
+      "Id": account_id,
+      "Name": name,
+      "Arn": f"arn:aws:organizations::{self.management_account_id}:account/o-standin/{account_id}",
+      "Email": f"{name}@example.com",
+      "Status": "ACTIVE",
+    }
+
+  def organizations_page(self, request: AWSPreparedRequest, key: str, items: list[dict[str, Any]]) -> AWSResponse:
+    body = json.loads(request_body(request) or "{}")
+    start = int(body.get("NextToken", 0))
+    response: dict[str, Any] = {key: items[start : start + ORGANIZATIONS_PAGE_SIZE]}
+    if start + ORGANIZATIONS_PAGE_SIZE < len(items):
+      response["NextToken"] = str(start + ORGANIZATIONS_PAGE_SIZE)
+    return aws_response(request, 200, json.dumps(response).encode(), "application/x-amz-json-1.1")
+
+  def handle_organizations_ListAccounts(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    return self.organizations_page(
+      request, "Accounts", [self.organizations_account(name) for name in self.org_accounts]
+    )
+
+  def handle_organizations_ListRoots(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    root = {
+      "Id": STAND_IN_ROOT_ID,
+      "Arn": f"arn:aws:organizations::{self.management_account_id}:root/o-standin/{STAND_IN_ROOT_ID}",
+      "Name": "Root",
+      "PolicyTypes": [],
+    }
+    return self.organizations_page(request, "Roots", [root])
+
+  def handle_organizations_ListAccountsForParent(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    parent_id = json.loads(request_body(request))["ParentId"]
+    accounts = [
+      self.organizations_account(name)
+      for name, account_parent in self.account_parents.items()
+      if account_parent == parent_id
+    ]
+    return self.organizations_page(request, "Accounts", accounts)
+
+  def handle_organizations_ListOrganizationalUnitsForParent(  # noqa: N802
+    self, request: AWSPreparedRequest
+  ) -> AWSResponse:
+    parent_id = json.loads(request_body(request))["ParentId"]
+    units = (
+      [
+        {
+          "Id": unit_id,
+          "Arn": f"arn:aws:organizations::{self.management_account_id}:ou/o-standin/{unit_id}",
+          "Name": name,
+        }
+        for unit_id, name in self.organizational_units.items()
+      ]
+      if parent_id == STAND_IN_ROOT_ID
+      else []
+    )
+    return self.organizations_page(request, "OrganizationalUnits", units)
+
+  def handle_s3_CreateBucket(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    bucket_name = s3_bucket_name(request)
+    with self._lock:
+      if bucket_name in self.buckets:
+        return error_response(request, "s3", 409, "BucketAlreadyOwnedByYou", f"Bucket {bucket_name} already exists")
+      # New buckets get SSE-S3 default encryption, as they do in AWS
+      self.buckets[bucket_name] = {"encryption": "AES256", "versioning": None}
+    return aws_response(request, 200, b"", "application/xml")
+
+  def handle_s3_HeadBucket(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    with self._lock:
+      exists = s3_bucket_name(request) in self.buckets
+    return aws_response(request, 200 if exists else 404, b"", "application/xml")
+
+  def update_bucket(self, request: AWSPreparedRequest, setting: str, pattern: re.Pattern[str]) -> AWSResponse:
+    bucket_name = s3_bucket_name(request)
+    match = pattern.search(request_body(request))
+    with self._lock:
+      if bucket_name not in self.buckets:
+        return error_response(request, "s3", 404, "NoSuchBucket", f"Bucket {bucket_name} does not exist")
+      self.buckets[bucket_name][setting] = match.group(1) if match else None
+    return aws_response(request, 200, b"", "application/xml")
+
+  def handle_s3_PutBucketEncryption(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    return self.update_bucket(request, "encryption", SSE_ALGORITHM_PATTERN)
+
+  def handle_s3_PutBucketVersioning(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    return self.update_bucket(request, "versioning", VERSIONING_STATUS_PATTERN)
+
+  def handle_s3_GetBucketEncryption(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    bucket_name = s3_bucket_name(request)
+    with self._lock:
+      algorithm = self.buckets.get(bucket_name, {}).get("encryption")
+    if algorithm is None:
+      return error_response(
+        request,
+        "s3",
+        404,
+        "ServerSideEncryptionConfigurationNotFoundError",
+        "The server side encryption configuration was not found",
+      )
+    body = (
+      f'<ServerSideEncryptionConfiguration xmlns="{S3_NAMESPACE}"><Rule><ApplyServerSideEncryptionByDefault>'
+      f"<SSEAlgorithm>{algorithm}</SSEAlgorithm></ApplyServerSideEncryptionByDefault></Rule>"
+      "</ServerSideEncryptionConfiguration>"
+    )
+    return aws_response(request, 200, body.encode(), "application/xml")
+
+  def handle_s3_GetBucketVersioning(self, request: AWSPreparedRequest) -> AWSResponse:  # noqa: N802
+    with self._lock:
+      status = self.buckets.get(s3_bucket_name(request), {}).get("versioning")
+    status_element = f"<Status>{status}</Status>" if status else ""
+    body = f'<VersioningConfiguration xmlns="{S3_NAMESPACE}">{status_element}</VersioningConfiguration>'
+    return aws_response(request, 200, body.encode(), "application/xml")
+
+
+@contextlib.contextmanager
+def installed(stand_in: AWSStandIn) -> Iterator[AWSStandIn]:
+  aws_clients.use_session(stand_in.session())
+  try:
+    yield stand_in
+  finally:
+    aws_clients.clear_clients()
@@ -0,0 +1,155 @@
+import json
+from collections.abc import Generator
+
+import pytest
+from botocore.exceptions import ClientError
+from pytest_mock import MockerFixture
+
+import setup_terraform_account_roles
+import setup_terraform_backend
+from benchmarks.aws_stand_in import STAND_IN_ROOT_ID, AWSStandIn, installed
+from tests.conftest import isolated_credentials_cache, isolated_org_inventory  # noqa: F401
+from utils import aws_clients
+from utils.models import TerraformBackendConfig
+
+MANAGEMENT_ACCOUNT_ID = "111111111111"
+MEMBER_ACCOUNT_ID = "222222222222"
+ROLE_NAME = "TerraformAdminRole"
+BUCKET_NAME = "stand-in-terraform-state"
+ORG_ACCOUNT_COUNT = 45
+EXPECTED_BACKEND_READ_CALLS = 5
+# Organizations returns at most 20 accounts per page. The 45 accounts are split over two OUs of 20 and 10
+# accounts and the root with 15, so each parent fits in one page
+ORGANIZATIONAL_UNITS = {
+  "Workloads": [f"account-{position}" for position in range(20)],
+  "Sandbox": [f"account-{position}" for position in range(20, 30)],
+}
+EXPECTED_PARENTS = 3
+# Without OU membership the 45 accounts are listed with ListAccounts in pages of 20
+EXPECTED_LIST_ACCOUNTS_PAGES = 3
+EXPECTED_INVENTORY_FETCHES = 2
+
+
+@pytest.fixture
+def stand_in() -> Generator[AWSStandIn, None, None]:
+  org_accounts = {
+    f"account-{position}": str(int(MEMBER_ACCOUNT_ID) + position) for position in range(ORG_ACCOUNT_COUNT)
+  }
+  stand_in = AWSStandIn(org_accounts, MANAGEMENT_ACCOUNT_ID, seed=1, organizational_units=ORGANIZATIONAL_UNITS)
+  with installed(stand_in):
+    yield stand_in
+
+
+def test_org_inventory_is_listed_per_ou_and_cached(stand_in: AWSStandIn) -> None:
+  inventory = setup_terraform_account_roles.get_aws_org_inventory(MANAGEMENT_ACCOUNT_ID, membership=True)
+  cached_accounts = setup_terraform_account_roles.get_aws_org_accounts(MANAGEMENT_ACCOUNT_ID)
+
+  assert cached_accounts == stand_in.org_accounts
+  organizational_units = {account["name"]: account["organizational_unit"] for account in inventory}
+  assert organizational_units["account-0"] == "Workloads"
+  assert organizational_units["account-29"] == "Sandbox"
+  assert organizational_units["account-44"] is None
+  assert stand_in.calls["organizations.ListRoots"] == 1
+  assert stand_in.calls["organizations.ListAccountsForParent"] == EXPECTED_PARENTS
+  assert stand_in.calls["organizations.ListOrganizationalUnitsForParent"] == EXPECTED_PARENTS
+
+
+def test_org_inventory_is_refreshed_for_unknown_accounts(stand_in: AWSStandIn) -> None:
+  setup_terraform_account_roles.get_aws_org_accounts(MANAGEMENT_ACCOUNT_ID)
+  stand_in.org_accounts["new-account"] = "999999999999"
+  stand_in.account_parents["new-account"] = STAND_IN_ROOT_ID
+
+  accounts = setup_terraform_account_roles.get_aws_org_accounts(MANAGEMENT_ACCOUNT_ID, ["new-account"])
+
+  assert accounts["new-account"] == "999999999999"
+  # The cached inventory is missing the new account, so the organization is listed again
+  assert stand_in.calls["organizations.ListAccounts"] == EXPECTED_INVENTORY_FETCHES * EXPECTED_LIST_ACCOUNTS_PAGES
+  assert stand_in.calls["organizations.ListRoots"] == 0
+
+
+def test_roles_are_created_in_the_assumed_account(stand_in: AWSStandIn) -> None:
+  create_role = setup_terraform_account_roles.create_terraform_admin_role
+  assert create_role(MEMBER_ACCOUNT_ID, MANAGEMENT_ACCOUNT_ID, ROLE_NAME) == "created"
+  assert create_role(MEMBER_ACCOUNT_ID, MANAGEMENT_ACCOUNT_ID, ROLE_NAME) == "existed"
+
+  assert list(stand_in.roles) == [MEMBER_ACCOUNT_ID]
+  assert list(stand_in.roles[MEMBER_ACCOUNT_ID]) == [ROLE_NAME]
+  assert stand_in.calls["sts.AssumeRole"] == 1
+  # The second run finds the role and its policy in sync and only reads them
+  assert stand_in.calls["iam.CreateRole"] == 1
+  assert stand_in.calls["iam.PutRolePolicy"] == 1
+  assert stand_in.calls["iam.GetRolePolicy"] == 1
+
+
+def test_divergent_trust_policy_is_updated(stand_in: AWSStandIn) -> None:
+  setup_terraform_account_roles.create_terraform_admin_role(MEMBER_ACCOUNT_ID, MANAGEMENT_ACCOUNT_ID, ROLE_NAME)
+  stand_in.roles[MEMBER_ACCOUNT_ID][ROLE_NAME] = json.dumps({"Version": "2012-10-17", "Statement": []})
+
+  status = setup_terraform_account_roles.create_terraform_admin_role(
+    MEMBER_ACCOUNT_ID, MANAGEMENT_ACCOUNT_ID, ROLE_NAME
+  )
+
+  assert status == "updated"
+  assert stand_in.calls["iam.UpdateAssumeRolePolicy"] == 1
+  assert stand_in.calls["iam.PutRolePolicy"] == 1
+  trust_policy = json.loads(stand_in.roles[MEMBER_ACCOUNT_ID][ROLE_NAME])
+  assert trust_policy["Statement"][0]["Principal"] == {"AWS": f"arn:aws:iam::{MANAGEMENT_ACCOUNT_ID}:root"}
+
+
+def test_backend_rerun_only_reads(stand_in: AWSStandIn) -> None:
+  backend_config = TerraformBackendConfig(
+    aws_region="us-west-2",
+    terraform_admin_role_name=ROLE_NAME,
+    s3_backend_bucket_name=BUCKET_NAME,
+    create_terraform_admin_role=True,
+    create_s3_backend_bucket=True,
+  )
+
+  first_run = setup_terraform_backend.setup_terraform_backend(backend_config, MANAGEMENT_ACCOUNT_ID)
+  calls_after_first_run = sum(stand_in.calls.values())
+  second_run = setup_terraform_backend.setup_terraform_backend(backend_config, MANAGEMENT_ACCOUNT_ID)
+
+  assert [action["action"] for action in first_run] == [
+    "create_role",
+    "attach_policy",
+    "create_bucket",
+    "enable_bucket_encryption",
+    "enable_bucket_versioning",
+  ]
+  assert second_run == []
+  assert stand_in.buckets == {BUCKET_NAME: {"encryption": "AES256", "versioning": "Enabled"}}
+  # GetRole, GetRolePolicy, HeadBucket, GetBucketEncryption and GetBucketVersioning
+  assert sum(stand_in.calls.values()) - calls_after_first_run == EXPECTED_BACKEND_READ_CALLS
+
+
+def test_caller_identity_is_the_management_account(stand_in: AWSStandIn) -> None:
+  sts_client = aws_clients.get_client("sts")
+
+  assert sts_client.get_caller_identity()["Account"] == MANAGEMENT_ACCOUNT_ID
+  assert stand_in.calls["sts.GetCallerIdentity"] == 1
+
+
+def test_throttled_calls_are_retried_by_botocore(stand_in: AWSStandIn, mocker: MockerFixture) -> None:
+  # Only botocore's retries are under test here. The shared rate limiter paces requests after a throttle
+  # by the clock, which patching time.sleep does not skip.
+  mocker.patch("time.sleep")
+  mocker.patch("utils.config.AWS_RATE_LIMITS", {})
+  stand_in.throttle_rate = 0.3
+
+  setup_terraform_account_roles.get_aws_org_accounts(MANAGEMENT_ACCOUNT_ID)
+
+  throttled = stand_in.throttled_calls["organizations.ListAccounts"]
+  assert throttled > 0
+  assert stand_in.calls["organizations.ListAccounts"] == EXPECTED_LIST_ACCOUNTS_PAGES + throttled
+
+
+def test_always_throttled_call_raises_client_error(stand_in: AWSStandIn, mocker: MockerFixture) -> None:
+  # Only botocore's retries are under test here. The shared rate limiter paces requests after a throttle
+  # by the clock, which patching time.sleep does not skip.
+  mocker.patch("time.sleep")
+  mocker.patch("utils.config.AWS_RATE_LIMITS", {})
+  stand_in.throttle_rate = 1.0
+  s3_client = aws_clients.get_client("s3")
+
+  with pytest.raises(ClientError, match="SlowDown"):
+    s3_client.put_bucket_versioning(Bucket="test-bucket", VersioningConfiguration={"Status": "Enabled"})
@@ -0,0 +1,162 @@
+import argparse
+import gc
+import json
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import TypedDict
+
+from benchmarks.scale_benchmark import (
+  ACCOUNTS_PER_OU,
+  MANAGEMENT_ACCOUNT_ID,
+  parse_account_counts,
+  synthetic_account_id,
+  synthetic_account_names,
+)
+from utils import parse_ous_accounts_data
+from utils.models import Account, AccountView
+
+DEFAULT_ACCOUNT_COUNTS = (1_000, 10_000, 50_000)
+
+
+class ModelMemoryResult(TypedDict):
+  accounts: int
+  representation: str
+  wall_seconds: float
+  # Memory still held by the built accounts, and the most held at once while building them
+  retained_bytes_per_account: float
+  peak_bytes_per_account: float
+
+
+class ModelMemoryReport(TypedDict):
+  python: str
+  platform: str
+  results: list[ModelMemoryResult]
+
+
+def synthetic_registry(account_count: int) -> parse_ous_accounts_data.OUSAccountsRegistryData:
+  account_names = synthetic_account_names(account_count)
+  ous_accounts: dict[str, list[parse_ous_accounts_data.OUSAccountsData]] = {
+    "Management": [{"name": account_names[0], "id": MANAGEMENT_ACCOUNT_ID}]
+  }
+  for start in range(1, account_count, ACCOUNTS_PER_OU):
+    ous_accounts[f"OU{start // ACCOUNTS_PER_OU:04d}"] = [
+      {"name": name, "id": synthetic_account_id(start + offset)}
+      for offset, name in enumerate(account_names[start : start + ACCOUNTS_PER_OU])
+    ]
+
+  return {
+    "ACCOUNTS_PREFIX": "bench",
+    "AWS_REGION": "us-west-2",
+    "CREATE_TERRAFORM_ADMIN_ROLE": True,
+    "TERRAFORM_ADMIN_ROLE_NAME": "TerraformAdminRole",
+    "CREATE_S3_BACKEND_BUCKET": True,
+    "S3_BACKEND_BUCKET_NAME": "bench-terraform-state",
+    "MANAGEMENT_ACCOUNT_NAME": account_names[0],
+    "MANAGEMENT_ACCOUNT_ID": MANAGEMENT_ACCOUNT_ID,
+    "MANAGEMENT_ACCOUNT_EMAIL": "bench@example.com",
+    "PARENT_OU_ID": "r-bench",
+    "SHARD_MANAGEMENT_STATE_BY_OU": False,
+    "OUS_ACCOUNTS": ous_accounts,
+  }
+
+
+def measure(account_count: int, representation: str, build: Callable[[], object]) -> ModelMemoryResult:
+  # Timed without tracemalloc, which slows allocation-heavy code down unevenly
+  gc.collect()
+  start = time.perf_counter()
+  build()
+  wall_seconds = time.perf_counter() - start
+
+  gc.collect()
+  tracemalloc.start()
+  try:
+    built = build()
+    retained_bytes, peak_bytes = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  del built
+
+  return {
+    "accounts": account_count,
+    "representation": representation,
+    "wall_seconds": round(wall_seconds, 6),
+    "retained_bytes_per_account": round(retained_bytes / account_count, 1),
+    "peak_bytes_per_account": round(peak_bytes / account_count, 1),
+  }
+
+
+def representations(account_count: int) -> list[tuple[str, Callable[[], object]]]:
+  registry = synthetic_registry(account_count)
+  accounts_data = parse_ous_accounts_data.build_ous_accounts_data(registry)
+  accounts = accounts_data["accounts_data"]
+  backend_config = accounts_data["terraform_backend_config"]
+  snapshot = pickle.dumps(accounts, protocol=pickle.HIGHEST_PROTOCOL)
+
+  def validate_per_account() -> list[Account]:
+    # How the registry was validated before the bulk TypeAdapter path
+    return [
+      Account(
+        name=account["name"], id=account["id"], organizational_unit=ou_name, terraform_backend_config=backend_config
+      )
+      for ou_name, ou_accounts in registry["OUS_ACCOUNTS"].items()
+      for account in ou_accounts
+    ]
+
+  return [
+    ("account_models_per_account", validate_per_account),
+    ("account_models_bulk", lambda: parse_ous_accounts_data.build_ous_accounts_data(registry)["accounts_data"]),
+    ("account_models_snapshot", lambda: pickle.loads(snapshot)),
+    ("account_views", lambda: [AccountView.from_account(account) for account in accounts]),
+  ]
+
+
+def run_benchmarks(account_counts: list[int]) -> ModelMemoryReport:
+  results = [
+    measure(account_count, representation, build)
+    for account_count in account_counts
+    for representation, build in representations(account_count)
+  ]
+  return {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+
+
+def print_report(report: ModelMemoryReport) -> None:
+  print(f"\n{'Accounts':>8}  {'Representation':<30}{'Wall time':>12}{'Retained/acct':>16}{'Peak/acct':>12}")
+  for result in report["results"]:
+    print(
+      f"{result['accounts']:>8}  {result['representation']:<30}{result['wall_seconds']:>11.3f}s"
+      f"{result['retained_bytes_per_account']:>14.0f} B{result['peak_bytes_per_account']:>10.0f} B"
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    description="Time and memory of building the registry's accounts as validated models, snapshots and views"
+  )
+  parser.add_argument(
+    "--accounts",
+    type=parse_account_counts,
+    default=list(DEFAULT_ACCOUNT_COUNTS),
+    help="Comma separated account counts (default: 1000,10000,50000)",
+  )
+  parser.add_argument("--output", help="Write the results as JSON to this path")
+  return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+  report = run_benchmarks(args.accounts)
+  print_report(report)
+  if args.output:
+    with open(args.output, "w") as file:
+      json.dump(report, file, indent=2)
+      file.write("\n")
+    print(f"\nResults written to {args.output}")
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
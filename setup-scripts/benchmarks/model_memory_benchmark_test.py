@@ -0,0 +1,23 @@
+import json
+from pathlib import Path
+
+from benchmarks import model_memory_benchmark
+
+SMOKE_ACCOUNT_COUNT = 200
+
+
+def test_model_memory_benchmark_smoke(tmp_path: Path) -> None:
+  output_path = tmp_path / "results.json"
+
+  assert model_memory_benchmark.main(["--accounts", str(SMOKE_ACCOUNT_COUNT), "--output", str(output_path)]) == 0
+
+  results = {result["representation"]: result for result in json.loads(output_path.read_text())["results"]}
+  assert list(results) == [
+    "account_models_per_account",
+    "account_models_bulk",
+    "account_models_snapshot",
+    "account_views",
+  ]
+  assert results["account_views"]["retained_bytes_per_account"] < (
+    results["account_models_bulk"]["retained_bytes_per_account"] / 2
+  )
@@ -0,0 +1,201 @@
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import TypedDict
+from unittest import mock
+
+import setup_account_directories
+import setup_terraform_account_roles
+import setup_terraform_backend
+from benchmarks import scale_benchmark
+from benchmarks.aws_stand_in import AWSStandIn, installed
+from benchmarks.scale_benchmark import BenchmarkReport, PhaseResult
+from utils import config, credentials_cache, parse_ous_accounts_data
+
+DEFAULT_ACCOUNT_COUNTS = (10, 100, 1_000)
+DEFAULT_LATENCY_MS = 50.0
+DEFAULT_JITTER_MS = 20.0
+
+
+class StandInSettings(TypedDict):
+  latency_ms: float
+  jitter_ms: float
+  throttle_rate: float
+  max_workers: int
+  seed: int | None
+
+
+class ProvisioningReport(BenchmarkReport):
+  settings: StandInSettings
+  api_calls: dict[str, dict[str, int]]
+  throttled_calls: dict[str, dict[str, int]]
+
+
+@contextlib.contextmanager
+def isolated_caches(work_dir: str) -> Iterator[None]:
+  # Assumed role credentials and the organization inventory from the stand-in must never reach the real cache
+  with (
+    mock.patch.object(config, "CREDENTIALS_CACHE_PATH", Path(work_dir) / "credentials.json"),
+    mock.patch.object(config, "ORG_INVENTORY_PATH", Path(work_dir) / "org-inventory.json"),
+  ):
+    credentials_cache.clear_credentials_cache()
+    try:
+      yield
+    finally:
+      credentials_cache.clear_credentials_cache()
+
+
+def provisioning_phases(
+  accounts_dir: str, stand_in: AWSStandIn, max_workers: int
+) -> list[tuple[str, Callable[[], object]]]:
+  management_account_details = parse_ous_accounts_data.get_management_account_details()
+  terraform_backend_config = parse_ous_accounts_data.get_terraform_backend_config()
+
+  def create_roles() -> object:
+    return setup_terraform_account_roles.create_terraform_admin_roles(
+      stand_in.org_accounts,
+      management_account_details.id,
+      terraform_backend_config.terraform_admin_role_name,
+      accounts_dir,
+      max_workers=max_workers,
+    )
+
+  return [
+    (
+      "verify_logged_into_management_account",
+      lambda: setup_terraform_backend.verify_logged_into_management_account(management_account_details.id),
+    ),
+    (
+      "get_aws_org_accounts",
+      lambda: setup_terraform_account_roles.get_aws_org_accounts(management_account_details.id),
+    ),
+    (
+      "get_aws_org_accounts_cached",
+      lambda: setup_terraform_account_roles.get_aws_org_accounts(management_account_details.id),
+    ),
+    (
+      "setup_terraform_backend",
+      lambda: setup_terraform_backend.setup_terraform_backend(terraform_backend_config, management_account_details.id),
+    ),
+    ("create_terraform_admin_roles", create_roles),
+    ("create_terraform_admin_roles_existing", create_roles),
+  ]
+
+
+def run_benchmarks(account_counts: list[int], settings: StandInSettings) -> ProvisioningReport:
+  results: list[PhaseResult] = []
+  api_calls: dict[str, dict[str, int]] = {}
+  throttled_calls: dict[str, dict[str, int]] = {}
+  for account_count in account_counts:
+    account_names = scale_benchmark.synthetic_account_names(account_count)
+    org_accounts = {name: scale_benchmark.synthetic_account_id(position) for position, name in enumerate(account_names)}
+    # The same OU layout as the synthetic registry, with the management account under the root
+    organizational_units = {
+      f"OU{start // scale_benchmark.ACCOUNTS_PER_OU:04d}": account_names[1:][
+        start : start + scale_benchmark.ACCOUNTS_PER_OU
+      ]
+      for start in range(0, account_count - 1, scale_benchmark.ACCOUNTS_PER_OU)
+    }
+    stand_in = AWSStandIn(
+      org_accounts,
+      scale_benchmark.MANAGEMENT_ACCOUNT_ID,
+      latency_seconds=settings["latency_ms"] / 1000,
+      jitter_seconds=settings["jitter_ms"] / 1000,
+      throttle_rate=settings["throttle_rate"],
+      seed=settings["seed"],
+      organizational_units=organizational_units,
+    )
+    with (
+      tempfile.TemporaryDirectory() as work_dir,
+      scale_benchmark.synthetic_environment(work_dir, account_count) as accounts_dir,
+      isolated_caches(work_dir),
+      mock.patch.object(config, "MAX_WORKERS", settings["max_workers"]),
+      installed(stand_in),
+    ):
+      setup_account_directories.setup_all_account_directories(
+        parse_ous_accounts_data.get_account_registry().accounts, output_mode="quiet"
+      )
+      for phase, run in provisioning_phases(accounts_dir, stand_in, settings["max_workers"]):
+        results.append(scale_benchmark.measure_phase(account_count, phase, run, trace_memory=False))
+
+    api_calls[str(account_count)] = dict(sorted(stand_in.calls.items()))
+    throttled_calls[str(account_count)] = dict(sorted(stand_in.throttled_calls.items()))
+
+  return {
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "results": results,
+    "settings": settings,
+    "api_calls": api_calls,
+    "throttled_calls": throttled_calls,
+  }
+
+
+def print_api_calls(report: ProvisioningReport) -> None:
+  for account_count, calls in report["api_calls"].items():
+    throttled = report["throttled_calls"][account_count]
+    print(f"\nAPI calls for {account_count} accounts ({sum(throttled.values())} throttled):")
+    for operation, count in calls.items():
+      print(f"  {operation:<36}{count:>8}{throttled.get(operation, 0):>8}")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    description="Benchmark the AWS provisioning steps against a local stand-in with injected latency and throttling"
+  )
+  parser.add_argument(
+    "--accounts",
+    type=scale_benchmark.parse_account_counts,
+    default=list(DEFAULT_ACCOUNT_COUNTS),
+    help="Comma separated account counts (default: 10,100,1000)",
+  )
+  parser.add_argument("--latency-ms", type=float, default=DEFAULT_LATENCY_MS, help="Latency added to every call")
+  parser.add_argument("--jitter-ms", type=float, default=DEFAULT_JITTER_MS, help="Random latency added on top")
+  parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of calls answered with a throttle")
+  parser.add_argument("--max-workers", type=int, default=config.MAX_WORKERS)
+  parser.add_argument("--seed", type=int, help="Seed for the latency jitter and throttling")
+  parser.add_argument("--output", help="Write the results as JSON to this path")
+  parser.add_argument("--baseline", help="Compare the results against a previous JSON report")
+  parser.add_argument(
+    "--threshold",
+    type=float,
+    default=scale_benchmark.DEFAULT_REGRESSION_THRESHOLD,
+    help="Relative increase reported as a regression (default: 0.2)",
+  )
+  return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+  settings: StandInSettings = {
+    "latency_ms": args.latency_ms,
+    "jitter_ms": args.jitter_ms,
+    "throttle_rate": args.throttle_rate,
+    "max_workers": args.max_workers,
+    "seed": args.seed,
+  }
+
+  report = run_benchmarks(args.accounts, settings)
+  scale_benchmark.print_report(report)
+  print_api_calls(report)
+
+  if args.output:
+    with open(args.output, "w") as file:
+      json.dump(report, file, indent=2)
+      file.write("\n")
+    print(f"\nResults written to {args.output}")
+  if not args.baseline:
+    return 0
+
+  regressions = scale_benchmark.find_regressions(scale_benchmark.load_report(args.baseline), report, args.threshold)
+  scale_benchmark.print_regressions(regressions, args.threshold)
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
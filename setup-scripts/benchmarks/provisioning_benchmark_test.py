@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+
+from benchmarks import provisioning_benchmark
+
+SMOKE_ACCOUNT_COUNT = 12
+EXPECTED_PHASES = [
+  "verify_logged_into_management_account",
+  "get_aws_org_accounts",
+  "get_aws_org_accounts_cached",
+  "setup_terraform_backend",
+  "create_terraform_admin_roles",
+  "create_terraform_admin_roles_existing",
+]
+
+
+def test_provisioning_benchmark_smoke(tmp_path: Path) -> None:
+  output_path = tmp_path / "results.json"
+
+  exit_code = provisioning_benchmark.main(
+    ["--accounts", str(SMOKE_ACCOUNT_COUNT), "--latency-ms", "0", "--jitter-ms", "0", "--output", str(output_path)]
+  )
+
+  assert exit_code == 0
+  report = json.loads(output_path.read_text())
+  assert [result["phase"] for result in report["results"]] == EXPECTED_PHASES
+  calls = report["api_calls"][str(SMOKE_ACCOUNT_COUNT)]
+  # The backend creates the management account role first, so only the member accounts get a new role from
+  # the roles script. The management role only gets the roles script's policy, and the rerun just reads.
+  assert calls["sts.AssumeRole"] == SMOKE_ACCOUNT_COUNT
+  assert calls["iam.CreateRole"] == SMOKE_ACCOUNT_COUNT
+  assert calls["iam.PutRolePolicy"] == SMOKE_ACCOUNT_COUNT + 1
+  assert calls["iam.GetRole"] == 2 * SMOKE_ACCOUNT_COUNT + 1
+  assert calls["iam.GetRolePolicy"] == SMOKE_ACCOUNT_COUNT + 1
+  assert report["throttled_calls"][str(SMOKE_ACCOUNT_COUNT)] == {}
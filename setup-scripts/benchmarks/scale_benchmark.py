@@ -0,0 +1,322 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import TypedDict
+from unittest import mock
+
+import setup_account_directories
+import setup_terraform_account_roles
+import setup_terraform_backend
+from utils import config, parse_ous_accounts_data
+
+DEFAULT_ACCOUNT_COUNTS = (10, 1_000, 10_000)
+ACCOUNTS_PER_OU = 10
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+DEFAULT_MIN_DELTA_SECONDS = 0.05
+DEFAULT_MIN_DELTA_BYTES = 1024 * 1024
+MANAGEMENT_ACCOUNT_ID = "100000000000"
+REGISTRY_HEADER = """ACCOUNTS_PREFIX = "bench"
+AWS_REGION = "us-west-2"
+CREATE_TERRAFORM_ADMIN_ROLE = True
+TERRAFORM_ADMIN_ROLE_NAME = "TerraformAdminRole"
+CREATE_S3_BACKEND_BUCKET = True
+S3_BACKEND_BUCKET_NAME = "bench-terraform-state"
+MANAGEMENT_ACCOUNT_NAME = "bench-management"
+MANAGEMENT_ACCOUNT_ID = "{management_account_id}"
+MANAGEMENT_ACCOUNT_EMAIL = "bench@example.com"
+PARENT_OU_ID = "r-bench"
+
+"""
+
+
+class PhaseResult(TypedDict):
+  accounts: int
+  phase: str
+  wall_seconds: float
+  peak_memory_bytes: int | None
+
+
+class BenchmarkReport(TypedDict):
+  python: str
+  platform: str
+  results: list[PhaseResult]
+
+
+class Regression(TypedDict):
+  accounts: int
+  phase: str
+  metric: str
+  baseline: float
+  current: float
+
+
+def synthetic_account_id(position: int) -> str:
+  return str(int(MANAGEMENT_ACCOUNT_ID) + position)
+
+
+def synthetic_account_names(account_count: int) -> list[str]:
+  return ["bench-management"] + [f"bench-account-{position:05d}" for position in range(1, account_count)]
+
+
+def generate_registry_source(account_count: int, accounts_per_ou: int = ACCOUNTS_PER_OU) -> str:
+  # Mirrors ous_accounts_registry.py: the management account sits alone in the Management OU and
+  # the remaining accounts are spread over as many OUs as needed, with IDs left empty as before creation
+  lines = [
+    REGISTRY_HEADER.format(management_account_id=MANAGEMENT_ACCOUNT_ID),
+    "OUS_ACCOUNTS = {",
+    '  "Management": [',
+    '    {"name": MANAGEMENT_ACCOUNT_NAME, "id": MANAGEMENT_ACCOUNT_ID},',
+    "  ],",
+  ]
+  account_names = synthetic_account_names(account_count)[1:]
+  for start in range(0, len(account_names), accounts_per_ou):
+    lines.append(f'  "OU{start // accounts_per_ou:04d}": [')
+    lines.extend(f'    {{"name": "{name}", "id": ""}},' for name in account_names[start : start + accounts_per_ou])
+    lines.append("  ],")
+  lines.append("}")
+  return "\n".join(lines) + "\n"
+
+
+@contextlib.contextmanager
+def synthetic_environment(work_dir: str, account_count: int) -> Iterator[str]:
+  registry_path = os.path.join(work_dir, "ous_accounts_registry.py")
+  accounts_dir = os.path.join(work_dir, "accounts")
+  with open(registry_path, "w") as file:
+    file.write(generate_registry_source(account_count))
+
+  with (
+    mock.patch.object(parse_ous_accounts_data, "OUS_ACCOUNTS_REGISTRY_PATH", registry_path),
+    mock.patch.object(config, "ACCOUNTS_DIRECTORY_PATH", accounts_dir),
+    mock.patch.object(config, "REGISTRY_SNAPSHOT_DIRECTORY_PATH", Path(work_dir) / "registry-snapshots"),
+  ):
+    parse_ous_accounts_data.clear_ous_accounts_data_cache()
+    try:
+      yield accounts_dir
+    finally:
+      parse_ous_accounts_data.clear_ous_accounts_data_cache()
+
+
+def measure_phase(account_count: int, phase: str, run: Callable[[], object], *, trace_memory: bool) -> PhaseResult:
+  # The setup functions print per account, which would dominate the timings at 10k accounts
+  with contextlib.redirect_stdout(io.StringIO()):
+    if trace_memory:
+      tracemalloc.start()
+    try:
+      start = time.perf_counter()
+      run()
+      wall_seconds = time.perf_counter() - start
+      peak_memory_bytes = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+      if trace_memory:
+        tracemalloc.stop()
+
+  return {
+    "accounts": account_count,
+    "phase": phase,
+    "wall_seconds": round(wall_seconds, 6),
+    "peak_memory_bytes": peak_memory_bytes,
+  }
+
+
+def benchmark_phases(accounts_dir: str, account_count: int) -> list[tuple[str, Callable[[], object]]]:
+  def load_registry() -> parse_ous_accounts_data.AccountsData:
+    parse_ous_accounts_data.clear_ous_accounts_data_cache()
+    return parse_ous_accounts_data.ous_accounts_data()
+
+  # The same registry as JSON, in its own directory since only one registry may sit next to the other
+  json_registry_path = os.path.join(os.path.dirname(accounts_dir), "json", "ous_accounts_registry.json")
+  os.makedirs(os.path.dirname(json_registry_path), exist_ok=True)
+  with open(json_registry_path, "w") as file:
+    json.dump(parse_ous_accounts_data.load_ous_accounts_data(), file)
+
+  def load_json_registry() -> parse_ous_accounts_data.AccountsData:
+    parse_ous_accounts_data.clear_ous_accounts_data_cache()
+    with mock.patch.object(parse_ous_accounts_data, "OUS_ACCOUNTS_REGISTRY_PATH", json_registry_path):
+      return parse_ous_accounts_data.ous_accounts_data()
+
+  def load_json_registry_cold() -> parse_ous_accounts_data.AccountsData:
+    shutil.rmtree(config.REGISTRY_SNAPSHOT_DIRECTORY_PATH, ignore_errors=True)
+    return load_json_registry()
+
+  def setup_directories() -> object:
+    return setup_account_directories.setup_all_account_directories(
+      parse_ous_accounts_data.get_account_registry().accounts, output_mode="quiet"
+    )
+
+  def setup_resource_files() -> None:
+    setup_terraform_backend.setup_terraform_resource_files(
+      accounts_dir,
+      parse_ous_accounts_data.get_management_account_details(),
+      parse_ous_accounts_data.get_account_registry(),
+    )
+
+  org_accounts = {
+    name: synthetic_account_id(position) for position, name in enumerate(synthetic_account_names(account_count))
+  }
+
+  return [
+    ("load_registry", load_registry),
+    ("load_registry_json", load_json_registry_cold),
+    ("load_registry_json_snapshot", load_json_registry),
+    ("setup_account_directories", setup_directories),
+    ("setup_account_directories_unchanged", setup_directories),
+    ("setup_terraform_resource_files", setup_resource_files),
+    ("update_account_ids", lambda: setup_terraform_account_roles.update_account_ids(org_accounts, accounts_dir)),
+    (
+      "update_account_ids_unchanged",
+      lambda: setup_terraform_account_roles.update_account_ids(org_accounts, accounts_dir),
+    ),
+    ("find_terragrunt_directories", lambda: setup_terraform_account_roles.find_terragrunt_directories(accounts_dir)),
+  ]
+
+
+def run_benchmarks(account_counts: list[int], *, trace_memory: bool = True) -> BenchmarkReport:
+  results: list[PhaseResult] = []
+  for account_count in account_counts:
+    with tempfile.TemporaryDirectory() as work_dir, synthetic_environment(work_dir, account_count) as accounts_dir:
+      for phase, run in benchmark_phases(accounts_dir, account_count):
+        results.append(measure_phase(account_count, phase, run, trace_memory=trace_memory))
+
+  return {
+    "python": platform.python_version(),
+    "platform": platform.platform(),
+    "results": results,
+  }
+
+
+def find_regressions(
+  baseline: BenchmarkReport,
+  current: BenchmarkReport,
+  threshold: float = DEFAULT_REGRESSION_THRESHOLD,
+  min_delta_seconds: float = DEFAULT_MIN_DELTA_SECONDS,
+) -> list[Regression]:
+  # Small absolute changes are ignored, since millisecond phases vary by more than the threshold between runs
+  baseline_results = {(result["accounts"], result["phase"]): result for result in baseline["results"]}
+  regressions: list[Regression] = []
+  for result in current["results"]:
+    previous = baseline_results.get((result["accounts"], result["phase"]))
+    if previous is None:
+      continue
+
+    metrics: list[tuple[str, float | None, float | None, float]] = [
+      ("wall_seconds", previous["wall_seconds"], result["wall_seconds"], min_delta_seconds),
+      ("peak_memory_bytes", previous["peak_memory_bytes"], result["peak_memory_bytes"], DEFAULT_MIN_DELTA_BYTES),
+    ]
+    for metric, before, after, min_delta in metrics:
+      if before is None or after is None:
+        continue
+      if after - before > min_delta and after > before * (1 + threshold):
+        regressions.append(
+          {
+            "accounts": result["accounts"],
+            "phase": result["phase"],
+            "metric": metric,
+            "baseline": before,
+            "current": after,
+          }
+        )
+  return regressions
+
+
+def format_memory(peak_memory_bytes: int | None) -> str:
+  if peak_memory_bytes is None:
+    return "-"
+  return f"{peak_memory_bytes / (1024 * 1024):.1f} MiB"
+
+
+def print_report(report: BenchmarkReport) -> None:
+  print(f"\n{'Accounts':>8}  {'Phase':<38}{'Wall time':>12}{'Peak memory':>14}")
+  for result in report["results"]:
+    print(
+      f"{result['accounts']:>8}  {result['phase']:<38}{result['wall_seconds']:>11.3f}s"
+      f"{format_memory(result['peak_memory_bytes']):>14}"
+    )
+
+
+def print_regressions(regressions: list[Regression], threshold: float) -> None:
+  if not regressions:
+    print(f"\n{config.Colors.GREEN}No regressions over {threshold:.0%} against the baseline{config.Colors.RESET}")
+    return
+
+  print(f"\n{config.Colors.RED}{len(regressions)} regression(s) over {threshold:.0%}:{config.Colors.RESET}")
+  for regression in regressions:
+    print(
+      f"  {regression['accounts']} accounts, {regression['phase']}, {regression['metric']}: "
+      f"{regression['baseline']} -> {regression['current']}"
+    )
+
+
+def load_report(path: str) -> BenchmarkReport:
+  with open(path) as file:
+    report: BenchmarkReport = json.load(file)
+  return report
+
+
+def parse_account_counts(value: str) -> list[int]:
+  return [int(count) for count in value.split(",") if count]
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Offline scale benchmarks for the setup scripts")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+
+  run_parser = subparsers.add_parser("run", help="Run the benchmarks against synthetic registries")
+  run_parser.add_argument(
+    "--accounts",
+    type=parse_account_counts,
+    default=list(DEFAULT_ACCOUNT_COUNTS),
+    help="Comma separated account counts (default: 10,1000,10000)",
+  )
+  run_parser.add_argument("--output", help="Write the results as JSON to this path")
+  run_parser.add_argument("--baseline", help="Compare the results against a previous JSON report")
+  run_parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc, which slows down the phases")
+
+  compare_parser = subparsers.add_parser("compare", help="Compare two JSON reports")
+  compare_parser.add_argument("baseline")
+  compare_parser.add_argument("current")
+
+  for subparser in (run_parser, compare_parser):
+    subparser.add_argument(
+      "--threshold",
+      type=float,
+      default=DEFAULT_REGRESSION_THRESHOLD,
+      help="Relative increase reported as a regression (default: 0.2)",
+    )
+  return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+
+  if args.command == "compare":
+    baseline = load_report(args.baseline)
+    current = load_report(args.current)
+  else:
+    current = run_benchmarks(args.accounts, trace_memory=not args.no_memory)
+    print_report(current)
+    if args.output:
+      with open(args.output, "w") as file:
+        json.dump(current, file, indent=2)
+        file.write("\n")
+      print(f"\nResults written to {args.output}")
+    if not args.baseline:
+      return 0
+    baseline = load_report(args.baseline)
+
+  regressions = find_regressions(baseline, current, args.threshold)
+  print_regressions(regressions, args.threshold)
+  return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
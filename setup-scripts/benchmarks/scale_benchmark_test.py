@@ -0,0 +1,84 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks import scale_benchmark
+from benchmarks.scale_benchmark import BenchmarkReport, PhaseResult
+from utils import parse_ous_accounts_data
+
+SMOKE_ACCOUNT_COUNT = 25
+# The management OU plus 24 accounts spread over OUs of 10
+EXPECTED_OU_COUNT = 4
+EXPECTED_PHASES = [
+  "load_registry",
+  "load_registry_json",
+  "load_registry_json_snapshot",
+  "setup_account_directories",
+  "setup_account_directories_unchanged",
+  "setup_terraform_resource_files",
+  "update_account_ids",
+  "update_account_ids_unchanged",
+  "find_terragrunt_directories",
+]
+
+
+def phase_result(phase: str, wall_seconds: float, peak_memory_bytes: int | None = None) -> PhaseResult:
+  return {"accounts": 10, "phase": phase, "wall_seconds": wall_seconds, "peak_memory_bytes": peak_memory_bytes}
+
+
+def report(*results: PhaseResult) -> BenchmarkReport:
+  return {"python": "3.12", "platform": "test", "results": list(results)}
+
+
+def test_generated_registry_loads(tmp_path: Path) -> None:
+  with scale_benchmark.synthetic_environment(str(tmp_path), SMOKE_ACCOUNT_COUNT):
+    data = parse_ous_accounts_data.ous_accounts_data()
+
+  assert len(data["accounts_data"]) == SMOKE_ACCOUNT_COUNT
+  assert data["management_account_details"].organizational_unit == "Management"
+  assert len({account.organizational_unit for account in data["accounts_data"]}) == EXPECTED_OU_COUNT
+
+
+def test_run_benchmarks_smoke(tmp_path: Path) -> None:
+  output_path = tmp_path / "results.json"
+
+  assert scale_benchmark.main(["run", "--accounts", str(SMOKE_ACCOUNT_COUNT), "--output", str(output_path)]) == 0
+
+  results = json.loads(output_path.read_text())["results"]
+  assert [result["phase"] for result in results] == EXPECTED_PHASES
+  assert all(result["accounts"] == SMOKE_ACCOUNT_COUNT for result in results)
+  assert all(result["peak_memory_bytes"] is not None for result in results)
+
+
+@pytest.mark.parametrize(
+  ("current", "expected_metrics"),
+  [
+    (phase_result("load_registry", 1.0, 10_000_000), []),
+    (phase_result("load_registry", 1.5, 10_000_000), ["wall_seconds"]),
+    (phase_result("load_registry", 1.0, 20_000_000), ["peak_memory_bytes"]),
+  ],
+)
+def test_find_regressions(current: PhaseResult, expected_metrics: list[str]) -> None:
+  baseline = report(phase_result("load_registry", 1.0, 10_000_000))
+
+  regressions = scale_benchmark.find_regressions(baseline, report(current))
+
+  assert [regression["metric"] for regression in regressions] == expected_metrics
+
+
+def test_find_regressions_ignores_small_absolute_changes() -> None:
+  baseline = report(phase_result("find_terragrunt_directories", 0.001))
+  current = report(phase_result("find_terragrunt_directories", 0.004))
+
+  assert scale_benchmark.find_regressions(baseline, current) == []
+
+
+def test_compare_exits_non_zero_on_regression(tmp_path: Path) -> None:
+  baseline_path = tmp_path / "baseline.json"
+  current_path = tmp_path / "current.json"
+  baseline_path.write_text(json.dumps(report(phase_result("update_account_ids", 1.0))))
+  current_path.write_text(json.dumps(report(phase_result("update_account_ids", 2.0))))
+
+  assert scale_benchmark.main(["compare", str(baseline_path), str(current_path)]) == 1
+  assert scale_benchmark.main(["compare", str(baseline_path), str(baseline_path)]) == 0
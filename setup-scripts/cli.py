@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+from collections.abc import Callable
+
+from utils import config
+
+# Each command imports its script only when it runs, so `--help`, argument errors and the offline commands do not
+# pay for boto3 and the boto3 stubs. Keep imports at the top of this module to the standard library and utils.config.
+Handler = Callable[[argparse.Namespace, list[str]], int]
+
+
+def run_directories(args: argparse.Namespace, _extra: list[str]) -> int:
+  import setup_account_directories
+
+  setup_account_directories.main(["--output", args.output])
+  return 0
+
+
+def run_backend(_args: argparse.Namespace, _extra: list[str]) -> int:
+  import setup_terraform_backend
+
+  setup_terraform_backend.main()
+  return 0
+
+
+def run_roles(args: argparse.Namespace, _extra: list[str]) -> int:
+  import setup_terraform_account_roles
+
+  setup_terraform_account_roles.main(["--max-workers", str(args.max_workers)])
+  return 0
+
+
+def run_init(args: argparse.Namespace, _extra: list[str]) -> int:
+  import setup_terraform_account_roles
+  from utils import instrumentation
+
+  with instrumentation.run("terragrunt_init"):
+    results = setup_terraform_account_roles.terragrunt_init_account_dirs(
+      args.accounts_dir, args.max_workers, force=args.force or config.FORCE_TERRAGRUNT_INIT
+    )
+  return 0 if all(result["succeeded"] for result in results) else 1
+
+
+def run_validate(args: argparse.Namespace, _extra: list[str]) -> int:
+  from utils import hclfmt, parse_ous_accounts_data
+
+  # Loading the registry validates it and rejects duplicate names and IDs, before any directory is checked
+  accounts = parse_ous_accounts_data.get_account_registry()
+  missing = [account.name for account in accounts if not os.path.isdir(os.path.join(args.accounts_dir, account.name))]
+  problems = [f"{name}: account directory is missing, run `python3 cli.py directories`" for name in missing]
+  for result in hclfmt.format_tree(args.accounts_dir, check=True):
+    if result["error"]:
+      problems.append(f"{result['path']}: {result['error']}")
+    elif result["changed"]:
+      problems.append(f"{result['path']}: not formatted, run `python3 cli.py init` or `terragrunt hclfmt`")
+
+  if problems:
+    print(f"{config.Colors.RED}Validation found {len(problems)} problem(s):{config.Colors.RESET}")
+    for problem in problems:
+      print(f"  {problem}")
+    return 1
+  print(f"{config.Colors.GREEN}Registry and {len(accounts)} account directories are valid{config.Colors.RESET}")
+  return 0
+
+
+def run_terragrunt(args: argparse.Namespace, extra: list[str]) -> int:
+  import setup_terragrunt_orchestrator
+
+  return setup_terragrunt_orchestrator.main([args.command, *extra])
+
+
+COMMANDS: dict[str, tuple[Handler, str]] = {
+  "directories": (run_directories, "Generate the account directories and their Terragrunt files from the registry"),
+  "backend": (run_backend, "Create the Terraform admin role and S3 state bucket, and the organization resource files"),
+  "roles": (run_roles, "Fill in account IDs, create the admin role in every account and run terragrunt init"),
+  "init": (run_init, "Format and run terragrunt init in every account directory"),
+  "validate": (run_validate, "Check the registry, the account directories and their HCL formatting, offline"),
+  "plan": (run_terragrunt, "Run terragrunt plan across all accounts, see setup_terragrunt_orchestrator.py"),
+  "apply": (run_terragrunt, "Run terragrunt apply across all accounts, see setup_terragrunt_orchestrator.py"),
+}
+# Options of these commands are passed through to the terragrunt orchestrator
+PASSTHROUGH_COMMANDS = frozenset({"plan", "apply"})
+
+
+def build_parser() -> argparse.ArgumentParser:
+  parser = argparse.ArgumentParser(prog="cli.py", description="Set up and manage the AWS multi-account structure")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+  for name, (handler, help_text) in COMMANDS.items():
+    subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+    subparser.set_defaults(handler=handler)
+    if name in {"init", "validate"}:
+      subparser.add_argument("--accounts-dir", default=config.ACCOUNTS_DIRECTORY_PATH)
+    if name == "directories":
+      # The choices of setup_account_directories.OutputMode, which is not imported to keep `--help` fast
+      subparser.add_argument(
+        "--output",
+        choices=["verbose", "summary", "quiet"],
+        default="verbose",
+        help="verbose prints every directory and file, summary only the totals, quiet nothing (default: verbose)",
+      )
+    if name in {"roles", "init"}:
+      subparser.add_argument("--max-workers", type=int, default=config.MAX_WORKERS, help="Accounts to set up at once")
+    if name == "init":
+      subparser.add_argument(
+        "--force", action="store_true", help="Re-initialize directories whose inputs are unchanged"
+      )
+  return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+  parser = build_parser()
+  args, extra = parser.parse_known_args(argv)
+  if extra and args.command not in PASSTHROUGH_COMMANDS:
+    parser.error(f"unrecognized arguments: {' '.join(extra)}")
+  handler: Handler = args.handler
+  return handler(args, extra)
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,132 @@
+# ignoring redefinition of pytest fixture functions
+# ruff: noqa: F811
+
+import subprocess
+import sys
+from pathlib import Path
+from typing import get_args
+
+import pytest
+from pytest_mock import MockerFixture
+
+from cli import build_parser, main
+from setup_account_directories import ACCOUNT_DETAILS_HCL, TERRAGRUNT_HCL, OutputMode
+from tests.conftest import (  # noqa: F401
+  isolated_event_log,
+  terraform_config,
+  test_account_factory,
+  test_accounts,
+  test_data,
+)
+from utils.account_registry import AccountRegistry
+from utils.models import Account
+
+SETUP_SCRIPTS_DIR = Path(__file__).parent
+AWS_MODULE_PREFIXES = ("boto3", "botocore", "mypy_boto3_")
+# Cumulative import time of cli.py, measured with -X importtime. It is a few tens of milliseconds when only the
+# standard library and utils.config are imported.
+CLI_IMPORT_BUDGET_MICROSECONDS = 100_000
+ACCOUNT_DETAILS_FIELDS = (
+  "account_name",
+  "account_id",
+  "organizational_unit",
+  "aws_region",
+  "terraform_admin_role_name",
+  "s3_backend_bucket_name",
+)
+
+
+def import_times(module: str) -> dict[str, int]:
+  completed = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+    cwd=SETUP_SCRIPTS_DIR,
+    capture_output=True,
+    text=True,
+    check=True,
+  )
+  # Lines look like "import time:  self [us] | cumulative | imported package"
+  times: dict[str, int] = {}
+  for line in completed.stderr.splitlines():
+    fields = line.removeprefix("import time:").split("|")
+    if len(fields) == 3 and fields[1].strip().isdigit():  # noqa: PLR2004
+      times[fields[2].strip()] = int(fields[1])
+  return times
+
+
+def test_cli_starts_without_heavy_dependencies() -> None:
+  times = import_times("cli")
+
+  heavy = [name for name in times if name.startswith((*AWS_MODULE_PREFIXES, "pydantic"))]
+  assert heavy == []
+  assert times["cli"] < CLI_IMPORT_BUDGET_MICROSECONDS
+
+
+@pytest.mark.parametrize(
+  "module",
+  [
+    "setup_account_directories",
+    "setup_terraform_backend",
+    "setup_terraform_account_roles",
+    "setup_terragrunt_orchestrator",
+  ],
+)
+def test_scripts_import_aws_sdk_lazily(module: str) -> None:
+  assert [name for name in import_times(module) if name.startswith(AWS_MODULE_PREFIXES)] == []
+
+
+def test_commands_run_their_script(mocker: MockerFixture) -> None:
+  directories_main = mocker.patch("setup_account_directories.main")
+  orchestrator_main = mocker.patch("setup_terragrunt_orchestrator.main", return_value=1)
+
+  assert main(["directories"]) == 0
+  assert main(["directories", "--output", "summary"]) == 0
+  assert main(["plan", "--continue-on-error"]) == 1
+  assert directories_main.call_args_list == [
+    mocker.call(["--output", "verbose"]),
+    mocker.call(["--output", "summary"]),
+  ]
+  orchestrator_main.assert_called_once_with(["plan", "--continue-on-error"])
+
+
+def test_roles_and_init_pass_max_workers(mocker: MockerFixture, isolated_event_log: Path) -> None:
+  roles_main = mocker.patch("setup_terraform_account_roles.main")
+  init = mocker.patch("setup_terraform_account_roles.terragrunt_init_account_dirs", return_value=[])
+
+  assert main(["roles", "--max-workers", "4"]) == 0
+  assert main(["init", "--max-workers", "4", "--accounts-dir", "accounts"]) == 0
+
+  roles_main.assert_called_once_with(["--max-workers", "4"])
+  assert init.call_args.args == ("accounts", 4)
+
+
+def test_unknown_options_are_rejected(capsys: pytest.CaptureFixture[str]) -> None:
+  with pytest.raises(SystemExit):
+    main(["directories", "--continue-on-error"])
+
+  assert "unrecognized arguments: --continue-on-error" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("output_mode", get_args(OutputMode))
+def test_directories_accepts_every_output_mode(output_mode: OutputMode) -> None:
+  assert build_parser().parse_args(["directories", "--output", output_mode]).output == output_mode
+
+
+def test_validate_reports_missing_and_unformatted_directories(
+  tmp_path: Path, mocker: MockerFixture, test_accounts: list[Account], capsys: pytest.CaptureFixture[str]
+) -> None:
+  mocker.patch("utils.parse_ous_accounts_data.get_account_registry", return_value=AccountRegistry(test_accounts))
+  for account in test_accounts[1:]:
+    (tmp_path / account.name).mkdir()
+    (tmp_path / account.name / "terragrunt.hcl").write_text(TERRAGRUNT_HCL)
+  unformatted = tmp_path / test_accounts[1].name / "account_details.hcl"
+  unformatted.write_text("locals {\n" + "".join(f'  {field} = "value"\n' for field in ACCOUNT_DETAILS_FIELDS) + "}\n")
+
+  assert main(["validate", "--accounts-dir", str(tmp_path)]) == 1
+  output = capsys.readouterr().out
+  assert f"{test_accounts[0].name}: account directory is missing" in output
+  assert f"{unformatted}: not formatted" in output
+
+  # Freshly generated files are already formatted
+  (tmp_path / test_accounts[0].name).mkdir()
+  unformatted.write_text(ACCOUNT_DETAILS_HCL.format(**dict.fromkeys(ACCOUNT_DETAILS_FIELDS, "value")))
+  assert main(["validate", "--accounts-dir", str(tmp_path)]) == 0
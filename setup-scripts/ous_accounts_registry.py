@@ -23,6 +23,9 @@ MANAGEMENT_ACCOUNT_ID = "111111111111"
 MANAGEMENT_ACCOUNT_EMAIL = "test@gmail.com"
 # Replace with the Root OU ID of your management account
 PARENT_OU_ID = "r-test"
+# Set to True to give every OU's accounts their own Terragrunt unit and state in the management account directory,
+# instead of one state for the whole organization. Meant for new organizations, see the README before switching.
+SHARD_MANAGEMENT_STATE_BY_OU = False
 
 # ----- END REQUIRED MODIFICATIONS -----
 
@@ -1,54 +1,53 @@
+import argparse
 import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal, TypedDict, get_args
 
-from utils import config, file_ops, parse_ous_accounts_data
+from utils import config, file_ops, instrumentation, parse_ous_accounts_data
 from utils.models import Account
 
+OutputMode = Literal["verbose", "summary", "quiet"]
+
+ACCOUNT_DETAILS_FILENAME = "account_details.hcl"
+TERRAGRUNT_FILENAME = "terragrunt.hcl"
+
 TERRAGRUNT_HCL = """include {
   path = find_in_parent_folders("root.hcl")
 }
 """
 
+# Aligned like `terragrunt hclfmt` writes it, so formatting during init does not change the file and a rerun
+# finds every file unchanged
 ACCOUNT_DETAILS_HCL = """locals {{
-  account_name = "{account_name}"
-  account_id = "{account_id}"
-  organizational_unit = "{organizational_unit}"
-  aws_region = "{aws_region}"
+  account_name              = "{account_name}"
+  account_id                = "{account_id}"
+  organizational_unit       = "{organizational_unit}"
+  aws_region                = "{aws_region}"
   terraform_admin_role_name = "{terraform_admin_role_name}"
-  s3_backend_bucket_name = "{s3_backend_bucket_name}"
+  s3_backend_bucket_name    = "{s3_backend_bucket_name}"
 }}
 """
 
 
-def create_account_terragrunt_files(account_dir: str, **account_details: str) -> None:
-  account_details_filename = "account_details.hcl"
-  account_details_path = os.path.join(account_dir, account_details_filename)
+class RenderedAccountFile(TypedDict):
+  path: str
+  content: str
+  filename: str
 
-  file_ops.write_account_file(
-    account_details_path,
-    ACCOUNT_DETAILS_HCL.format(**account_details),
-    account_details_filename,
-    account_details["account_name"],
-  )
-
-  terragrunt_filename = "terragrunt.hcl"
-  terragrunt_path = os.path.join(account_dir, terragrunt_filename)
-  file_ops.write_account_file(
-    terragrunt_path,
-    TERRAGRUNT_HCL,
-    terragrunt_filename,
-    account_details["account_name"],
-  )
 
+class RenderedAccountDirectory(TypedDict):
+  account_name: str
+  path: str
+  files: list[RenderedAccountFile]
 
-def setup_account_directory(account: Account, accounts_dir: str) -> None:
-  accounts_dir = os.path.join(accounts_dir, account.name)
-  file_ops.create_directory(accounts_dir)
 
+def account_template_values(account: Account) -> dict[str, str]:
   if not account.terraform_backend_config:
     error_msg = f"Account {account.name} is missing required terraform_backend_config"
     raise ValueError(error_msg)
 
-  account_details = {
+  return {
     "account_name": account.name,
     "account_id": account.id,
     "organizational_unit": account.organizational_unit,
@@ -57,19 +56,107 @@ def setup_account_directory(account: Account, accounts_dir: str) -> None:
     "s3_backend_bucket_name": account.terraform_backend_config.s3_backend_bucket_name,
   }
 
-  create_account_terragrunt_files(str(accounts_dir), **account_details)
 
+def render_account_files(account_dir: str, account_details: dict[str, str]) -> list[RenderedAccountFile]:
+  return [
+    {
+      "path": os.path.join(account_dir, ACCOUNT_DETAILS_FILENAME),
+      "content": ACCOUNT_DETAILS_HCL.format(**account_details),
+      "filename": ACCOUNT_DETAILS_FILENAME,
+    },
+    {
+      "path": os.path.join(account_dir, TERRAGRUNT_FILENAME),
+      "content": TERRAGRUNT_HCL,
+      "filename": TERRAGRUNT_FILENAME,
+    },
+  ]
+
+
+def render_account_directory(account: Account, accounts_dir: str) -> RenderedAccountDirectory:
+  account_dir = os.path.join(accounts_dir, account.name)
+  return {
+    "account_name": account.name,
+    "path": account_dir,
+    "files": render_account_files(account_dir, account_template_values(account)),
+  }
+
+
+def create_account_terragrunt_files(account_dir: str, **account_details: str) -> list[file_ops.WriteStatus]:
+  return [
+    file_ops.write_account_file(
+      rendered_file["path"], rendered_file["content"], rendered_file["filename"], account_details["account_name"]
+    )
+    for rendered_file in render_account_files(account_dir, account_details)
+  ]
 
-def setup_all_account_directories(accounts_data: list[Account]) -> None:
-  file_ops.create_directory(config.ACCOUNTS_DIRECTORY_PATH)
 
-  for account in accounts_data:
-    setup_account_directory(account, config.ACCOUNTS_DIRECTORY_PATH)
+def write_account_directory(directory: RenderedAccountDirectory, *, verbose: bool) -> list[file_ops.WriteStatus]:
+  with instrumentation.span("write_account_directory", account=directory["account_name"]):
+    file_ops.create_directory(directory["path"], verbose=verbose)
+    return [
+      file_ops.write_account_file(
+        rendered_file["path"],
+        rendered_file["content"],
+        rendered_file["filename"],
+        directory["account_name"],
+        verbose=verbose,
+      )
+      for rendered_file in directory["files"]
+    ]
+
+
+def setup_account_directory(account: Account, accounts_dir: str) -> list[file_ops.WriteStatus]:
+  return write_account_directory(render_account_directory(account, accounts_dir), verbose=True)
+
+
+def print_write_summary(statuses: Counter[file_ops.WriteStatus], account_count: int) -> None:
+  print(
+    f"\nAccount files for {account_count} accounts: {statuses['created']} created, "
+    f"{statuses['written']} updated, {statuses['unchanged']} unchanged"
+  )
+
+
+def setup_all_account_directories(
+  accounts_data: list[Account],
+  *,
+  max_workers: int = config.MAX_WORKERS,
+  output_mode: OutputMode = "verbose",
+) -> Counter[file_ops.WriteStatus]:
+  verbose = output_mode == "verbose"
+  file_ops.create_directory(config.ACCOUNTS_DIRECTORY_PATH, verbose=verbose)
+
+  # Render every template before touching the disk, so an invalid account fails the run without a partial tree
+  with instrumentation.span("render_account_directories"):
+    directories = [render_account_directory(account, config.ACCOUNTS_DIRECTORY_PATH) for account in accounts_data]
+
+  statuses: Counter[file_ops.WriteStatus] = Counter()
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    for directory_statuses in executor.map(
+      lambda directory: write_account_directory(directory, verbose=verbose), directories
+    ):
+      statuses.update(directory_statuses)
+
+  if output_mode != "quiet":
+    print_write_summary(statuses, len(accounts_data))
+  return statuses
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(description="Generate the account directories and their Terragrunt files")
+  parser.add_argument(
+    "--output",
+    choices=get_args(OutputMode),
+    default="verbose",
+    help="verbose prints every directory and file, summary only the totals, quiet nothing (default: verbose)",
+  )
+  return parser.parse_args(argv)
 
 
-def main() -> None:
-  accounts_data = parse_ous_accounts_data.get_accounts_data()
-  setup_all_account_directories(accounts_data)
+def main(argv: list[str] | None = None) -> None:
+  args = parse_args(argv)
+  with instrumentation.run("setup_account_directories"):
+    registry = parse_ous_accounts_data.get_account_registry()
+    setup_all_account_directories(registry.accounts, output_mode=args.output)
 
 
 if __name__ == "__main__":
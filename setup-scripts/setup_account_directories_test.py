@@ -7,15 +7,18 @@ import pytest
 from pytest_mock import MockerFixture
 
 from setup_account_directories import (
+  OutputMode,
   create_account_terragrunt_files,
   main,
   setup_account_directory,
   setup_all_account_directories,
 )
+from setup_terraform_account_roles import update_account_ids
 
 # ignoring unused imports from conftest, injected via fixtures
 from tests.conftest import (  # noqa: F401
   account_details_content,
+  isolated_event_log,
   terraform_config,
   terragrunt_content,
   test_account,
@@ -24,9 +27,13 @@ from tests.conftest import (  # noqa: F401
   test_accounts,
   test_data,
 )
+from utils import file_ops
+from utils.account_registry import AccountRegistry
+from utils.hclfmt import format_tree
 from utils.models import Account, TerraformBackendConfig
 
 FILES_PER_ACCOUNT = 2
+EXPECTED_OUTPUT_LINES = {"summary": 1, "quiet": 0}
 
 
 def test_create_terragrunt_files(
@@ -99,9 +106,9 @@ def test_end_to_end_setup(tmp_path: Path, mocker: MockerFixture, test_accounts:
 
   setup_all_account_directories(test_accounts)
 
-  mock_dir.assert_has_calls([mocker.call(str(tmp_path))])
+  mock_dir.assert_has_calls([mocker.call(str(tmp_path), verbose=True)])
   for account in test_accounts:
-    mock_dir.assert_has_calls([mocker.call(str(Path(tmp_path) / account.name))])
+    mock_dir.assert_has_calls([mocker.call(str(Path(tmp_path) / account.name), verbose=True)])
   assert mock_dir.call_count == len(test_accounts) + 1
 
   assert mock_write.call_count == len(test_accounts) * FILES_PER_ACCOUNT
@@ -132,11 +139,91 @@ def test_setup_all_account_directories_empty(tmp_path: Path, mocker: MockerFixtu
 
 
 def test_main_function(mocker: MockerFixture) -> None:
-  mock_get_data = mocker.patch("setup_account_directories.parse_ous_accounts_data.get_accounts_data")
+  mock_get_registry = mocker.patch("setup_account_directories.parse_ous_accounts_data.get_account_registry")
   mock_setup = mocker.patch("setup_account_directories.setup_all_account_directories")
-  mock_get_data.return_value = []
+  mock_get_registry.return_value = AccountRegistry([])
 
-  main()
+  main([])
+  main(["--output", "quiet"])
 
-  mock_get_data.assert_called_once_with()
-  mock_setup.assert_called_once_with([])
+  assert mock_get_registry.call_count == len(mock_setup.call_args_list)
+  assert mock_setup.call_args_list == [
+    mocker.call([], output_mode="verbose"),
+    mocker.call([], output_mode="quiet"),
+  ]
+
+
+def test_setup_all_account_directories_rerun_is_unchanged(
+  tmp_path: Path, mocker: MockerFixture, test_accounts: list[Account]
+) -> None:
+  mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(tmp_path))
+
+  first_run = setup_all_account_directories(test_accounts)
+  second_run = setup_all_account_directories(test_accounts)
+
+  assert first_run["created"] == len(test_accounts) * FILES_PER_ACCOUNT
+  assert second_run["unchanged"] == len(test_accounts) * FILES_PER_ACCOUNT
+  assert second_run["created"] == second_run["written"] == 0
+
+
+def test_regenerating_a_formatted_tree_is_unchanged(
+  tmp_path: Path, mocker: MockerFixture, test_accounts: list[Account]
+) -> None:
+  mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(tmp_path))
+  setup_all_account_directories(test_accounts, output_mode="quiet")
+
+  # terragrunt init formats every account directory in place before it runs
+  assert [result["path"] for result in format_tree(str(tmp_path)) if result["changed"]] == []
+  rerun = setup_all_account_directories(test_accounts, output_mode="quiet")
+
+  assert rerun["unchanged"] == len(test_accounts) * FILES_PER_ACCOUNT
+
+
+def test_full_setup_cycle_rewrites_nothing(tmp_path: Path, mocker: MockerFixture, test_accounts: list[Account]) -> None:
+  mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(tmp_path))
+  # Accounts are generated before they exist, then the roles script fills in their IDs and init formats the tree
+  setup_all_account_directories(
+    [account.model_copy(update={"id": ""}) for account in test_accounts], output_mode="quiet"
+  )
+  update_account_ids({account.name: account.id for account in test_accounts}, str(tmp_path))
+  format_tree(str(tmp_path))
+  atomic_write = mocker.spy(file_ops, "atomic_write")
+
+  # The registry now has the IDs, so regenerating matches what is on disk
+  rerun = setup_all_account_directories(test_accounts, output_mode="quiet")
+
+  assert rerun["unchanged"] == len(test_accounts) * FILES_PER_ACCOUNT
+  atomic_write.assert_not_called()
+
+
+@pytest.mark.parametrize("output_mode", ["summary", "quiet"])
+def test_setup_all_account_directories_output_modes(
+  tmp_path: Path,
+  mocker: MockerFixture,
+  test_accounts: list[Account],
+  capsys: pytest.CaptureFixture[str],
+  output_mode: OutputMode,
+) -> None:
+  mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(tmp_path))
+
+  statuses = setup_all_account_directories(test_accounts, max_workers=4, output_mode=output_mode)
+
+  assert statuses["created"] == len(test_accounts) * FILES_PER_ACCOUNT
+  assert len(capsys.readouterr().out.strip().splitlines()) == EXPECTED_OUTPUT_LINES[output_mode]
+
+
+def test_setup_all_account_directories_validates_before_writing(
+  tmp_path: Path, mocker: MockerFixture, test_accounts: list[Account], test_account: Account
+) -> None:
+  mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(tmp_path))
+  invalid_account = Account.model_construct(
+    id=test_account.id,
+    name="invalid-account",
+    organizational_unit=test_account.organizational_unit,
+    terraform_backend_config=None,
+  )
+
+  with pytest.raises(ValueError, match="Account invalid-account is missing required terraform_backend_config"):
+    setup_all_account_directories([*test_accounts, invalid_account])
+
+  assert list(tmp_path.iterdir()) == []
@@ -1,22 +1,40 @@
+import argparse
 import json
 import os
 import subprocess
-from typing import TYPE_CHECKING, TypedDict
-
-import boto3
-from botocore.exceptions import ClientError
-from mypy_boto3_iam.client import IAMClient
-from mypy_boto3_sts.type_defs import CredentialsTypeDef
-
-from utils import config, parse_ous_accounts_data
-
+import time
+from collections import Counter
+from collections.abc import Collection
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Literal, TypedDict
+
+from utils import (
+  account_details,
+  aws_clients,
+  config,
+  credentials_cache,
+  file_ops,
+  hclfmt,
+  init_fingerprint,
+  instrumentation,
+  org_inventory,
+  parse_ous_accounts_data,
+  rate_limit,
+  reconcile,
+)
+from utils.account_discovery import AccountDirectoryIndex
+
+# botocore and the boto3 stubs are only imported where AWS is called, so the offline steps start quickly
 if TYPE_CHECKING:
+  from botocore.credentials import Credentials
+  from mypy_boto3_iam.client import IAMClient
   from mypy_boto3_sts.client import STSClient
-  from mypy_boto3_sts.type_defs import AssumeRoleResponseTypeDef
+  from mypy_boto3_sts.type_defs import AssumeRoleResponseTypeDef, CredentialsTypeDef
 
   from utils.models import ManagementAccountDetails, TerraformBackendConfig
 
 ROLE_SESSION_NAME = "TerragruntSession"
+ORG_ACCOUNT_ACCESS_ROLE_NAME = "OrganizationAccountAccessRole"
 TERRAFORM_ADMIN_POLICY_NAME = "TerraformAdmin"
 ACCOUNT_DETAILS_FILENAME = "account_details.hcl"
 TERRAGRUNT_HCL_FILENAME = "terragrunt.hcl"
@@ -27,39 +45,84 @@ TERRAFORM_ADMIN_POLICY_DOCUMENT = {
 }
 
 
+RoleCreationStatus = Literal["created", "updated", "existed", "failed"]
+
+
+class RoleCreationResult(TypedDict):
+  account_name: str
+  account_id: str
+  status: RoleCreationStatus
+  error: str | None
+
+
+class AccountRolePlan(TypedDict):
+  account_name: str
+  account_id: str
+  actions: list[reconcile.PlannedAction]
+  error: str | None
+
+
+AccountIdUpdateStatus = Literal["updated", "unchanged", "unmatched", "skipped"]
+
+
+class AccountIdUpdateResult(TypedDict):
+  account_name: str
+  status: AccountIdUpdateStatus
+
+
+class TerragruntInitResult(TypedDict):
+  directory: str
+  succeeded: bool
+  skipped: bool
+  duration_seconds: float
+  stdout: str
+  stderr: str
+  error: str | None
+
+
 class RoleAssumptionError(ValueError):
   def __init__(self, account_id: str) -> None:
     super().__init__(f"Error assuming role in account {account_id}")
 
 
-def get_aws_org_accounts() -> dict[str, str]:
-  org_client = boto3.client("organizations")
-  accounts: dict[str, str] = {}
+def get_aws_org_inventory(
+  management_account_id: str, expected_names: Collection[str] = (), *, membership: bool = False
+) -> list[org_inventory.OrgAccount]:
+  from botocore.exceptions import ClientError
 
   try:
-    paginator = org_client.get_paginator("list_accounts")
-    for page in paginator.paginate():
-      for account in page["Accounts"]:
-        accounts[account["Name"]] = account["Id"]
+    inventory = org_inventory.get_org_inventory(management_account_id, expected_names, membership=membership)
   except ClientError as e:
     error_msg = f"Error retrieving accounts: {e}"
     print(error_msg)
     raise ValueError(error_msg) from e
 
-  if not accounts:
+  if not inventory:
     error_msg = "No accounts found in the organization"
     raise ValueError(error_msg)
-  return accounts
+  return inventory
+
+
+def get_aws_org_accounts(management_account_id: str, expected_names: Collection[str] = ()) -> dict[str, str]:
+  return org_inventory.account_ids(get_aws_org_inventory(management_account_id, expected_names))
+
+
+def org_account_access_role_arn(account_id: str) -> str:
+  return f"arn:aws:iam::{account_id}:role/{ORG_ACCOUNT_ACCESS_ROLE_NAME}"
 
 
-def assume_org_account_access_role(account_id: str) -> CredentialsTypeDef:
-  sts_client: STSClient = boto3.client("sts")
-  role_name: str = "OrganizationAccountAccessRole"
-  role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
+def request_org_account_access_role_credentials(account_id: str) -> "CredentialsTypeDef":
+  from botocore.exceptions import ClientError
+
+  sts_client: STSClient = aws_clients.get_client("sts")
+  role_arn = org_account_access_role_arn(account_id)
 
   try:
-    response: AssumeRoleResponseTypeDef = sts_client.assume_role(RoleArn=role_arn, RoleSessionName=ROLE_SESSION_NAME)
-    print(f"Assumed role {role_name} in account {account_id}")
+    with instrumentation.span("assume_role", account=account_id):
+      response: AssumeRoleResponseTypeDef = rate_limit.retry_throttled(
+        lambda: sts_client.assume_role(RoleArn=role_arn, RoleSessionName=ROLE_SESSION_NAME)
+      )
+    print(f"Assumed role {ORG_ACCOUNT_ACCESS_ROLE_NAME} in account {account_id}")
   except ClientError as e:
     raise RoleAssumptionError(account_id) from e
   else:
@@ -71,13 +134,22 @@ def assume_org_account_access_role(account_id: str) -> CredentialsTypeDef:
     }
 
 
-def new_iam_client(credentials: CredentialsTypeDef) -> IAMClient:
-  client: IAMClient = boto3.client(
-    "iam",
-    aws_access_key_id=credentials["AccessKeyId"],
-    aws_secret_access_key=credentials["SecretAccessKey"],
-    aws_session_token=credentials["SessionToken"],
+def assume_org_account_access_role(account_id: str) -> "CredentialsTypeDef":
+  cache_key = credentials_cache.credentials_cache_key(account_id, org_account_access_role_arn(account_id))
+  return credentials_cache.get_credentials_cache().get_or_fetch(
+    cache_key, lambda: request_org_account_access_role_credentials(account_id)
+  )
+
+
+def org_account_credentials(account_id: str) -> "Credentials":
+  cache_key = credentials_cache.credentials_cache_key(account_id, org_account_access_role_arn(account_id))
+  return credentials_cache.get_credentials_cache().refreshable(
+    cache_key, lambda: request_org_account_access_role_credentials(account_id)
   )
+
+
+def new_iam_client(credentials: "Credentials", account_id: str | None = None) -> "IAMClient":
+  client: IAMClient = aws_clients.get_client("iam", credentials=credentials, identity=account_id)
   return client
 
 
@@ -101,13 +173,20 @@ def terraform_admin_role_trust_policy(
   }
 
 
-def create_iam_role(iam_client: IAMClient, role_name: str, trust_policy: TrustPolicyDocument) -> bool:
+def create_iam_role(iam_client: "IAMClient", role_name: str, trust_policy: TrustPolicyDocument) -> bool:
+  from botocore.exceptions import ClientError
+
   try:
-    iam_client.create_role(RoleName=role_name, AssumeRolePolicyDocument=json.dumps(trust_policy))
+    rate_limit.retry_throttled(
+      lambda: iam_client.create_role(RoleName=role_name, AssumeRolePolicyDocument=json.dumps(trust_policy))
+    )
   except ClientError as e:
     if e.response["Error"]["Code"] == "EntityAlreadyExists":
       print(f"Role {role_name} already exists, skipping...")
       return False
+    # Throttling that outlasted every retry is reported as such, not as a broken account
+    if rate_limit.is_throttling_error(e):
+      raise
     error_msg = f"Error creating IAM role {role_name}: {e}"
     print(error_msg)
     raise ValueError(error_msg) from e
@@ -116,131 +195,405 @@ def create_iam_role(iam_client: IAMClient, role_name: str, trust_policy: TrustPo
     return True
 
 
-def attach_exclusive_inline_policy(iam_client: IAMClient, role_name: str) -> None:
+def attach_exclusive_inline_policy(iam_client: "IAMClient", role_name: str) -> None:
+  from botocore.exceptions import ClientError
+
   try:
-    iam_client.put_role_policy(
-      RoleName=role_name,
-      PolicyName=TERRAFORM_ADMIN_POLICY_NAME,
-      PolicyDocument=json.dumps(TERRAFORM_ADMIN_POLICY_DOCUMENT),
+    rate_limit.retry_throttled(
+      lambda: iam_client.put_role_policy(
+        RoleName=role_name,
+        PolicyName=TERRAFORM_ADMIN_POLICY_NAME,
+        PolicyDocument=json.dumps(TERRAFORM_ADMIN_POLICY_DOCUMENT),
+      )
     )
     print(f"Attached exclusive inline policy to role {role_name}")
   except ClientError as e:
+    # A role left without its policy after a throttled fan-out must fail the account, not just warn
+    if rate_limit.is_throttling_error(e):
+      raise
     print(f"Warning: Failed to attach inline policy for role {role_name}: {e}")
 
 
-def create_terraform_admin_role(account_id: str, management_account_id: str, role_name: str) -> bool:
-  credentials = assume_org_account_access_role(account_id)
-  iam_client = new_iam_client(credentials)
+def update_role_trust_policy(iam_client: "IAMClient", role_name: str, trust_policy: TrustPolicyDocument) -> None:
+  rate_limit.retry_throttled(
+    lambda: iam_client.update_assume_role_policy(RoleName=role_name, PolicyDocument=json.dumps(trust_policy))
+  )
+  print(f"Updated trust policy of role {role_name}")
+
+
+def plan_terraform_admin_role(
+  account_id: str, management_account_id: str, role_name: str
+) -> list[reconcile.PlannedAction]:
+  # Reading needs credentials in the account as well, but those come from the credentials cache on re-runs
+  iam_client = new_iam_client(org_account_credentials(account_id), account_id)
+  with instrumentation.span("read_role", account=account_id):
+    state = reconcile.read_role_state(iam_client, role_name, TERRAFORM_ADMIN_POLICY_NAME)
+  return reconcile.plan_role(
+    account_id,
+    role_name,
+    state,
+    terraform_admin_role_trust_policy(management_account_id),
+    TERRAFORM_ADMIN_POLICY_NAME,
+    TERRAFORM_ADMIN_POLICY_DOCUMENT,
+  )
+
+
+def apply_terraform_admin_role_actions(
+  account_id: str, management_account_id: str, role_name: str, actions: list[reconcile.PlannedAction]
+) -> RoleCreationStatus:
+  if not actions:
+    return "existed"
+
+  iam_client = new_iam_client(org_account_credentials(account_id), account_id)
   trust_policy = terraform_admin_role_trust_policy(management_account_id)
-  was_created = create_iam_role(iam_client, role_name, trust_policy)
-  if was_created:
-    attach_exclusive_inline_policy(iam_client, role_name)
-  return was_created
+  was_created = False
+  for action in actions:
+    with instrumentation.span(action["action"], account=account_id):
+      if action["action"] == "create_role":
+        was_created = create_iam_role(iam_client, role_name, trust_policy)
+      elif action["action"] == "update_trust_policy":
+        update_role_trust_policy(iam_client, role_name, trust_policy)
+      elif action["action"] == "attach_policy":
+        attach_exclusive_inline_policy(iam_client, role_name)
+  return "created" if was_created else "updated"
+
 
+def create_terraform_admin_role(account_id: str, management_account_id: str, role_name: str) -> RoleCreationStatus:
+  actions = plan_terraform_admin_role(account_id, management_account_id, role_name)
+  return apply_terraform_admin_role_actions(account_id, management_account_id, role_name, actions)
 
-def update_account_ids(accounts: dict[str, str], accounts_dir: str) -> None:
-  account_dirs = [d for d in os.listdir(accounts_dir) if os.path.isdir(os.path.join(accounts_dir, d))]
 
-  for dir_name in account_dirs:
-    account_details_path = os.path.join(accounts_dir, dir_name, ACCOUNT_DETAILS_FILENAME)
-    if not os.path.exists(account_details_path):
+def update_account_id(account_details_path: str, account_name: str, aws_account_id: str) -> AccountIdUpdateResult:
+  with open(account_details_path, "rb") as file:
+    content = file.read()
+
+  try:
+    updated_content = account_details.replace_locals_string_attribute(content, "account_id", aws_account_id)
+  except account_details.AttributeNotFoundError:
+    print(f"No account_id attribute found in {account_name}/{ACCOUNT_DETAILS_FILENAME}, skipping")
+    return {"account_name": account_name, "status": "skipped"}
+
+  if updated_content == content:
+    return {"account_name": account_name, "status": "unchanged"}
+
+  file_ops.atomic_write(account_details_path, updated_content, preserve_mode=True)
+  print(f"Updated account ID for {account_name}")
+  return {"account_name": account_name, "status": "updated"}
+
+
+def update_account_ids(
+  accounts: dict[str, str],
+  accounts_dir: str,
+  index: AccountDirectoryIndex | None = None,
+  max_workers: int = config.MAX_WORKERS,
+) -> list[AccountIdUpdateResult]:
+  index = index or AccountDirectoryIndex.build(accounts_dir)
+
+  results: list[AccountIdUpdateResult] = []
+  targets: list[tuple[str, str, str]] = []
+  for dir_name in index.accounts:
+    if not index.has_file(dir_name, ACCOUNT_DETAILS_FILENAME):
       print(f"No account_details.hcl found in {dir_name}, skipping")
+      results.append({"account_name": dir_name, "status": "skipped"})
       continue
 
     aws_account_id = accounts.get(dir_name)
     if not aws_account_id:
       print(f"No matching AWS account found for directory: {dir_name}")
+      results.append({"account_name": dir_name, "status": "unmatched"})
       continue
+    targets.append((index.account_file_path(dir_name, ACCOUNT_DETAILS_FILENAME), dir_name, aws_account_id))
 
-    with open(account_details_path) as file:
-      content = file.read()
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    results.extend(executor.map(lambda target: update_account_id(*target), targets))
 
-    updated_content = []
-    for line in content.splitlines():
-      if "account_id" in line:
-        updated_content.append(f'  account_id = "{aws_account_id}"')
-      else:
-        updated_content.append(line)
+  statuses = Counter(result["status"] for result in results)
+  print(
+    f"\nAccount IDs: {statuses['updated']} updated, {statuses['unchanged']} unchanged, "
+    f"{statuses['unmatched']} unmatched, {statuses['skipped']} skipped"
+  )
+  return results
 
-    with open(account_details_path, "w") as file:
-      file.write("\n".join(updated_content))
 
-    print(f"Updated account ID for {dir_name}")
+def plan_account_terraform_admin_role(
+  account_name: str,
+  account_id: str,
+  management_account_id: str,
+  role_name: str,
+) -> AccountRolePlan:
+  try:
+    actions = plan_terraform_admin_role(account_id, management_account_id, role_name)
+  except Exception as e:
+    print(f"Error reading {role_name} role in {account_name}: {e}")
+    return {"account_name": account_name, "account_id": account_id, "actions": [], "error": str(e)}
+  return {"account_name": account_name, "account_id": account_id, "actions": actions, "error": None}
 
 
-def create_terraform_admin_roles(
+def apply_account_terraform_admin_role(
+  plan: AccountRolePlan, management_account_id: str, role_name: str
+) -> RoleCreationResult:
+  account_name = plan["account_name"]
+  account_id = plan["account_id"]
+  if plan["error"] is not None:
+    return {"account_name": account_name, "account_id": account_id, "status": "failed", "error": plan["error"]}
+
+  try:
+    status = apply_terraform_admin_role_actions(account_id, management_account_id, role_name, plan["actions"])
+  except Exception as e:
+    print(f"Error creating {role_name} role in {account_name}: {e}")
+    return {"account_name": account_name, "account_id": account_id, "status": "failed", "error": str(e)}
+  return {"account_name": account_name, "account_id": account_id, "status": status, "error": None}
+
+
+def print_role_creation_summary(results: list[RoleCreationResult], role_name: str) -> None:
+  counts = Counter(result["status"] for result in results)
+  print(
+    f"\n{role_name} roles: {counts['created']} created, {counts['updated']} updated, "
+    f"{counts['existed']} already up to date, {counts['failed']} failed"
+  )
+  for result in results:
+    if result["status"] == "failed":
+      failure = f"{result['account_name']} ({result['account_id']}): {result['error']}"
+      print(f"{config.Colors.RED}  {failure}{config.Colors.RESET}")
+
+
+def create_terraform_admin_roles(  # noqa: PLR0913
   accounts: dict[str, str],
   management_account_id: str,
   role_name: str,
   accounts_dir: str,
-) -> None:
-  account_dirs = [d for d in os.listdir(accounts_dir) if os.path.isdir(os.path.join(accounts_dir, d))]
-
-  for dir_name in account_dirs:
-    account_details_path = os.path.join(accounts_dir, dir_name, ACCOUNT_DETAILS_FILENAME)
-    if not os.path.exists(account_details_path):
+  *,
+  max_workers: int = config.MAX_WORKERS,
+  index: AccountDirectoryIndex | None = None,
+) -> list[RoleCreationResult]:
+  index = index or AccountDirectoryIndex.build(accounts_dir)
+
+  targets: list[tuple[str, str]] = []
+  for dir_name in index.accounts:
+    if not index.has_file(dir_name, ACCOUNT_DETAILS_FILENAME):
       continue
 
     aws_account_id = accounts.get(dir_name)
     if not aws_account_id:
       print(f"No matching AWS account found for directory: {dir_name}")
       continue
+    targets.append((dir_name, aws_account_id))
+
+  # Every account is read before anything is changed, so the whole plan is shown up front and a
+  # steady-state re-run makes only read calls
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    plans = list(
+      executor.map(
+        lambda target: plan_account_terraform_admin_role(target[0], target[1], management_account_id, role_name),
+        targets,
+      )
+    )
+    reconcile.print_plan([action for plan in plans for action in plan["actions"]])
+    results = list(
+      executor.map(lambda plan: apply_account_terraform_admin_role(plan, management_account_id, role_name), plans)
+    )
 
-    try:
-      create_terraform_admin_role(aws_account_id, management_account_id, role_name)
-    except Exception as e:
-      print(f"Error creating {role_name} role in {dir_name}: {e}")
+  print_role_creation_summary(results, role_name)
+  return results
 
 
-def find_terragrunt_directories(base_dir: str) -> list[str]:
-  return [
-    os.path.join(root, dir_name)
-    for root, dirs, _ in os.walk(base_dir)
-    for dir_name in dirs
-    if os.path.exists(os.path.join(root, dir_name, TERRAGRUNT_HCL_FILENAME))
-  ]
+def find_terragrunt_directories(base_dir: str, index: AccountDirectoryIndex | None = None) -> list[str]:
+  index = index or AccountDirectoryIndex.build(base_dir)
+  return index.directories_with_file(TERRAGRUNT_HCL_FILENAME)
 
 
-def terragrunt_init_account_dirs(base_dir: str) -> None:
-  terragrunt_dirs = find_terragrunt_directories(base_dir)
+def terragrunt_environment() -> dict[str, str]:
+  env = os.environ.copy()
+  env.setdefault("TF_PLUGIN_CACHE_DIR", str(config.TERRAFORM_PLUGIN_CACHE_PATH))
+  # Output is captured per directory, so an interactive prompt would hang the worker instead of reaching the user
+  env.setdefault("TF_INPUT", "0")
+  os.makedirs(env["TF_PLUGIN_CACHE_DIR"], exist_ok=True)
+  return env
 
-  for dir_path in terragrunt_dirs:
-    try:
-      subprocess.run(
-        ["terragrunt", "hclfmt"],
-        cwd=dir_path,
-        check=True,
-        capture_output=True,
-      )
-      print(f"Formatted HCL files in {dir_path}")
 
-      subprocess.run(
-        ["terragrunt", "init"],
-        cwd=dir_path,
-        check=True,
-      )
-      print(f"Initialized Terragrunt in {dir_path}")
-    except subprocess.CalledProcessError as e:
-      print(f"Error formatting and initializing Terragrunt in {dir_path}: {e}")
+def terragrunt_init_account_dir(dir_path: str, env: dict[str, str]) -> TerragruntInitResult:
+  start = time.perf_counter()
+  stdout: list[str] = []
+  stderr: list[str] = []
+  error = None
+
+  account = os.path.relpath(dir_path, config.ACCOUNTS_DIRECTORY_PATH)
+
+  try:
+    # The generated files are formatted in-process, terragrunt is only started for files hclfmt cannot handle
+    with instrumentation.span("hclfmt", account=account):
+      format_errors = [
+        f"{result['path']}: {result['error']}" for result in hclfmt.format_tree(dir_path) if result["error"]
+      ]
+    if format_errors:
+      error = f"Formatting failed for {'; '.join(format_errors)}"
+    else:
+      with instrumentation.span("init", account=account):
+        completed = subprocess.run(
+          ["terragrunt", "init"], cwd=dir_path, check=True, capture_output=True, text=True, env=env
+        )
+      stdout.append(completed.stdout)
+      stderr.append(completed.stderr)
+  except subprocess.CalledProcessError as e:
+    stdout.append(e.stdout or "")
+    stderr.append(e.stderr or "")
+    error = str(e)
+  except OSError as e:
+    error = str(e)
+
+  if error is None:
+    init_fingerprint.record_init_fingerprint(dir_path)
+
+  return {
+    "directory": dir_path,
+    "succeeded": error is None,
+    "skipped": False,
+    "duration_seconds": time.perf_counter() - start,
+    "stdout": "".join(stdout),
+    "stderr": "".join(stderr),
+    "error": error,
+  }
 
 
-def main() -> None:
-  aws_org_accounts = get_aws_org_accounts()
-  accounts_dir = config.ACCOUNTS_DIRECTORY_PATH
+def skipped_terragrunt_init_result(dir_path: str) -> TerragruntInitResult:
+  return {
+    "directory": dir_path,
+    "succeeded": True,
+    "skipped": True,
+    "duration_seconds": 0.0,
+    "stdout": "",
+    "stderr": "",
+    "error": None,
+  }
+
+
+def print_terragrunt_init_result(result: TerragruntInitResult) -> None:
+  if result["skipped"]:
+    print(f"Skipped Terragrunt init in {result['directory']}, already initialized with unchanged inputs")
+    return
+  if result["succeeded"]:
+    print(f"Formatted and initialized Terragrunt in {result['directory']} ({result['duration_seconds']:.1f}s)")
+    return
+  error_msg = f"Error formatting and initializing Terragrunt in {result['directory']}: {result['error']}"
+  print(f"{config.Colors.RED}{error_msg}{config.Colors.RESET}")
+  if result["stderr"]:
+    print(result["stderr"].rstrip())
+
+
+def print_terragrunt_init_summary(results: list[TerragruntInitResult], slowest_count: int = 5) -> None:
+  failures = [result for result in results if not result["succeeded"]]
+  skipped = [result for result in results if result["skipped"]]
+  initialized = [result for result in results if not result["skipped"]]
+  total_seconds = sum(result["duration_seconds"] for result in initialized)
+  print(
+    f"\nTerragrunt init: {len(initialized) - len(failures)} succeeded, {len(failures)} failed, "
+    f"{len(skipped)} skipped ({total_seconds:.1f}s of init time across {len(initialized)} directories)"
+  )
 
-  update_account_ids(aws_org_accounts, accounts_dir)
+  for result in sorted(initialized, key=lambda result: result["duration_seconds"], reverse=True)[:slowest_count]:
+    print(f"  {result['duration_seconds']:6.1f}s  {result['directory']}")
 
-  management_account_details: ManagementAccountDetails = parse_ous_accounts_data.get_management_account_details()
-  terraform_backend_config: TerraformBackendConfig = parse_ous_accounts_data.get_terraform_backend_config()
+  for result in failures:
+    print(f"{config.Colors.RED}  Failed: {result['directory']}: {result['error']}{config.Colors.RESET}")
 
-  create_terraform_admin_roles(
-    aws_org_accounts,
-    management_account_details.id,
-    terraform_backend_config.terraform_admin_role_name,
-    accounts_dir,
+
+def init_is_current_after_formatting(dir_path: str) -> bool:
+  if init_fingerprint.init_is_current(dir_path):
+    return True
+  # The fingerprint is recorded after init formatted the files, so files written unformatted since then, e.g. by
+  # hand, are compared in the form init would fingerprint
+  if any(result["changed"] for result in hclfmt.format_tree(dir_path)):
+    return init_fingerprint.init_is_current(dir_path)
+  return False
+
+
+def terragrunt_init_account_dirs(
+  base_dir: str,
+  max_workers: int = config.MAX_WORKERS,
+  *,
+  force: bool = config.FORCE_TERRAGRUNT_INIT,
+  index: AccountDirectoryIndex | None = None,
+) -> list[TerragruntInitResult]:
+  results: list[TerragruntInitResult] = []
+  terragrunt_dirs = []
+  for dir_path in find_terragrunt_directories(base_dir, index):
+    if not force and init_is_current_after_formatting(dir_path):
+      skipped_result = skipped_terragrunt_init_result(dir_path)
+      print_terragrunt_init_result(skipped_result)
+      results.append(skipped_result)
+    else:
+      terragrunt_dirs.append(dir_path)
+
+  if not terragrunt_dirs:
+    print_terragrunt_init_summary(results)
+    return results
+
+  env = terragrunt_environment()
+
+  # Terraform's plugin cache is not safe for concurrent writers. Directories are initialized one at a time until
+  # one succeeds and has downloaded the providers, after which the remaining inits only read from the warmed cache.
+  # A failed init may have left the cache cold, so the next directory warms it instead.
+  warmed_count = 0
+  for dir_path in terragrunt_dirs:
+    warming_result = terragrunt_init_account_dir(dir_path, env)
+    print_terragrunt_init_result(warming_result)
+    results.append(warming_result)
+    warmed_count += 1
+    if warming_result["succeeded"]:
+      break
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    futures = [
+      executor.submit(terragrunt_init_account_dir, dir_path, env) for dir_path in terragrunt_dirs[warmed_count:]
+    ]
+    for future in as_completed(futures):
+      result = future.result()
+      print_terragrunt_init_result(result)
+      results.append(result)
+
+  print_terragrunt_init_summary(results)
+  return results
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    description="Fill in account IDs, create the Terraform admin role in every account and run terragrunt init"
   )
+  parser.add_argument("--max-workers", type=int, default=config.MAX_WORKERS, help="Accounts to set up at once")
+  return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+  args = parse_args(argv)
+  aws_clients.use_max_pool_connections(args.max_workers)
+  with instrumentation.run("setup_terraform_account_roles"):
+    management_account_details: ManagementAccountDetails = parse_ous_accounts_data.get_management_account_details()
+    terraform_backend_config: TerraformBackendConfig = parse_ous_accounts_data.get_terraform_backend_config()
+    accounts_dir = config.ACCOUNTS_DIRECTORY_PATH
+    index = AccountDirectoryIndex.build(accounts_dir)
+
+    # Only registry accounts are expected in the organization, other directories under accounts/ would make
+    # every run refetch the inventory
+    expected_names = [account.name for account in parse_ous_accounts_data.get_account_registry()]
+    with instrumentation.span("list_org_accounts"):
+      inventory = get_aws_org_inventory(management_account_details.id, expected_names)
+
+    with instrumentation.span("update_account_ids"):
+      update_account_ids(org_inventory.account_ids(inventory), accounts_dir, index)
+
+    # Suspended and closing accounts cannot be assumed into, so no roles are created there
+    with instrumentation.span("create_terraform_admin_roles"):
+      create_terraform_admin_roles(
+        org_inventory.account_ids(inventory, active_only=True),
+        management_account_details.id,
+        terraform_backend_config.terraform_admin_role_name,
+        accounts_dir,
+        max_workers=args.max_workers,
+        index=index,
+      )
 
-  terragrunt_init_account_dirs(accounts_dir)
+    with instrumentation.span("terragrunt_init"):
+      terragrunt_init_account_dirs(accounts_dir, args.max_workers, index=index)
 
 
 if __name__ == "__main__":
@@ -2,12 +2,16 @@
 # ruff: noqa: F811
 
 import json
-from collections.abc import Generator
+import os
+import re
+import subprocess
+from collections.abc import Callable, Generator
 from pathlib import Path
 from typing import TYPE_CHECKING
 from unittest.mock import MagicMock
 
 import pytest
+from botocore.credentials import Credentials
 from botocore.exceptions import ClientError
 from mypy_boto3_iam.client import IAMClient
 from mypy_boto3_organizations.client import OrganizationsClient
@@ -18,8 +22,10 @@ from pytest_mock import MockerFixture
 if TYPE_CHECKING:
   from mypy_boto3_organizations.type_defs import AccountTypeDef
 
+from setup_account_directories import setup_all_account_directories
 from setup_terraform_account_roles import (
   RoleAssumptionError,
+  RoleCreationStatus,
   TrustPolicyDocument,
   assume_org_account_access_role,
   attach_exclusive_inline_policy,
@@ -36,6 +42,9 @@ from setup_terraform_account_roles import (
 # ignoring unused imports from conftest, injected via fixtures
 from tests.conftest import (  # noqa: F401
   EXPECTED_ADMIN_ROLE_COUNT,
+  isolated_credentials_cache,
+  isolated_event_log,
+  isolated_org_inventory,
   terraform_config,
   test_account,
   test_account_data,
@@ -45,22 +54,27 @@ from tests.conftest import (  # noqa: F401
   test_data,
   test_trust_policy,
 )
+from utils import org_inventory
+from utils.account_registry import AccountRegistry
 from utils.models import Account
+from utils.reconcile import PlannedAction
 
 EXPECTED_TERRAGRUNT_CALLS = 2
+EXPECTED_FORCED_INIT_CALLS = 2
+EXPECTED_INIT_DIRECTORIES = 3
 
 
 @pytest.fixture
 def mock_boto3(mocker: MockerFixture) -> Generator[MagicMock, None, None]:
-  mock_client = mocker.patch("boto3.client")
+  mock_client = mocker.patch("utils.aws_clients.get_client")
   mock_clients: dict[str, MagicMock] = {}
 
   def get_client(
     service_name: str,
     *,
-    aws_access_key_id: str = "",
-    aws_secret_access_key: str = "",
-    aws_session_token: str = "",
+    region_name: str | None = None,
+    credentials: Credentials | None = None,
+    identity: str | None = None,
   ) -> MagicMock:
     if service_name not in mock_clients:
       mock = MagicMock()
@@ -85,6 +99,11 @@ def mock_boto3(mocker: MockerFixture) -> Generator[MagicMock, None, None]:
   return mock_client
 
 
+def mock_organization(mock_org: MagicMock, accounts: list["AccountTypeDef"]) -> None:
+  paginators = {"list_accounts": MagicMock(**{"paginate.return_value": [{"Accounts": accounts}]})}
+  mock_org.get_paginator.side_effect = paginators.__getitem__
+
+
 @pytest.fixture
 def mock_sts_client(mock_boto3: MagicMock) -> MagicMock:
   client: MagicMock = mock_boto3("sts")
@@ -141,6 +160,20 @@ def test_assume_org_account_access_role_success(
   mock_sts_client.assume_role.assert_called_once_with(RoleArn=expected_role_arn, RoleSessionName=expected_session)
 
 
+def test_assume_org_account_access_role_uses_cache(
+  mock_sts_client: MagicMock,
+  test_data: dict[str, str],
+  test_aws_credentials: AssumeRoleResponseTypeDef,
+) -> None:
+  mock_sts_client.assume_role.return_value = test_aws_credentials
+
+  first = assume_org_account_access_role(test_data["account_id"])
+  second = assume_org_account_access_role(test_data["account_id"])
+
+  assert first["SessionToken"] == second["SessionToken"] == "test-token"
+  mock_sts_client.assume_role.assert_called_once()
+
+
 def test_create_iam_role_success(
   mock_iam_client: MagicMock,
   test_data: dict[str, str],
@@ -179,16 +212,18 @@ def test_get_aws_org_accounts_success(
   test_data: dict[str, str],
 ) -> None:
   mock_org = mock_boto3("organizations")
-  mock_paginator = MagicMock()
-  mock_org.get_paginator.return_value = mock_paginator
-
   accounts: list[AccountTypeDef] = [
-    {"Name": "test-account-1", "Id": test_data["account_id"]},
-    {"Name": "test-account-2", "Id": test_data["management_account_id"]},
+    {"Name": "test-account-1", "Id": test_data["account_id"], "Email": "one@example.com", "Status": "ACTIVE"},
+    {
+      "Name": "test-account-2",
+      "Id": test_data["management_account_id"],
+      "Email": "two@example.com",
+      "Status": "ACTIVE",
+    },
   ]
-  mock_paginator.paginate.return_value = [{"Accounts": accounts}]
+  mock_organization(mock_org, accounts)
 
-  result = get_aws_org_accounts()
+  result = get_aws_org_accounts(test_data["management_account_id"])
 
   expected = {
     "test-account-1": test_data["account_id"],
@@ -197,14 +232,11 @@ def test_get_aws_org_accounts_success(
   assert result == expected
 
 
-def test_get_aws_org_accounts_no_accounts(mock_boto3: MagicMock) -> None:
-  mock_org = mock_boto3("organizations")
-  mock_paginator = MagicMock()
-  mock_org.get_paginator.return_value = mock_paginator
-  mock_paginator.paginate.return_value = [{"Accounts": []}]
+def test_get_aws_org_accounts_no_accounts(mock_boto3: MagicMock, test_data: dict[str, str]) -> None:
+  mock_organization(mock_boto3("organizations"), [])
 
   with pytest.raises(ValueError, match="No accounts found in the organization"):
-    get_aws_org_accounts()
+    get_aws_org_accounts(test_data["management_account_id"])
 
 
 def test_create_terraform_admin_role_success(
@@ -216,6 +248,9 @@ def test_create_terraform_admin_role_success(
   mock_sts = mock_boto3("sts")
   mock_iam = mock_boto3("iam")
   mock_sts.assume_role.return_value = test_aws_credentials
+  mock_iam.get_role.side_effect = ClientError(
+    {"Error": {"Code": "NoSuchEntity", "Message": "Role not found"}}, "GetRole"
+  )
   mock_iam.create_role.return_value = {
     "Role": {"Arn": f"arn:aws:iam::{test_data['account_id']}:role/{test_data['role_name']}"}
   }
@@ -226,7 +261,7 @@ def test_create_terraform_admin_role_success(
     test_data["role_name"],
   )
 
-  assert result is True
+  assert result == "created"
   mock_sts.assume_role.assert_called_once_with(
     RoleArn=f"arn:aws:iam::{test_data['account_id']}:role/OrganizationAccountAccessRole",
     RoleSessionName="TerragruntSession",
@@ -247,6 +282,33 @@ def test_create_terraform_admin_role_success(
   )
 
 
+def test_create_terraform_admin_role_in_sync_only_reads(
+  mock_boto3: MagicMock,
+  test_data: dict[str, str],
+  test_aws_credentials: dict,
+  test_trust_policy: dict,
+) -> None:
+  mock_sts = mock_boto3("sts")
+  mock_iam = mock_boto3("iam")
+  mock_sts.assume_role.return_value = test_aws_credentials
+  mock_iam.get_role.return_value = {"Role": {"AssumeRolePolicyDocument": test_trust_policy}}
+  mock_iam.get_role_policy.return_value = {
+    "PolicyDocument": {"Version": "2012-10-17", "Statement": {"Effect": "Allow", "Action": ["*"], "Resource": "*"}}
+  }
+
+  result = create_terraform_admin_role(
+    test_data["account_id"],
+    test_data["management_account_id"],
+    test_data["role_name"],
+  )
+
+  assert result == "existed"
+  mock_iam.get_role_policy.assert_called_once_with(RoleName=test_data["role_name"], PolicyName="TerraformAdmin")
+  mock_iam.create_role.assert_not_called()
+  mock_iam.update_assume_role_policy.assert_not_called()
+  mock_iam.put_role_policy.assert_not_called()
+
+
 def test_find_terragrunt_directories(tmp_path: Path) -> None:
   test_dir = tmp_path / "test_accounts"
   test_dir.mkdir()
@@ -269,30 +331,142 @@ def mock_get_accounts(mocker: MockerFixture, test_data: dict[str, str]) -> Magic
   return mock
 
 
-def test_terragrunt_init_account_dirs(tmp_path: Path, mocker: MockerFixture) -> None:
+@pytest.fixture
+def plugin_cache_dir(tmp_path: Path, mocker: MockerFixture) -> Path:
+  cache_dir = tmp_path / "plugin-cache"
+  mocker.patch("utils.config.TERRAFORM_PLUGIN_CACHE_PATH", cache_dir)
+  mocker.patch.dict("os.environ", clear=False)
+  os.environ.pop("TF_PLUGIN_CACHE_DIR", None)
+  return cache_dir
+
+
+def test_terragrunt_init_account_dirs(tmp_path: Path, mocker: MockerFixture, plugin_cache_dir: Path) -> None:
+  accounts_dir = tmp_path / "accounts"
+  account_dir = accounts_dir / "test-account"
+  account_dir.mkdir(parents=True)
+  (account_dir / "terragrunt.hcl").touch()
+
+  mock_run = mocker.patch("subprocess.run")
+  mock_run.return_value.stdout = "ok"
+  mock_run.return_value.stderr = ""
+  results = terragrunt_init_account_dirs(str(accounts_dir))
+
+  commands = [call.args[0] for call in mock_run.call_args_list]
+  assert commands == [["terragrunt", "init"]]
+  for call in mock_run.call_args_list:
+    assert call.kwargs["cwd"] == str(account_dir)
+    assert call.kwargs["capture_output"] is True
+    assert call.kwargs["env"]["TF_PLUGIN_CACHE_DIR"] == str(plugin_cache_dir)
+  assert plugin_cache_dir.is_dir()
+
+  assert len(results) == 1
+  assert results[0]["succeeded"] is True
+  assert results[0]["stdout"] == "ok"
+
+
+def test_terragrunt_init_account_dirs_isolates_failures(
+  tmp_path: Path,
+  mocker: MockerFixture,
+  plugin_cache_dir: Path,
+  capsys: pytest.CaptureFixture[str],
+) -> None:
+  for account_name in ("account-a", "account-b", "account-c"):
+    account_dir = tmp_path / account_name
+    account_dir.mkdir()
+    (account_dir / "terragrunt.hcl").touch()
+
+  def run(command: list[str], *, cwd: str, **kwargs: object) -> MagicMock:
+    if cwd.endswith("account-b") and command[1] == "init":
+      raise subprocess.CalledProcessError(1, command, output="", stderr="provider download failed")
+    return MagicMock(stdout=f"{command[1]} {cwd}", stderr="")
+
+  mocker.patch("subprocess.run", side_effect=run)
+  results = terragrunt_init_account_dirs(str(tmp_path), max_workers=2)
+
+  failed = [result for result in results if not result["succeeded"]]
+  assert len(results) == EXPECTED_INIT_DIRECTORIES
+  assert [result["directory"] for result in failed] == [str(tmp_path / "account-b")]
+  assert failed[0]["stderr"] == "provider download failed"
+  assert "2 succeeded, 1 failed" in capsys.readouterr().out
+
+
+def test_terragrunt_init_account_dirs_warms_the_cache_with_the_next_directory(
+  tmp_path: Path, mocker: MockerFixture, plugin_cache_dir: Path
+) -> None:
+  account_names = ("account-a", "account-b", "account-c", "account-d")
+  for account_name in account_names:
+    (tmp_path / account_name).mkdir()
+    (tmp_path / account_name / "terragrunt.hcl").touch()
+  events: list[tuple[str, str]] = []
+
+  def run(command: list[str], *, cwd: str, **kwargs: object) -> MagicMock:
+    account_name = os.path.basename(cwd)
+    events.append(("start", account_name))
+    try:
+      if account_name == "account-a":
+        raise subprocess.CalledProcessError(1, command, output="", stderr="provider download failed")
+      return MagicMock(stdout="", stderr="")
+    finally:
+      events.append(("end", account_name))
+
+  mocker.patch("subprocess.run", side_effect=run)
+  results = terragrunt_init_account_dirs(str(tmp_path), max_workers=2)
+
+  # account-a fails to warm the cache, so account-b warms it alone before the rest start together
+  assert events[:4] == [("start", "account-a"), ("end", "account-a"), ("start", "account-b"), ("end", "account-b")]
+  assert sorted(result["directory"] for result in results if result["succeeded"]) == [
+    str(tmp_path / account_name) for account_name in account_names[1:]
+  ]
+
+
+def test_terragrunt_init_account_dirs_skips_unchanged(
+  tmp_path: Path, mocker: MockerFixture, plugin_cache_dir: Path
+) -> None:
   account_dir = tmp_path / "test-account"
   account_dir.mkdir()
   (account_dir / "terragrunt.hcl").touch()
+  (account_dir / ".terraform" / "providers").mkdir(parents=True)
+  (account_dir / ".terraform" / "terraform.tfstate").write_text("{}")
 
   mock_run = mocker.patch("subprocess.run")
+  mock_run.return_value.stdout = ""
+  mock_run.return_value.stderr = ""
+
   terragrunt_init_account_dirs(str(tmp_path))
+  mock_run.assert_called_once()
 
-  assert mock_run.call_count == EXPECTED_TERRAGRUNT_CALLS
-  mock_run.assert_has_calls(
-    [
-      mocker.call(
-        ["terragrunt", "hclfmt"],
-        cwd=str(account_dir),
-        check=True,
-        capture_output=True,
-      ),
-      mocker.call(
-        ["terragrunt", "init"],
-        cwd=str(account_dir),
-        check=True,
-      ),
-    ]
-  )
+  results = terragrunt_init_account_dirs(str(tmp_path))
+  mock_run.assert_called_once()
+  assert results[0]["skipped"] is True
+
+  results = terragrunt_init_account_dirs(str(tmp_path), force=True)
+  assert mock_run.call_count == EXPECTED_FORCED_INIT_CALLS
+  assert results[0]["skipped"] is False
+
+
+def test_terragrunt_init_account_dirs_skips_a_regenerated_tree(
+  tmp_path: Path, mocker: MockerFixture, plugin_cache_dir: Path, test_accounts: list[Account]
+) -> None:
+  accounts_dir = tmp_path / "accounts"
+  mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(accounts_dir))
+  setup_all_account_directories(test_accounts, output_mode="quiet")
+  for terragrunt_file in accounts_dir.glob("**/terragrunt.hcl"):
+    (terragrunt_file.parent / ".terraform" / "providers").mkdir(parents=True)
+    (terragrunt_file.parent / ".terraform" / "terraform.tfstate").write_text("{}")
+  mock_run = mocker.patch("subprocess.run")
+  mock_run.return_value.stdout = ""
+  mock_run.return_value.stderr = ""
+  terragrunt_init_account_dirs(str(accounts_dir))
+  init_calls = mock_run.call_count
+
+  setup_all_account_directories(test_accounts, output_mode="quiet")
+  # A file written unformatted since the last init, e.g. by hand, is compared the way init fingerprinted it
+  details_path = next(accounts_dir.glob("**/account_details.hcl"))
+  details_path.write_text(re.sub(r" +=", " =", details_path.read_text()))
+  results = terragrunt_init_account_dirs(str(accounts_dir))
+
+  assert mock_run.call_count == init_calls
+  assert [result["skipped"] for result in results] == [True] * len(test_accounts)
 
 
 def test_update_account_ids(tmp_path: Path, test_data: dict[str, str]) -> None:
@@ -343,13 +517,22 @@ def test_create_terraform_admin_roles(
     account_dir.mkdir()
     (account_dir / "account_details.hcl").touch()
 
-  mock_create_role = mocker.patch(
-    "setup_terraform_account_roles.create_terraform_admin_role",
-    return_value=True,
+  mock_plan = mocker.patch(
+    "setup_terraform_account_roles.plan_terraform_admin_role",
+    side_effect=lambda account_id, *_: [
+      {"account": account_id, "action": "create_role", "resource": role_name, "reason": "role does not exist"}
+    ],
+  )
+  mock_apply = mocker.patch(
+    "setup_terraform_account_roles.apply_terraform_admin_role_actions",
+    return_value="created",
   )
 
-  create_terraform_admin_roles(accounts, management_account_id, role_name, str(tmp_path))
-  assert mock_create_role.call_count == EXPECTED_ADMIN_ROLE_COUNT
+  results = create_terraform_admin_roles(accounts, management_account_id, role_name, str(tmp_path))
+  assert mock_plan.call_count == EXPECTED_ADMIN_ROLE_COUNT
+  assert mock_apply.call_count == EXPECTED_ADMIN_ROLE_COUNT
+  assert len(results) == EXPECTED_ADMIN_ROLE_COUNT
+  assert all(result["status"] == "created" for result in results)
 
 
 def test_create_terraform_admin_roles_error(tmp_path: Path, mocker: MockerFixture, test_data: dict[str, str]) -> None:
@@ -361,13 +544,69 @@ def test_create_terraform_admin_roles_error(tmp_path: Path, mocker: MockerFixtur
   account_dir.mkdir()
   (account_dir / "account_details.hcl").touch()
 
-  mock_create_role = mocker.patch(
-    "setup_terraform_account_roles.create_terraform_admin_role",
+  mock_plan = mocker.patch(
+    "setup_terraform_account_roles.plan_terraform_admin_role",
     side_effect=ValueError("Test error"),
   )
+  mock_apply = mocker.patch("setup_terraform_account_roles.apply_terraform_admin_role_actions")
 
-  create_terraform_admin_roles(accounts, management_account_id, role_name, str(tmp_path))
-  mock_create_role.assert_called_once_with(test_data["account_id"], management_account_id, role_name)
+  results = create_terraform_admin_roles(accounts, management_account_id, role_name, str(tmp_path))
+  mock_plan.assert_called_once_with(test_data["account_id"], management_account_id, role_name)
+  mock_apply.assert_not_called()
+  assert results == [
+    {"account_name": "test-account", "account_id": test_data["account_id"], "status": "failed", "error": "Test error"}
+  ]
+
+
+def test_create_terraform_admin_roles_isolates_failures(
+  tmp_path: Path,
+  mocker: MockerFixture,
+  test_data: dict[str, str],
+) -> None:
+  accounts = {
+    "created-account": "111111111111",
+    "existing-account": "222222222222",
+    "failing-account": "333333333333",
+    "unreadable-account": "444444444444",
+  }
+  for account_name in accounts:
+    account_dir = tmp_path / account_name
+    account_dir.mkdir()
+    (account_dir / "account_details.hcl").touch()
+
+  outcomes: dict[str, RoleCreationStatus | Exception] = {
+    "111111111111": "created",
+    "222222222222": "existed",
+    "333333333333": ValueError("Throttled"),
+  }
+
+  def plan_role(account_id: str, management_account_id: str, role_name: str) -> list[PlannedAction]:
+    if account_id == "444444444444":
+      raise RoleAssumptionError(account_id)
+    return []
+
+  def apply_actions(
+    account_id: str, management_account_id: str, role_name: str, actions: list[PlannedAction]
+  ) -> RoleCreationStatus:
+    outcome = outcomes[account_id]
+    if isinstance(outcome, Exception):
+      raise outcome
+    return outcome
+
+  mocker.patch("setup_terraform_account_roles.plan_terraform_admin_role", side_effect=plan_role)
+  mocker.patch("setup_terraform_account_roles.apply_terraform_admin_role_actions", side_effect=apply_actions)
+
+  results = create_terraform_admin_roles(
+    accounts, test_data["management_account_id"], test_data["role_name"], str(tmp_path), max_workers=3
+  )
+
+  statuses = {result["account_name"]: (result["status"], result["error"]) for result in results}
+  assert statuses == {
+    "created-account": ("created", None),
+    "existing-account": ("existed", None),
+    "failing-account": ("failed", "Throttled"),
+    "unreadable-account": ("failed", "Error assuming role in account 444444444444"),
+  }
 
 
 def test_update_account_ids_no_matching_account(tmp_path: Path, test_data: dict[str, str]) -> None:
@@ -389,6 +628,33 @@ def test_update_account_ids_no_matching_account(tmp_path: Path, test_data: dict[
   assert details_file.read_text() == original_content
 
 
+def test_update_account_ids_writes_only_changed_accounts(tmp_path: Path, test_data: dict[str, str]) -> None:
+  content = f'locals {{\n  account_name = "a"\n  account_id   = "{test_data["account_id"]}"\n}}\n'
+  for account_name in ("unchanged-account", "changed-account", "unmatched-account", "no-attribute-account"):
+    (tmp_path / account_name).mkdir()
+    (tmp_path / account_name / "account_details.hcl").write_text(content)
+  (tmp_path / "no-attribute-account" / "account_details.hcl").write_text('locals {\n  account_name = "a"\n}\n')
+  os.utime(tmp_path / "unchanged-account" / "account_details.hcl", ns=(0, 0))
+
+  accounts = {
+    "unchanged-account": test_data["account_id"],
+    "changed-account": test_data["infrastructure_account_id"],
+    "no-attribute-account": test_data["account_id"],
+  }
+  results = update_account_ids(accounts, str(tmp_path), max_workers=2)
+
+  assert {result["account_name"]: result["status"] for result in results} == {
+    "unchanged-account": "unchanged",
+    "changed-account": "updated",
+    "unmatched-account": "unmatched",
+    "no-attribute-account": "skipped",
+  }
+  assert (tmp_path / "unchanged-account" / "account_details.hcl").stat().st_mtime_ns == 0
+  assert (tmp_path / "changed-account" / "account_details.hcl").read_text() == content.replace(
+    test_data["account_id"], test_data["infrastructure_account_id"]
+  )
+
+
 def test_update_account_ids_no_details_file(tmp_path: Path, test_data: dict[str, str]) -> None:
   accounts = {"test-account": test_data["account_id"]}
 
@@ -427,6 +693,44 @@ def test_attach_exclusive_inline_policy_error(mocker: MockerFixture) -> None:
   )
 
 
+def test_create_iam_role_retries_throttling(
+  mocker: MockerFixture, test_data: dict[str, str], test_trust_policy: TrustPolicyDocument
+) -> None:
+  mock_sleep = mocker.patch("utils.rate_limit.time.sleep")
+  mock_iam = MagicMock(spec=IAMClient)
+  mock_iam.create_role.side_effect = [
+    ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "CreateRole"),
+    {"Role": {}},
+  ]
+
+  assert create_iam_role(mock_iam, test_data["role_name"], test_trust_policy) is True
+  mock_sleep.assert_called_once()
+
+
+def test_create_iam_role_reraises_persistent_throttling(
+  mocker: MockerFixture, test_data: dict[str, str], test_trust_policy: TrustPolicyDocument
+) -> None:
+  mocker.patch("utils.rate_limit.time.sleep")
+  mock_iam = MagicMock(spec=IAMClient)
+  mock_iam.create_role.side_effect = ClientError(
+    {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "CreateRole"
+  )
+
+  with pytest.raises(ClientError, match="Throttling"):
+    create_iam_role(mock_iam, test_data["role_name"], test_trust_policy)
+
+
+def test_attach_exclusive_inline_policy_reraises_persistent_throttling(mocker: MockerFixture) -> None:
+  mocker.patch("utils.rate_limit.time.sleep")
+  mock_iam = MagicMock()
+  mock_iam.put_role_policy.side_effect = ClientError(
+    {"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "PutRolePolicy"
+  )
+
+  with pytest.raises(ClientError, match="Throttling"):
+    attach_exclusive_inline_policy(mock_iam, "test-role")
+
+
 def test_create_iam_role_other_error() -> None:
   mock_iam = MagicMock(spec=IAMClient)
   mock_iam.create_role.side_effect = ClientError(
@@ -447,9 +751,9 @@ def test_create_iam_role_other_error() -> None:
     create_iam_role(mock_iam, "test-role", {"Version": "2012-10-17", "Statement": []})
 
 
-def test_get_aws_org_accounts_error(mock_boto3: MagicMock) -> None:
+def test_get_aws_org_accounts_error(mock_boto3: MagicMock, test_data: dict[str, str]) -> None:
   mock_org = mock_boto3("organizations")
-  mock_org.get_paginator.side_effect = ClientError(
+  mock_org.get_paginator.return_value.paginate.side_effect = ClientError(
     {
       "Error": {"Code": "ServiceFailure", "Message": "Internal error"},
       "ResponseMetadata": {
@@ -464,30 +768,64 @@ def test_get_aws_org_accounts_error(mock_boto3: MagicMock) -> None:
   )
 
   with pytest.raises(ValueError, match="Error retrieving accounts"):
-    get_aws_org_accounts()
+    get_aws_org_accounts(test_data["management_account_id"])
 
 
-def test_main(mocker: MockerFixture, tmp_path: Path, test_data: dict[str, str]) -> None:
+def test_main(
+  mocker: MockerFixture,
+  tmp_path: Path,
+  test_data: dict[str, str],
+  test_account_factory: Callable[[str, str, str], Account],
+  isolated_event_log: Path,
+) -> None:
   mock_org_client = MagicMock()
-  mock_org_client.get_paginator.return_value.paginate.return_value = [
-    {
-      "Accounts": [
-        {"Name": "test-account", "Id": test_data["account_id"]},
-      ]
-    }
-  ]
+  mock_organization(
+    mock_org_client,
+    [
+      {"Name": "test-account", "Id": test_data["account_id"], "Email": "test@example.com", "Status": "ACTIVE"},
+      {"Name": "closed-account", "Id": "999999999999", "Email": "closed@example.com", "Status": "SUSPENDED"},
+    ],
+  )
 
   mocker.patch("utils.config.ACCOUNTS_DIRECTORY_PATH", str(tmp_path))
-  mocker.patch("boto3.client", return_value=mock_org_client)
+  mocker.patch("utils.aws_clients.get_client", return_value=mock_org_client)
 
   account_dir = tmp_path / "test-account"
   account_dir.mkdir()
   details_file = account_dir / "account_details.hcl"
   details_file.write_text('locals { account_id = "" }')
 
-  mocker.patch("utils.parse_ous_accounts_data.get_management_account_details")
+  (tmp_path / "closed-account").mkdir()
+  (tmp_path / "closed-account" / "account_details.hcl").write_text('locals { account_id = "" }')
+  # A directory of an account that was removed from the registry
+  (tmp_path / "retired-account").mkdir()
+  (tmp_path / "retired-account" / "account_details.hcl").write_text('locals { account_id = "" }')
+
+  mocker.patch("utils.parse_ous_accounts_data.get_management_account_details").return_value.id = test_data[
+    "management_account_id"
+  ]
+  mocker.patch("utils.parse_ous_accounts_data.get_account_registry").return_value = AccountRegistry(
+    [test_account_factory(name, "", "Sandbox") for name in ("test-account", "closed-account")]
+  )
+  get_org_inventory = mocker.spy(org_inventory, "get_org_inventory")
   mocker.patch("utils.parse_ous_accounts_data.get_terraform_backend_config")
-  mocker.patch("setup_terraform_account_roles.create_terraform_admin_role")
+  mock_plan = mocker.patch("setup_terraform_account_roles.plan_terraform_admin_role", return_value=[])
   mocker.patch("setup_terraform_account_roles.terragrunt_init_account_dirs")
 
-  main()
+  main([])
+
+  # Suspended accounts get their account ID written, but no admin role
+  assert 'account_id = "999999999999"' in (tmp_path / "closed-account" / "account_details.hcl").read_text()
+  mock_plan.assert_called_once()
+  assert mock_plan.call_args.args[0] == test_data["account_id"]
+  assert get_org_inventory.call_args.args[1] == ["test-account", "closed-account"]
+
+  (event_log_path,) = isolated_event_log.glob("setup_terraform_account_roles-*.jsonl")
+  span_names = [json.loads(line)["name"] for line in event_log_path.read_text().splitlines()]
+  assert span_names[1:-1] == [
+    "list_accounts",
+    "list_org_accounts",
+    "update_account_ids",
+    "create_terraform_admin_roles",
+    "terragrunt_init",
+  ]
@@ -1,25 +1,32 @@
 import json
 import os
+import re
 from pathlib import Path
 from typing import TYPE_CHECKING, cast
 
-import boto3
-from mypy_boto3_iam.client import IAMClient
-from mypy_boto3_s3.client import S3Client
-from mypy_boto3_s3.type_defs import (
-  ServerSideEncryptionByDefaultTypeDef,
-  ServerSideEncryptionConfigurationTypeDef,
-  ServerSideEncryptionRuleTypeDef,
+from utils import (
+  aws_clients,
+  credentials_cache,
+  file_ops,
+  instrumentation,
+  parse_ous_accounts_data,
+  rate_limit,
+  reconcile,
 )
-
-if TYPE_CHECKING:
-  from mypy_boto3_s3.literals import BucketLocationConstraintType
-
-from utils import file_ops, parse_ous_accounts_data
+from utils.account_registry import AccountRegistry
 from utils.config import ACCOUNTS_DIRECTORY_PATH, Colors
 from utils.models import Account, ManagementAccountDetails, TerraformBackendConfig
 
+# The boto3 stubs are large and only needed by the type checker, so writing the resource files starts quickly
 if TYPE_CHECKING:
+  from mypy_boto3_iam.client import IAMClient
+  from mypy_boto3_s3.client import S3Client
+  from mypy_boto3_s3.literals import BucketLocationConstraintType
+  from mypy_boto3_s3.type_defs import (
+    ServerSideEncryptionByDefaultTypeDef,
+    ServerSideEncryptionConfigurationTypeDef,
+    ServerSideEncryptionRuleTypeDef,
+  )
   from mypy_boto3_sts.client import STSClient
   from mypy_boto3_sts.type_defs import GetCallerIdentityResponseTypeDef
 
@@ -42,10 +49,75 @@ ACCOUNTS_TERRAFORM_RESOURCE = """resource "aws_organizations_account" "managed"
 }
 """
 
+ORGANIZATION_DIRNAME = "organization"
+ORGANIZATIONAL_UNITS_UNIT_NAME = "organizational-units"
+MONOLITHIC_STATE_FILENAMES = ("locals.tf", "ous_accounts.tf")
+
+SHARDED_UNIT_TERRAGRUNT_HCL = """include {
+  path           = find_in_parent_folders("root.hcl")
+  merge_strategy = "deep"
+}
+
+# The management account's alias is managed by the management account directory's own state
+generate "main" {
+  path      = "main.tf"
+  if_exists = "overwrite"
+  disable   = true
+  contents  = ""
+}
+"""
+
+OU_ACCOUNTS_DEPENDENCY_HCL = """
+dependency "organizational_units" {{
+  config_path = "../{organizational_units_unit}"
+
+  mock_outputs                            = {{ organizational_unit_ids = {{ {ou_name} = "ou-mock" }} }}
+  mock_outputs_allowed_terraform_commands = ["init", "validate", "plan"]
+}}
+
+inputs = {{
+  organizational_unit_id = dependency.organizational_units.outputs.organizational_unit_ids[{ou_name}]
+}}
+"""
+
+ORGANIZATIONAL_UNITS_OUTPUT = """
+output "organizational_unit_ids" {
+  value = { for name, unit in aws_organizations_organizational_unit.managed : name => unit.id }
+}
+"""
+
+OU_ACCOUNTS_TERRAFORM_RESOURCE = """variable "organizational_unit_id" {
+  description = "The ID of the organizational unit the accounts are created in."
+  type        = string
+}
+
+resource "aws_organizations_account" "managed" {
+  for_each  = toset(local.account_names)
+  name      = each.value
+  email     = replace(local.management_account_email, "@", "+${each.value}@")
+  parent_id = var.organizational_unit_id
+}
+"""
+
+TERRAFORM_ADMIN_ROLE_POLICY = {
+  "Version": "2012-10-17",
+  "Statement": [{"Effect": "Allow", "Action": "*", "Resource": "*"}],
+}
+
 
 def get_current_logged_in_account() -> str:
-  sts_client: STSClient = boto3.client("sts")
-  response: GetCallerIdentityResponseTypeDef = sts_client.get_caller_identity()
+  session_credentials = aws_clients.get_session().get_credentials()
+  identity_key = session_credentials.get_frozen_credentials().access_key if session_credentials else None
+  cache = credentials_cache.get_credentials_cache()
+  if identity_key:
+    cached_account_id = cache.get_identity(identity_key)
+    if cached_account_id:
+      return cached_account_id
+
+  sts_client: STSClient = aws_clients.get_client("sts")
+  response: GetCallerIdentityResponseTypeDef = rate_limit.retry_throttled(sts_client.get_caller_identity)
+  if identity_key:
+    cache.put_identity(identity_key, response["Account"])
   return response["Account"]
 
 
@@ -60,10 +132,8 @@ def verify_logged_into_management_account(management_account_id: str) -> None:
     raise ValueError(error_msg)
 
 
-def create_terraform_admin_iam_role(
-  terraform_admin_role_name: str, management_account_id: str, iam_client: IAMClient
-) -> None:
-  trust_policy = {
+def terraform_admin_role_trust_policy(management_account_id: str) -> dict:
+  return {
     "Version": "2012-10-17",
     "Statement": [
       {
@@ -74,64 +144,153 @@ def create_terraform_admin_iam_role(
     ],
   }
 
-  iam_client.create_role(
-    RoleName=terraform_admin_role_name,
-    AssumeRolePolicyDocument=json.dumps(trust_policy),
+
+def create_terraform_admin_iam_role(
+  terraform_admin_role_name: str, management_account_id: str, iam_client: "IAMClient"
+) -> None:
+  trust_policy = terraform_admin_role_trust_policy(management_account_id)
+  rate_limit.retry_throttled(
+    lambda: iam_client.create_role(
+      RoleName=terraform_admin_role_name,
+      AssumeRolePolicyDocument=json.dumps(trust_policy),
+    )
   )
   print(f"{Colors.GREEN}Created IAM role: {terraform_admin_role_name}{Colors.RESET}")
 
 
-def attach_terraform_admin_role_policy(terraform_admin_role_name: str, iam_client: IAMClient) -> None:
-  role_policy = {
-    "Version": "2012-10-17",
-    "Statement": [{"Effect": "Allow", "Action": "*", "Resource": "*"}],
-  }
+def update_terraform_admin_role_trust_policy(
+  terraform_admin_role_name: str, management_account_id: str, iam_client: "IAMClient"
+) -> None:
+  trust_policy = terraform_admin_role_trust_policy(management_account_id)
+  rate_limit.retry_throttled(
+    lambda: iam_client.update_assume_role_policy(
+      RoleName=terraform_admin_role_name, PolicyDocument=json.dumps(trust_policy)
+    )
+  )
+  print(f"{Colors.GREEN}Updated trust policy of IAM role: {terraform_admin_role_name}{Colors.RESET}")
 
-  iam_client.put_role_policy(
-    RoleName=terraform_admin_role_name,
-    PolicyName=terraform_admin_role_name,
-    PolicyDocument=json.dumps(role_policy),
+
+def attach_terraform_admin_role_policy(terraform_admin_role_name: str, iam_client: "IAMClient") -> None:
+  rate_limit.retry_throttled(
+    lambda: iam_client.put_role_policy(
+      RoleName=terraform_admin_role_name,
+      PolicyName=terraform_admin_role_name,
+      PolicyDocument=json.dumps(TERRAFORM_ADMIN_ROLE_POLICY),
+    )
   )
   print(f"{Colors.GREEN}Attached {terraform_admin_role_name} policy to role: {terraform_admin_role_name}{Colors.RESET}")
 
 
-def create_s3_backend_bucket(s3_backend_bucket_name: str, aws_region: str, s3_client: S3Client) -> None:
-  s3_client.create_bucket(
-    Bucket=s3_backend_bucket_name,
-    CreateBucketConfiguration={"LocationConstraint": cast("BucketLocationConstraintType", aws_region)},
+def create_s3_backend_bucket(s3_backend_bucket_name: str, aws_region: str, s3_client: "S3Client") -> None:
+  rate_limit.retry_throttled(
+    lambda: s3_client.create_bucket(
+      Bucket=s3_backend_bucket_name,
+      CreateBucketConfiguration={"LocationConstraint": cast("BucketLocationConstraintType", aws_region)},
+    )
   )
   print(f"{Colors.GREEN}Created S3 bucket: {s3_backend_bucket_name}{Colors.RESET}")
 
-  server_side_encryption = ServerSideEncryptionByDefaultTypeDef(SSEAlgorithm="AES256")
-  encryption_rule = ServerSideEncryptionRuleTypeDef(ApplyServerSideEncryptionByDefault=server_side_encryption)
-  encryption_config = ServerSideEncryptionConfigurationTypeDef(Rules=[encryption_rule])
-  s3_client.put_bucket_encryption(
-    Bucket=s3_backend_bucket_name,
-    ServerSideEncryptionConfiguration=encryption_config,
+
+def enable_s3_backend_bucket_encryption(s3_backend_bucket_name: str, s3_client: "S3Client") -> None:
+  server_side_encryption: ServerSideEncryptionByDefaultTypeDef = {"SSEAlgorithm": "AES256"}
+  encryption_rule: ServerSideEncryptionRuleTypeDef = {"ApplyServerSideEncryptionByDefault": server_side_encryption}
+  encryption_config: ServerSideEncryptionConfigurationTypeDef = {"Rules": [encryption_rule]}
+  rate_limit.retry_throttled(
+    lambda: s3_client.put_bucket_encryption(
+      Bucket=s3_backend_bucket_name,
+      ServerSideEncryptionConfiguration=encryption_config,
+    )
   )
   print(f"{Colors.GREEN}Enabled encryption for bucket: {s3_backend_bucket_name}{Colors.RESET}")
 
-  s3_client.put_bucket_versioning(Bucket=s3_backend_bucket_name, VersioningConfiguration={"Status": "Enabled"})
-  print(f"{Colors.GREEN}Created encrypted S3 bucket for terraform backend: {s3_backend_bucket_name}{Colors.RESET}")
 
-
-def setup_terraform_backend(terraform_backend_config: TerraformBackendConfig, management_account_id: str) -> None:
-  if terraform_backend_config.create_terraform_admin_role:
-    iam_client = boto3.client("iam")
-    create_terraform_admin_iam_role(
-      terraform_backend_config.terraform_admin_role_name,
-      management_account_id,
-      iam_client,
+def enable_s3_backend_bucket_versioning(s3_backend_bucket_name: str, s3_client: "S3Client") -> None:
+  rate_limit.retry_throttled(
+    lambda: s3_client.put_bucket_versioning(
+      Bucket=s3_backend_bucket_name, VersioningConfiguration={"Status": "Enabled"}
     )
-    attach_terraform_admin_role_policy(terraform_backend_config.terraform_admin_role_name, iam_client)
-
-  if terraform_backend_config.create_s3_backend_bucket:
-    s3_client = boto3.client("s3")
-    create_s3_backend_bucket(
-      terraform_backend_config.s3_backend_bucket_name,
-      terraform_backend_config.aws_region,
-      s3_client,
+  )
+  print(f"{Colors.GREEN}Enabled versioning for bucket: {s3_backend_bucket_name}{Colors.RESET}")
+
+
+def plan_terraform_backend(
+  terraform_backend_config: TerraformBackendConfig,
+  management_account_id: str,
+  iam_client: "IAMClient | None",
+  s3_client: "S3Client | None",
+) -> list[reconcile.PlannedAction]:
+  actions: list[reconcile.PlannedAction] = []
+  if iam_client is not None:
+    role_name = terraform_backend_config.terraform_admin_role_name
+    role_state = reconcile.read_role_state(iam_client, role_name, role_name)
+    actions.extend(
+      reconcile.plan_role(
+        management_account_id,
+        role_name,
+        role_state,
+        terraform_admin_role_trust_policy(management_account_id),
+        role_name,
+        TERRAFORM_ADMIN_ROLE_POLICY,
+      )
     )
+  if s3_client is not None:
+    bucket_name = terraform_backend_config.s3_backend_bucket_name
+    bucket_state = reconcile.read_bucket_state(s3_client, bucket_name)
+    actions.extend(reconcile.plan_bucket(management_account_id, bucket_name, bucket_state))
+  return actions
+
+
+def apply_terraform_backend_action(
+  action: reconcile.PlannedAction,
+  terraform_backend_config: TerraformBackendConfig,
+  iam_client: "IAMClient | None",
+  s3_client: "S3Client | None",
+) -> None:
+  role_name = terraform_backend_config.terraform_admin_role_name
+  bucket_name = terraform_backend_config.s3_backend_bucket_name
+  if iam_client is not None:
+    if action["action"] == "create_role":
+      create_terraform_admin_iam_role(role_name, action["account"], iam_client)
+      return
+    if action["action"] == "update_trust_policy":
+      update_terraform_admin_role_trust_policy(role_name, action["account"], iam_client)
+      return
+    if action["action"] == "attach_policy":
+      attach_terraform_admin_role_policy(role_name, iam_client)
+      return
+  if s3_client is not None:
+    if action["action"] == "create_bucket":
+      create_s3_backend_bucket(bucket_name, terraform_backend_config.aws_region, s3_client)
+      return
+    if action["action"] == "enable_bucket_encryption":
+      enable_s3_backend_bucket_encryption(bucket_name, s3_client)
+      return
+    if action["action"] == "enable_bucket_versioning":
+      enable_s3_backend_bucket_versioning(bucket_name, s3_client)
+      return
+  error_msg = f"Cannot apply {action['action']} to {action['resource']} without a client for it"
+  raise ValueError(error_msg)
+
+
+def setup_terraform_backend(
+  terraform_backend_config: TerraformBackendConfig, management_account_id: str
+) -> list[reconcile.PlannedAction]:
+  # Current state is read first, so a re-run against an existing backend makes only read calls
+  iam_client: IAMClient | None = (
+    aws_clients.get_client("iam") if terraform_backend_config.create_terraform_admin_role else None
+  )
+  s3_client: S3Client | None = (
+    aws_clients.get_client("s3") if terraform_backend_config.create_s3_backend_bucket else None
+  )
+
+  with instrumentation.span("read_backend_state", account=management_account_id):
+    actions = plan_terraform_backend(terraform_backend_config, management_account_id, iam_client, s3_client)
+  reconcile.print_plan(actions)
+
+  for action in actions:
+    with instrumentation.span(action["action"], account=management_account_id):
+      apply_terraform_backend_action(action, terraform_backend_config, iam_client, s3_client)
+  return actions
 
 
 def get_management_account_dir_path(accounts_dir: str | Path, management_account: ManagementAccountDetails) -> str:
@@ -148,7 +307,7 @@ def create_terraform_locals(
   management_account_name: str,
   ou_names_list: list[str],
   accounts_data: list[Account],
-) -> None:
+) -> file_ops.WriteStatus:
   filename = "locals.tf"
   locals_path = os.path.join(management_account_dir_path, filename)
 
@@ -163,49 +322,150 @@ def create_terraform_locals(
   accounts = {json.dumps(account_objects, indent=2)}
 }}
 """
-  file_ops.write_account_file(locals_path, content, filename, management_account_name)
+  return file_ops.write_account_file(locals_path, content, filename, management_account_name)
 
 
-def create_ous_accounts_terraform_file(management_account_dir_path: str, management_account_name: str) -> None:
+def create_ous_accounts_terraform_file(
+  management_account_dir_path: str, management_account_name: str
+) -> file_ops.WriteStatus:
   content = f"{OUS_TERRAFORM_RESOURCE}\n{ACCOUNTS_TERRAFORM_RESOURCE}"
   filename = "ous_accounts.tf"
   ous_accounts_path = os.path.join(management_account_dir_path, filename)
-  file_ops.write_account_file(ous_accounts_path, content, filename, management_account_name)
+  return file_ops.write_account_file(ous_accounts_path, content, filename, management_account_name)
+
+
+def ou_unit_dirname(ou_name: str) -> str:
+  return "ou-" + re.sub(r"[^a-z0-9]+", "-", ou_name.lower()).strip("-")
+
+
+def ou_unit_dirnames(ou_names: list[str]) -> dict[str, str]:
+  # Names that differ only in case or punctuation map to one directory, where one OU's state would silently
+  # replace the other's
+  dirnames: dict[str, str] = {}
+  ou_names_by_dirname: dict[str, str] = {}
+  for ou_name in ou_names:
+    dirname = ou_unit_dirname(ou_name)
+    existing = ou_names_by_dirname.setdefault(dirname, ou_name)
+    if existing != ou_name:
+      error_msg = f"Organizational units {existing!r} and {ou_name!r} would share the state directory {dirname}"
+      raise ValueError(error_msg)
+    dirnames[ou_name] = dirname
+  return dirnames
+
+
+def write_sharded_unit(unit_dir_path: str, files: dict[str, str], unit_label: str) -> list[file_ops.WriteStatus]:
+  file_ops.create_directory(unit_dir_path)
+  return [
+    file_ops.write_account_file(os.path.join(unit_dir_path, filename), content, filename, unit_label)
+    for filename, content in files.items()
+  ]
+
+
+def create_sharded_organization_units(
+  management_account_dir_path: str,
+  management_account_details: ManagementAccountDetails,
+  registry: AccountRegistry,
+) -> list[file_ops.WriteStatus]:
+  # Every unit reads the management account's details through root.hcl, which looks next to its own terragrunt.hcl
+  account_details_path = os.path.join(management_account_dir_path, "account_details.hcl")
+  if not os.path.exists(account_details_path):
+    error_msg = f"account_details.hcl not found in management account directory: {management_account_dir_path}"
+    raise ValueError(error_msg)
+  with open(account_details_path) as file:
+    account_details = file.read()
+  dirnames = ou_unit_dirnames(registry.ou_names)
+
+  organization_dir_path = os.path.join(management_account_dir_path, ORGANIZATION_DIRNAME)
+  label = f"{management_account_details.name}/{ORGANIZATION_DIRNAME}"
+  statuses = write_sharded_unit(
+    os.path.join(organization_dir_path, ORGANIZATIONAL_UNITS_UNIT_NAME),
+    {
+      "account_details.hcl": account_details,
+      "terragrunt.hcl": SHARDED_UNIT_TERRAGRUNT_HCL,
+      "locals.tf": f"""locals {{
+  parent_ou_id = "{management_account_details.parent_ou_id}"
+  organizational_units = {json.dumps(registry.ou_names)}
+}}
+""",
+      "organizational_units.tf": f"{OUS_TERRAFORM_RESOURCE}{ORGANIZATIONAL_UNITS_OUTPUT}",
+    },
+    f"{label}/{ORGANIZATIONAL_UNITS_UNIT_NAME}",
+  )
+
+  # The management OU's accounts already exist, like in the single-state layout
+  for ou_name in registry.ou_names:
+    if ou_name == management_account_details.organizational_unit:
+      continue
+    account_names = [account.name for account in registry.in_ou(ou_name)]
+    dependency = OU_ACCOUNTS_DEPENDENCY_HCL.format(
+      organizational_units_unit=ORGANIZATIONAL_UNITS_UNIT_NAME, ou_name=json.dumps(ou_name)
+    )
+    statuses += write_sharded_unit(
+      os.path.join(organization_dir_path, dirnames[ou_name]),
+      {
+        "account_details.hcl": account_details,
+        "terragrunt.hcl": f"{SHARDED_UNIT_TERRAGRUNT_HCL}{dependency}",
+        "locals.tf": f"""locals {{
+  management_account_email = "{management_account_details.email}"
+  account_names = {json.dumps(account_names)}
+}}
+""",
+        "accounts.tf": OU_ACCOUNTS_TERRAFORM_RESOURCE,
+      },
+      f"{label}/{ou_unit_dirname(ou_name)}",
+    )
+  return statuses
 
 
 def setup_terraform_resource_files(
   accounts_dir_path: str,
   management_account_details: ManagementAccountDetails,
-  accounts_data: list[Account],
+  registry: AccountRegistry,
 ) -> None:
   management_account_dir_path = get_management_account_dir_path(accounts_dir_path, management_account_details)
   management_account_name = management_account_details.name
 
-  ou_names_list = list({account.organizational_unit for account in accounts_data})
-  ou_names_list.sort()
+  if management_account_details.shard_state_by_ou:
+    create_sharded_organization_units(management_account_dir_path, management_account_details, registry)
+    # Removing the single-state files would make terraform destroy every OU and account they created
+    existing = [
+      filename
+      for filename in MONOLITHIC_STATE_FILENAMES
+      if os.path.exists(os.path.join(management_account_dir_path, filename))
+    ]
+    if existing:
+      print(
+        f"{Colors.YELLOW}{', '.join(existing)} still manage the organization in {management_account_name}. "
+        f"Move their state into the per-OU units before removing them.{Colors.RESET}"
+      )
+    return
 
   create_terraform_locals(
     management_account_dir_path,
     management_account_details,
     management_account_name,
-    ou_names_list,
-    accounts_data,
+    registry.ou_names,
+    registry.accounts,
   )
 
   create_ous_accounts_terraform_file(management_account_dir_path, management_account_name)
 
 
 def main() -> None:
-  management_account_details = parse_ous_accounts_data.get_management_account_details()
-  management_account_id = management_account_details.id
+  with instrumentation.run("setup_terraform_backend"):
+    management_account_details = parse_ous_accounts_data.get_management_account_details()
+    management_account_id = management_account_details.id
 
-  verify_logged_into_management_account(management_account_id)
+    with instrumentation.span("verify_management_account"):
+      verify_logged_into_management_account(management_account_id)
 
-  terraform_backend_config = parse_ous_accounts_data.get_terraform_backend_config()
-  setup_terraform_backend(terraform_backend_config, management_account_id)
+    terraform_backend_config = parse_ous_accounts_data.get_terraform_backend_config()
+    with instrumentation.span("setup_terraform_backend"):
+      setup_terraform_backend(terraform_backend_config, management_account_id)
 
-  accounts_data = parse_ous_accounts_data.get_accounts_data()
-  setup_terraform_resource_files(ACCOUNTS_DIRECTORY_PATH, management_account_details, accounts_data)
+    registry = parse_ous_accounts_data.get_account_registry()
+    with instrumentation.span("setup_terraform_resource_files"):
+      setup_terraform_resource_files(ACCOUNTS_DIRECTORY_PATH, management_account_details, registry)
 
 
 if __name__ == "__main__":
@@ -2,40 +2,50 @@
 # ruff: noqa: F811
 
 import json
+from collections.abc import Callable
 from pathlib import Path
 from typing import TYPE_CHECKING
 from unittest.mock import MagicMock
 
 import pytest
+from botocore.exceptions import ClientError
 from pytest_mock import MockerFixture
 
 if TYPE_CHECKING:
   from mypy_boto3_sts.type_defs import GetCallerIdentityResponseTypeDef
 
 from setup_terraform_backend import (
+  TERRAFORM_ADMIN_ROLE_POLICY,
   create_ous_accounts_terraform_file,
   create_s3_backend_bucket,
   create_terraform_admin_iam_role,
   create_terraform_locals,
   get_current_logged_in_account,
   get_management_account_dir_path,
+  ou_unit_dirname,
   setup_terraform_backend,
+  setup_terraform_resource_files,
+  terraform_admin_role_trust_policy,
   verify_logged_into_management_account,
 )
 
 # ignoring unused imports from conftest, injected via fixtures
 from tests.conftest import (  # noqa: F401
+  isolated_credentials_cache,
   management_account,
   terraform_config,
   test_account_factory,
   test_accounts,
   test_data,
 )
+from utils.account_registry import AccountRegistry
+from utils.hclfmt import format_hcl
 from utils.models import Account, ManagementAccountDetails, TerraformBackendConfig
 
 
 def test_get_current_logged_in_account(mocker: MockerFixture, test_data: dict[str, str]) -> None:
-  mock_sts = mocker.patch("boto3.client", return_value=MagicMock())
+  mocker.patch("utils.aws_clients.get_session").return_value.get_credentials.return_value = None
+  mock_sts = mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
   response: GetCallerIdentityResponseTypeDef = {
     "Account": test_data["account_id"],
     "Arn": f"arn:aws:iam::{test_data['account_id']}:root",
@@ -54,6 +64,18 @@ def test_get_current_logged_in_account(mocker: MockerFixture, test_data: dict[st
   mock_sts.return_value.get_caller_identity.assert_called_once_with()
 
 
+def test_get_current_logged_in_account_cached_by_session_key(mocker: MockerFixture, test_data: dict[str, str]) -> None:
+  session_credentials = MagicMock()
+  session_credentials.get_frozen_credentials.return_value.access_key = "session-key"
+  mocker.patch("utils.aws_clients.get_session").return_value.get_credentials.return_value = session_credentials
+  mock_sts = mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
+  mock_sts.return_value.get_caller_identity.return_value = {"Account": test_data["account_id"]}
+
+  assert get_current_logged_in_account() == test_data["account_id"]
+  assert get_current_logged_in_account() == test_data["account_id"]
+  mock_sts.return_value.get_caller_identity.assert_called_once_with()
+
+
 @pytest.fixture
 def verify_params(test_data: dict[str, str]) -> list[tuple[str, str, bool]]:
   return [
@@ -92,7 +114,7 @@ def test_verify_management_account_failure(
 
 
 def test_create_terraform_admin_role(mocker: MockerFixture, test_data: dict[str, str]) -> None:
-  mock_iam = mocker.patch("boto3.client", return_value=MagicMock())
+  mock_iam = mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
 
   create_terraform_admin_iam_role(
     test_data["role_name"],
@@ -118,7 +140,7 @@ def test_create_terraform_admin_role(mocker: MockerFixture, test_data: dict[str,
 
 
 def test_create_s3_backend_bucket(mocker: MockerFixture, test_data: dict[str, str]) -> None:
-  mock_s3 = mocker.patch("boto3.client", return_value=MagicMock())
+  mock_s3 = mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
   create_s3_backend_bucket(
     test_data["bucket_name"],
     test_data["region"],
@@ -129,12 +151,22 @@ def test_create_s3_backend_bucket(mocker: MockerFixture, test_data: dict[str, st
     Bucket=test_data["bucket_name"],
     CreateBucketConfiguration={"LocationConstraint": test_data["region"]},
   )
+  mock_s3.return_value.put_bucket_encryption.assert_not_called()
 
-  expected_encryption = {"Rules": [{"ApplyServerSideEncryptionByDefault": {"SSEAlgorithm": "AES256"}}]}
-  mock_s3.return_value.put_bucket_encryption.assert_called_once_with(
-    Bucket=test_data["bucket_name"],
-    ServerSideEncryptionConfiguration=expected_encryption,
-  )
+
+def test_create_s3_backend_bucket_retries_throttling(mocker: MockerFixture, test_data: dict[str, str]) -> None:
+  mock_sleep = mocker.patch("utils.rate_limit.time.sleep")
+  mock_s3 = MagicMock()
+  responses = [
+    ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate"}}, "CreateBucket"),
+    {"Location": test_data["bucket_name"]},
+  ]
+  mock_s3.create_bucket.side_effect = responses
+
+  create_s3_backend_bucket(test_data["bucket_name"], test_data["region"], mock_s3)
+
+  assert mock_s3.create_bucket.call_count == len(responses)
+  mock_sleep.assert_called_once()
 
 
 def test_setup_terraform_backend(
@@ -143,8 +175,10 @@ def test_setup_terraform_backend(
   test_data: dict[str, str],
 ) -> None:
   mock_iam = MagicMock(name="iam_client")
+  mock_iam.get_role.side_effect = ClientError({"Error": {"Code": "NoSuchEntity", "Message": "Not found"}}, "GetRole")
   mock_s3 = MagicMock(name="s3_client")
-  mock_client = mocker.patch("boto3.client", side_effect={"iam": mock_iam, "s3": mock_s3}.get)
+  mock_s3.head_bucket.side_effect = ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadBucket")
+  mock_client = mocker.patch("utils.aws_clients.get_client", side_effect={"iam": mock_iam, "s3": mock_s3}.get)
 
   setup_terraform_backend(terraform_config, test_data["account_id"])
 
@@ -185,6 +219,40 @@ def test_setup_terraform_backend(
     Bucket=terraform_config.s3_backend_bucket_name,
     ServerSideEncryptionConfiguration=expected_encryption,
   )
+  mock_s3.put_bucket_versioning.assert_called_once_with(
+    Bucket=terraform_config.s3_backend_bucket_name, VersioningConfiguration={"Status": "Enabled"}
+  )
+
+
+def test_setup_terraform_backend_applies_only_divergent_settings(
+  mocker: MockerFixture,
+  terraform_config: TerraformBackendConfig,
+  test_data: dict[str, str],
+) -> None:
+  mock_iam = MagicMock(name="iam_client")
+  mock_iam.get_role.return_value = {
+    "Role": {"AssumeRolePolicyDocument": terraform_admin_role_trust_policy(test_data["account_id"])}
+  }
+  mock_iam.get_role_policy.return_value = {"PolicyDocument": TERRAFORM_ADMIN_ROLE_POLICY}
+  mock_s3 = MagicMock(name="s3_client")
+  mock_s3.get_bucket_encryption.return_value = {
+    "ServerSideEncryptionConfiguration": {
+      "Rules": [{"ApplyServerSideEncryptionByDefault": {"SSEAlgorithm": "aws:kms"}}]
+    }
+  }
+  mock_s3.get_bucket_versioning.return_value = {"Status": "Suspended"}
+  mocker.patch("utils.aws_clients.get_client", side_effect={"iam": mock_iam, "s3": mock_s3}.get)
+
+  actions = setup_terraform_backend(terraform_config, test_data["account_id"])
+
+  assert [action["action"] for action in actions] == ["enable_bucket_versioning"]
+  mock_iam.create_role.assert_not_called()
+  mock_iam.put_role_policy.assert_not_called()
+  mock_s3.create_bucket.assert_not_called()
+  mock_s3.put_bucket_encryption.assert_not_called()
+  mock_s3.put_bucket_versioning.assert_called_once_with(
+    Bucket=terraform_config.s3_backend_bucket_name, VersioningConfiguration={"Status": "Enabled"}
+  )
 
 
 @pytest.mark.parametrize("dir_exists", [True, False])
@@ -254,3 +322,84 @@ def test_create_ous_accounts_file(tmp_path: Path, mocker: MockerFixture) -> None
   content = mock_write.call_args[0][1]
   assert "aws_organizations_organizational_unit" in content
   assert "aws_organizations_account" in content
+
+
+@pytest.fixture
+def sharded_management_dir(tmp_path: Path, management_account: ManagementAccountDetails) -> Path:
+  management_dir = tmp_path / management_account.name
+  management_dir.mkdir()
+  (management_dir / "account_details.hcl").write_text(f'locals {{\n  account_name = "{management_account.name}"\n}}\n')
+  return management_dir
+
+
+def test_setup_terraform_resource_files_sharded_by_ou(
+  tmp_path: Path,
+  sharded_management_dir: Path,
+  management_account: ManagementAccountDetails,
+  test_accounts: list[Account],
+) -> None:
+  sharded = management_account.model_copy(update={"shard_state_by_ou": True})
+
+  setup_terraform_resource_files(str(tmp_path), sharded, AccountRegistry(test_accounts))
+
+  organization_dir = sharded_management_dir / "organization"
+  ou_names = sorted({account.organizational_unit for account in test_accounts})
+  assert sorted(path.name for path in organization_dir.iterdir()) == sorted(
+    ["organizational-units", *(ou_unit_dirname(ou_name) for ou_name in ou_names if ou_name != "Management")]
+  )
+  assert not (sharded_management_dir / "ous_accounts.tf").exists()
+  assert json.dumps(ou_names) in (organization_dir / "organizational-units" / "locals.tf").read_text()
+
+  workloads_dir = organization_dir / ou_unit_dirname("Workloads")
+  terragrunt_hcl = (workloads_dir / "terragrunt.hcl").read_text()
+  assert 'config_path = "../organizational-units"' in terragrunt_hcl
+  assert 'organizational_unit_ids["Workloads"]' in terragrunt_hcl
+  workload_names = [account.name for account in test_accounts if account.organizational_unit == "Workloads"]
+  assert json.dumps(workload_names) in (workloads_dir / "locals.tf").read_text()
+  assert (workloads_dir / "account_details.hcl").read_text() == (
+    sharded_management_dir / "account_details.hcl"
+  ).read_text()
+  assert (
+    format_hcl((organization_dir / "organizational-units" / "terragrunt.hcl").read_text())
+    == (organization_dir / "organizational-units" / "terragrunt.hcl").read_text()
+  )
+
+
+def test_sharding_keeps_existing_single_state_files(
+  tmp_path: Path,
+  sharded_management_dir: Path,
+  management_account: ManagementAccountDetails,
+  test_accounts: list[Account],
+  capsys: pytest.CaptureFixture[str],
+) -> None:
+  (sharded_management_dir / "ous_accounts.tf").write_text("# existing\n")
+  sharded = management_account.model_copy(update={"shard_state_by_ou": True})
+
+  setup_terraform_resource_files(str(tmp_path), sharded, AccountRegistry(test_accounts))
+
+  assert (sharded_management_dir / "ous_accounts.tf").read_text() == "# existing\n"
+  assert "ous_accounts.tf still manage the organization" in capsys.readouterr().out
+
+
+def test_ou_unit_dirname() -> None:
+  assert ou_unit_dirname("Workloads") == "ou-workloads"
+  assert ou_unit_dirname("Shared Services (EU)") == "ou-shared-services-eu"
+
+
+def test_sharding_rejects_organizational_units_sharing_a_directory(
+  tmp_path: Path,
+  sharded_management_dir: Path,
+  management_account: ManagementAccountDetails,
+  test_accounts: list[Account],
+  test_account_factory: Callable[[str, str, str], Account],
+) -> None:
+  sharded = management_account.model_copy(update={"shard_state_by_ou": True})
+  accounts = [
+    *test_accounts,
+    test_account_factory("dev-ops-1", "", "Dev Ops"),
+    test_account_factory("dev-ops-2", "", "dev-ops"),
+  ]
+
+  with pytest.raises(ValueError, match="'Dev Ops' and 'dev-ops' would share the state directory ou-dev-ops"):
+    setup_terraform_resource_files(str(tmp_path), sharded, AccountRegistry(accounts))
+  assert not (sharded_management_dir / "organization").exists()
@@ -0,0 +1,274 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Literal, TypedDict
+
+from setup_terraform_account_roles import TERRAGRUNT_HCL_FILENAME, terragrunt_environment
+from utils import config, instrumentation, parse_ous_accounts_data
+from utils.account_discovery import AccountDirectoryIndex
+
+TerragruntCommand = Literal["plan", "apply"]
+FailurePolicy = Literal["fail-fast", "continue-on-error"]
+UnitStatus = Literal["succeeded", "failed", "skipped"]
+
+TERRAGRUNT_COMMANDS: dict[TerragruntCommand, list[str]] = {
+  "plan": ["terragrunt", "plan", "-input=false"],
+  "apply": ["terragrunt", "apply", "-input=false", "-auto-approve"],
+}
+DEPENDENCY_CONFIG_PATH_PATTERN = re.compile(r'(?ms)^\s*dependency\s+"[^"]*"\s*\{[^}]*?config_path\s*=\s*"([^"]+)"')
+DEPENDENCIES_PATHS_PATTERN = re.compile(r"(?ms)^\s*dependencies\s*\{[^}]*?paths\s*=\s*\[([^\]]*)\]")
+QUOTED_STRING_PATTERN = re.compile(r'"([^"]+)"')
+
+UnitGraph = dict[str, set[str]]
+
+
+class UnitResult(TypedDict):
+  directory: str
+  status: UnitStatus
+  duration_seconds: float
+  log_path: str | None
+  error: str | None
+
+
+class DependencyCycleError(ValueError):
+  def __init__(self, units: list[str]) -> None:
+    super().__init__(f"Terragrunt dependencies form a cycle between: {', '.join(units)}")
+
+
+def declared_dependencies(unit_dir: str) -> set[str]:
+  with open(os.path.join(unit_dir, TERRAGRUNT_HCL_FILENAME)) as file:
+    content = file.read()
+
+  paths = DEPENDENCY_CONFIG_PATH_PATTERN.findall(content)
+  for paths_list in DEPENDENCIES_PATHS_PATTERN.findall(content):
+    paths.extend(QUOTED_STRING_PATTERN.findall(paths_list))
+  return {os.path.normpath(os.path.join(unit_dir, path)) for path in paths}
+
+
+def build_unit_graph(
+  accounts_dir: str, management_account_name: str, index: AccountDirectoryIndex | None = None
+) -> UnitGraph:
+  index = index or AccountDirectoryIndex.build(accounts_dir)
+  units = set(index.directories_with_file(TERRAGRUNT_HCL_FILENAME))
+  management_dir = os.path.join(index.base_dir, management_account_name)
+  management_units = {unit for unit in units if unit == management_dir or unit.startswith(f"{management_dir}{os.sep}")}
+
+  graph: UnitGraph = {}
+  for unit in units:
+    # Member accounts are created by the management account's units, so every one of those goes first
+    dependencies = declared_dependencies(unit) & units
+    if unit not in management_units:
+      dependencies |= management_units
+    graph[unit] = dependencies
+  check_acyclic(graph)
+  return graph
+
+
+def check_acyclic(graph: UnitGraph) -> None:
+  remaining = {unit: set(dependencies) for unit, dependencies in graph.items()}
+  while remaining:
+    ready = [unit for unit, dependencies in remaining.items() if not dependencies]
+    if not ready:
+      raise DependencyCycleError(sorted(remaining))
+    for unit in ready:
+      del remaining[unit]
+    for dependencies in remaining.values():
+      dependencies.difference_update(ready)
+
+
+def unit_name(unit_dir: str, accounts_dir: str) -> str:
+  return os.path.relpath(unit_dir, accounts_dir)
+
+
+def unit_log_path(log_dir: Path, unit_dir: str, accounts_dir: str) -> Path:
+  return log_dir / f"{unit_name(unit_dir, accounts_dir).replace(os.sep, '__')}.log"
+
+
+def run_unit(
+  unit_dir: str, command: TerragruntCommand, accounts_dir: str, log_dir: Path, env: dict[str, str]
+) -> UnitResult:
+  start = time.perf_counter()
+  log_path = unit_log_path(log_dir, unit_dir, accounts_dir)
+  error = None
+  try:
+    with instrumentation.span(command, account=unit_name(unit_dir, accounts_dir)), open(log_path, "w") as log_file:
+      log_file.write(f"$ {' '.join(TERRAGRUNT_COMMANDS[command])}\n")
+      log_file.flush()
+      # Output goes straight to the log file, so hundreds of concurrent plans are not held in memory
+      completed = subprocess.run(
+        TERRAGRUNT_COMMANDS[command],
+        cwd=unit_dir,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        text=True,
+        env=env,
+        check=False,
+      )
+    if completed.returncode != 0:
+      error = f"terragrunt {command} exited with code {completed.returncode}"
+  except OSError as e:
+    error = str(e)
+
+  return {
+    "directory": unit_dir,
+    "status": "succeeded" if error is None else "failed",
+    "duration_seconds": time.perf_counter() - start,
+    "log_path": str(log_path),
+    "error": error,
+  }
+
+
+def skipped_unit_result(unit_dir: str, reason: str) -> UnitResult:
+  return {"directory": unit_dir, "status": "skipped", "duration_seconds": 0.0, "log_path": None, "error": reason}
+
+
+def print_unit_result(result: UnitResult, accounts_dir: str) -> None:
+  name = unit_name(result["directory"], accounts_dir)
+  if result["status"] == "succeeded":
+    print(f"{config.Colors.GREEN}{name}: succeeded ({result['duration_seconds']:.1f}s){config.Colors.RESET}")
+  elif result["status"] == "failed":
+    print(f"{config.Colors.RED}{name}: {result['error']}, see {result['log_path']}{config.Colors.RESET}")
+  else:
+    print(f"{config.Colors.YELLOW}{name}: skipped, {result['error']}{config.Colors.RESET}")
+
+
+def skip_reason(
+  dependencies: set[str], results: dict[str, UnitResult], accounts_dir: str, *, stopped: bool
+) -> str | None:
+  if stopped:
+    return "an earlier unit failed and the fail-fast policy stopped the run"
+  blocked_by = sorted(dep for dep in dependencies if dep in results and results[dep]["status"] != "succeeded")
+  if blocked_by:
+    return f"dependency {unit_name(blocked_by[0], accounts_dir)} did not succeed"
+  return None
+
+
+def run_unit_graph(  # noqa: PLR0913
+  graph: UnitGraph,
+  command: TerragruntCommand,
+  accounts_dir: str,
+  log_dir: Path,
+  max_workers: int = config.MAX_WORKERS,
+  policy: FailurePolicy = "fail-fast",
+) -> list[UnitResult]:
+  log_dir.mkdir(parents=True, exist_ok=True)
+  env = terragrunt_environment()
+  pending = dict(graph)
+  results: dict[str, UnitResult] = {}
+  running: dict[Future[UnitResult], str] = {}
+  stopped = False
+
+  def settle(result: UnitResult) -> None:
+    results[result["directory"]] = result
+    print_unit_result(result, accounts_dir)
+
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    while pending or running:
+      # Skipping a unit can unblock the decision for its dependents, so the pending units are scanned until stable
+      changed = True
+      while changed:
+        changed = False
+        for unit in sorted(pending):
+          reason = skip_reason(pending[unit], results, accounts_dir, stopped=stopped)
+          if reason is not None:
+            settle(skipped_unit_result(unit, reason))
+            del pending[unit]
+            changed = True
+          elif pending[unit] <= results.keys():
+            running[executor.submit(run_unit, unit, command, accounts_dir, log_dir, env)] = unit
+            del pending[unit]
+
+      if not running:
+        break
+      done, _ = wait(running, return_when=FIRST_COMPLETED)
+      for future in done:
+        del running[future]
+        result = future.result()
+        settle(result)
+        if result["status"] == "failed" and policy == "fail-fast":
+          stopped = True
+
+  return sorted(results.values(), key=lambda result: result["directory"])
+
+
+def print_run_summary(
+  results: list[UnitResult], command: TerragruntCommand, accounts_dir: str, wall_seconds: float, slowest_count: int = 5
+) -> None:
+  counts = {
+    status: sum(result["status"] == status for result in results) for status in ("succeeded", "failed", "skipped")
+  }
+  print(
+    f"\nTerragrunt {command}: {counts['succeeded']} succeeded, {counts['failed']} failed, {counts['skipped']} skipped "
+    f"in {wall_seconds:.1f}s"
+  )
+
+  ran = [result for result in results if result["status"] != "skipped"]
+  for result in sorted(ran, key=lambda result: result["duration_seconds"], reverse=True)[:slowest_count]:
+    print(f"  {result['duration_seconds']:6.1f}s  {unit_name(result['directory'], accounts_dir)}")
+
+  for result in results:
+    if result["status"] == "failed":
+      print(
+        f"{config.Colors.RED}  Failed: {unit_name(result['directory'], accounts_dir)}: {result['log_path']}"
+        f"{config.Colors.RESET}"
+      )
+
+
+def orchestrate(  # noqa: PLR0913
+  command: TerragruntCommand,
+  accounts_dir: str,
+  management_account_name: str,
+  max_workers: int = config.MAX_WORKERS,
+  policy: FailurePolicy = "fail-fast",
+  log_dir: Path | None = None,
+) -> list[UnitResult]:
+  timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+  log_dir = log_dir or config.TERRAGRUNT_LOG_DIRECTORY_PATH / f"{command}-{timestamp}"
+
+  with instrumentation.span("build_unit_graph"):
+    graph = build_unit_graph(accounts_dir, management_account_name)
+  print(f"Running terragrunt {command} in {len(graph)} directories, logs in {log_dir}")
+
+  start = time.perf_counter()
+  results = run_unit_graph(graph, command, accounts_dir, log_dir, max_workers, policy)
+  print_run_summary(results, command, accounts_dir, time.perf_counter() - start)
+  return results
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+  parser = argparse.ArgumentParser(
+    description="Run terragrunt plan or apply across all account directories, management account first"
+  )
+  parser.add_argument("command", choices=list(TERRAGRUNT_COMMANDS))
+  parser.add_argument("--max-workers", type=int, default=config.MAX_WORKERS, help="Directories to run at once")
+  parser.add_argument(
+    "--continue-on-error",
+    action="store_true",
+    help="Keep running directories that do not depend on a failed one, instead of stopping at the first failure",
+  )
+  parser.add_argument("--accounts-dir", default=config.ACCOUNTS_DIRECTORY_PATH)
+  return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+  args = parse_args(argv)
+  with instrumentation.run("setup_terragrunt_orchestrator"):
+    management_account_name = parse_ous_accounts_data.get_account_registry().management_account.name
+    results = orchestrate(
+      args.command,
+      args.accounts_dir,
+      management_account_name,
+      args.max_workers,
+      "continue-on-error" if args.continue_on_error else "fail-fast",
+    )
+  return 0 if all(result["status"] == "succeeded" for result in results) else 1
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,158 @@
+# ignoring redefinition of pytest fixture functions
+# ruff: noqa: F811
+
+import subprocess
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+from pytest_mock import MockerFixture
+
+from setup_terragrunt_orchestrator import (
+  DependencyCycleError,
+  build_unit_graph,
+  check_acyclic,
+  main,
+  orchestrate,
+)
+from tests.conftest import isolated_event_log  # noqa: F401
+
+MANAGEMENT_ACCOUNT_NAME = "test-management"
+MEMBER_ACCOUNT_NAMES = ("test-backup", "test-sandbox", "test-security")
+DEPENDENCY_HCL = """dependency "organizational_units" {
+  config_path = "../organizational-units"
+}
+"""
+
+
+@pytest.fixture
+def accounts_dir(tmp_path: Path) -> Path:
+  accounts_dir = tmp_path / "accounts"
+  for account_name in (MANAGEMENT_ACCOUNT_NAME, *MEMBER_ACCOUNT_NAMES):
+    (accounts_dir / account_name).mkdir(parents=True)
+    (accounts_dir / account_name / "terragrunt.hcl").write_text('include {\n  path = "root.hcl"\n}\n')
+  organization_dir = accounts_dir / MANAGEMENT_ACCOUNT_NAME / "organization"
+  for unit_name, content in (("organizational-units", ""), ("ou-workloads", DEPENDENCY_HCL)):
+    (organization_dir / unit_name).mkdir(parents=True)
+    (organization_dir / unit_name / "terragrunt.hcl").write_text(content)
+  return accounts_dir
+
+
+class RecordingRun:
+  def __init__(self, failing: set[str] | None = None) -> None:
+    self.failing = failing or set()
+    self.calls: list[str] = []
+    self._lock = threading.Lock()
+
+  def __call__(self, command: list[str], *, cwd: str, stdout: Any, **kwargs: Any) -> subprocess.CompletedProcess[str]:
+    name = Path(cwd).name
+    with self._lock:
+      self.calls.append(name)
+    stdout.write(f"{command[1]} output for {name}\n")
+    return subprocess.CompletedProcess(command, 1 if name in self.failing else 0)
+
+
+@pytest.fixture
+def recording_run(mocker: MockerFixture, tmp_path: Path) -> RecordingRun:
+  mocker.patch("utils.config.TERRAFORM_PLUGIN_CACHE_PATH", tmp_path / "plugin-cache")
+  run = RecordingRun()
+  mocker.patch("subprocess.run", side_effect=run)
+  return run
+
+
+def test_build_unit_graph_puts_management_units_first(accounts_dir: Path) -> None:
+  graph = build_unit_graph(str(accounts_dir), MANAGEMENT_ACCOUNT_NAME)
+
+  management_dir = str(accounts_dir / MANAGEMENT_ACCOUNT_NAME)
+  organizational_units = f"{management_dir}/organization/organizational-units"
+  ou_workloads = f"{management_dir}/organization/ou-workloads"
+  management_units = {management_dir, organizational_units, ou_workloads}
+  assert graph[management_dir] == set()
+  assert graph[organizational_units] == set()
+  assert graph[ou_workloads] == {organizational_units}
+  for account_name in MEMBER_ACCOUNT_NAMES:
+    assert graph[str(accounts_dir / account_name)] == management_units
+
+
+def test_check_acyclic_rejects_cycles() -> None:
+  with pytest.raises(DependencyCycleError, match="a, b"):
+    check_acyclic({"a": {"b"}, "b": {"a"}, "c": set()})
+
+
+def test_orchestrate_runs_members_after_management(
+  accounts_dir: Path, recording_run: RecordingRun, tmp_path: Path
+) -> None:
+  results = orchestrate("plan", str(accounts_dir), MANAGEMENT_ACCOUNT_NAME, log_dir=tmp_path / "logs")
+
+  assert all(result["status"] == "succeeded" for result in results)
+  assert recording_run.calls.index("organizational-units") < recording_run.calls.index("ou-workloads")
+  first_member = min(recording_run.calls.index(account_name) for account_name in MEMBER_ACCOUNT_NAMES)
+  assert first_member > recording_run.calls.index("ou-workloads")
+  assert first_member > recording_run.calls.index(MANAGEMENT_ACCOUNT_NAME)
+  log_path = tmp_path / "logs" / "test-sandbox.log"
+  assert log_path.read_text() == "$ terragrunt plan -input=false\nplan output for test-sandbox\n"
+
+
+def test_fail_fast_skips_everything_after_a_failure(
+  accounts_dir: Path, recording_run: RecordingRun, tmp_path: Path
+) -> None:
+  recording_run.failing = {MANAGEMENT_ACCOUNT_NAME}
+
+  results = orchestrate("apply", str(accounts_dir), MANAGEMENT_ACCOUNT_NAME, max_workers=1, log_dir=tmp_path)
+
+  statuses = {Path(result["directory"]).name: result["status"] for result in results}
+  assert statuses[MANAGEMENT_ACCOUNT_NAME] == "failed"
+  assert not set(MEMBER_ACCOUNT_NAMES) & set(recording_run.calls)
+  assert all(statuses[account_name] == "skipped" for account_name in MEMBER_ACCOUNT_NAMES)
+
+
+def test_continue_on_error_runs_independent_units(
+  accounts_dir: Path, recording_run: RecordingRun, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+  recording_run.failing = {"organizational-units"}
+
+  results = orchestrate(
+    "plan", str(accounts_dir), MANAGEMENT_ACCOUNT_NAME, policy="continue-on-error", log_dir=tmp_path
+  )
+
+  statuses = {Path(result["directory"]).name: result["status"] for result in results}
+  assert statuses == {
+    MANAGEMENT_ACCOUNT_NAME: "succeeded",
+    "organizational-units": "failed",
+    "ou-workloads": "skipped",
+    "test-backup": "skipped",
+    "test-sandbox": "skipped",
+    "test-security": "skipped",
+  }
+  assert "1 succeeded, 1 failed, 4 skipped" in capsys.readouterr().out
+
+
+def test_continue_on_error_isolates_member_failures(
+  tmp_path: Path, recording_run: RecordingRun, capsys: pytest.CaptureFixture[str]
+) -> None:
+  accounts_dir = tmp_path / "accounts"
+  for account_name in (MANAGEMENT_ACCOUNT_NAME, *MEMBER_ACCOUNT_NAMES):
+    (accounts_dir / account_name).mkdir(parents=True)
+    (accounts_dir / account_name / "terragrunt.hcl").touch()
+  recording_run.failing = {"test-backup"}
+
+  results = orchestrate(
+    "plan", str(accounts_dir), MANAGEMENT_ACCOUNT_NAME, policy="continue-on-error", log_dir=tmp_path / "logs"
+  )
+
+  assert [result["status"] for result in results] == ["failed", "succeeded", "succeeded", "succeeded"]
+  assert "3 succeeded, 1 failed, 0 skipped" in capsys.readouterr().out
+
+
+def test_main_exit_code(
+  accounts_dir: Path, recording_run: RecordingRun, mocker: MockerFixture, tmp_path: Path, isolated_event_log: Path
+) -> None:
+  mocker.patch("utils.config.TERRAGRUNT_LOG_DIRECTORY_PATH", tmp_path / "logs")
+  get_account_registry = mocker.patch("utils.parse_ous_accounts_data.get_account_registry")
+  get_account_registry.return_value.management_account.name = MANAGEMENT_ACCOUNT_NAME
+
+  assert main(["plan", "--accounts-dir", str(accounts_dir)]) == 0
+  recording_run.failing = {"test-security"}
+  assert main(["plan", "--accounts-dir", str(accounts_dir), "--continue-on-error"]) == 1
+  assert list(isolated_event_log.glob("setup_terragrunt_orchestrator-*.jsonl")) != []
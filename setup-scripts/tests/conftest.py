@@ -1,5 +1,5 @@
-from collections.abc import Callable
-from datetime import datetime, timezone
+from collections.abc import Callable, Generator
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import MagicMock
 
@@ -19,6 +19,7 @@ from tests.test_ous_accounts_registry import (
   S3_BACKEND_BUCKET_NAME,
   TERRAFORM_ADMIN_ROLE_NAME,
 )
+from utils import credentials_cache
 from utils.models import Account, ManagementAccountDetails, TerraformBackendConfig
 
 TEST_ACCOUNT_COUNT = sum(len(accounts) for accounts in OUS_ACCOUNTS.values())
@@ -46,6 +47,36 @@ def test_data() -> dict[str, str]:
   }
 
 
+@pytest.fixture(autouse=True)
+def isolated_credentials_cache(tmp_path: Path, mocker: MockerFixture) -> Generator[Path, None, None]:
+  cache_path = tmp_path / "cache" / "credentials.json"
+  mocker.patch("utils.config.CREDENTIALS_CACHE_PATH", cache_path)
+  credentials_cache.clear_credentials_cache()
+  yield cache_path
+  credentials_cache.clear_credentials_cache()
+
+
+@pytest.fixture(autouse=True)
+def isolated_org_inventory(tmp_path: Path, mocker: MockerFixture) -> Path:
+  inventory_path = tmp_path / "cache" / "org-inventory.json"
+  mocker.patch("utils.config.ORG_INVENTORY_PATH", inventory_path)
+  return inventory_path
+
+
+@pytest.fixture(autouse=True)
+def isolated_event_log(tmp_path: Path, mocker: MockerFixture) -> Path:
+  event_log_dir = tmp_path / "events"
+  mocker.patch("utils.config.EVENT_LOG_DIRECTORY_PATH", event_log_dir)
+  return event_log_dir
+
+
+@pytest.fixture(autouse=True)
+def isolated_registry_snapshots(tmp_path: Path, mocker: MockerFixture) -> Path:
+  snapshot_dir = tmp_path / "cache" / "registry-snapshots"
+  mocker.patch("utils.config.REGISTRY_SNAPSHOT_DIRECTORY_PATH", snapshot_dir)
+  return snapshot_dir
+
+
 @pytest.fixture
 def test_aws_credentials() -> AssumeRoleResponseTypeDef:
   return {
@@ -53,7 +84,7 @@ def test_aws_credentials() -> AssumeRoleResponseTypeDef:
       "AccessKeyId": "test-key",
       "SecretAccessKey": "test-secret",
       "SessionToken": "test-token",
-      "Expiration": datetime(1988, 1, 13, 0, 0, 0, tzinfo=timezone.utc),
+      "Expiration": datetime.now(timezone.utc) + timedelta(hours=1),
     },
     "AssumedRoleUser": {"AssumedRoleId": "test-role-id", "Arn": "test-arn"},
     "PackedPolicySize": 123,
@@ -110,17 +141,17 @@ def test_account_factory(
 
 @pytest.fixture
 def mock_sts(mocker: MockerFixture) -> MagicMock:
-  return mocker.patch("boto3.client", return_value=MagicMock())
+  return mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
 
 
 @pytest.fixture
 def mock_iam(mocker: MockerFixture) -> MagicMock:
-  return mocker.patch("boto3.client", return_value=MagicMock())
+  return mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
 
 
 @pytest.fixture
 def mock_s3(mocker: MockerFixture) -> MagicMock:
-  return mocker.patch("boto3.client", return_value=MagicMock())
+  return mocker.patch("utils.aws_clients.get_client", return_value=MagicMock())
 
 
 @pytest.fixture
@@ -161,12 +192,12 @@ def test_accounts(test_account_factory: Callable[[str, str, str], Account]) -> l
 @pytest.fixture
 def account_details_content(test_account: Account) -> str:
   return f"""locals {{
-  account_name = "{test_account.name}"
-  account_id = "{test_account.id}"
-  organizational_unit = "{test_account.organizational_unit}"
-  aws_region = "{AWS_REGION}"
+  account_name              = "{test_account.name}"
+  account_id                = "{test_account.id}"
+  organizational_unit       = "{test_account.organizational_unit}"
+  aws_region                = "{AWS_REGION}"
   terraform_admin_role_name = "{TERRAFORM_ADMIN_ROLE_NAME}"
-  s3_backend_bucket_name = "{S3_BACKEND_BUCKET_NAME}"
+  s3_backend_bucket_name    = "{S3_BACKEND_BUCKET_NAME}"
 }}"""
 
 
@@ -0,0 +1,54 @@
+import re
+
+LOCALS_BLOCK_START_PATTERN = re.compile(rb"(?m)^[ \t]*locals[ \t]*\{")
+
+
+class AttributeNotFoundError(ValueError):
+  def __init__(self, attribute_name: str) -> None:
+    super().__init__(f"No {attribute_name} attribute found in locals block")
+
+
+def locals_block_span(content: bytes) -> tuple[int, int] | None:
+  match = LOCALS_BLOCK_START_PATTERN.search(content)
+  if match is None:
+    return None
+
+  depth = 0
+  in_string = False
+  position = match.end() - 1
+  while position < len(content):
+    char = content[position : position + 1]
+    if in_string:
+      if char == b"\\":
+        position += 1
+      elif char == b'"':
+        in_string = False
+    elif char == b'"':
+      in_string = True
+    elif char == b"{":
+      depth += 1
+    elif char == b"}":
+      depth -= 1
+      if depth == 0:
+        return match.end(), position
+    position += 1
+  return None
+
+
+def string_attribute_pattern(attribute_name: str) -> re.Pattern[bytes]:
+  return re.compile(rb"(?<![\w.])(" + re.escape(attribute_name.encode()) + rb'[ \t]*=[ \t]*")([^"\n]*)(")')
+
+
+def replace_locals_string_attribute(content: bytes, attribute_name: str, value: str) -> bytes:
+  # Only the quoted value inside the locals block is replaced, so alignment, comments and the
+  # trailing newline stay byte for byte identical.
+  span = locals_block_span(content)
+  if span is None:
+    raise AttributeNotFoundError(attribute_name)
+
+  start, end = span
+  match = string_attribute_pattern(attribute_name).search(content, start, end)
+  if match is None:
+    raise AttributeNotFoundError(attribute_name)
+
+  return content[: match.start(2)] + value.encode() + content[match.end(2) :]
@@ -0,0 +1,55 @@
+import pytest
+
+from utils.account_details import AttributeNotFoundError, locals_block_span, replace_locals_string_attribute
+
+ALIGNED_ACCOUNT_DETAILS = b"""locals {
+  account_name              = "test-account"
+  account_id                = "000000000000"
+  # account_id = "commented"
+  terraform_admin_role_name = "TerraformAdminRole"
+}
+"""
+
+
+def test_replace_preserves_alignment_and_trailing_newline() -> None:
+  updated = replace_locals_string_attribute(ALIGNED_ACCOUNT_DETAILS, "account_id", "222222222222")
+
+  assert updated == ALIGNED_ACCOUNT_DETAILS.replace(b'"000000000000"', b'"222222222222"', 1)
+
+
+def test_replace_only_targets_exact_attribute_name() -> None:
+  content = b'locals {\n  management_account_id = "111111111111"\n  account_id = ""\n}\n'
+
+  updated = replace_locals_string_attribute(content, "account_id", "222222222222")
+
+  assert updated == b'locals {\n  management_account_id = "111111111111"\n  account_id = "222222222222"\n}\n'
+
+
+def test_replace_ignores_attributes_outside_locals_block() -> None:
+  content = b'inputs = {\n  account_id = "000000000000"\n}\n\nlocals {\n  account_id = "000000000000"\n}\n'
+
+  updated = replace_locals_string_attribute(content, "account_id", "222222222222")
+
+  assert updated.startswith(b'inputs = {\n  account_id = "000000000000"\n}')
+  assert updated.endswith(b'locals {\n  account_id = "222222222222"\n}\n')
+
+
+def test_replace_single_line_locals_block() -> None:
+  updated = replace_locals_string_attribute(b'locals { account_id = "" }', "account_id", "222222222222")
+
+  assert updated == b'locals { account_id = "222222222222" }'
+
+
+def test_locals_block_span_skips_braces_in_strings() -> None:
+  content = b'locals {\n  name = "with } brace"\n  account_id = ""\n}\n'
+
+  span = locals_block_span(content)
+
+  assert span is not None
+  assert content[span[0] : span[1]].endswith(b'account_id = ""\n')
+
+
+@pytest.mark.parametrize("content", [b'inputs = {\n  account_id = ""\n}\n', b'locals {\n  account_name = "x"\n}\n'])
+def test_replace_raises_when_attribute_missing(content: bytes) -> None:
+  with pytest.raises(AttributeNotFoundError, match="No account_id attribute found in locals block"):
+    replace_locals_string_attribute(content, "account_id", "222222222222")
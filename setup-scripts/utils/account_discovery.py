@@ -0,0 +1,67 @@
+import os
+from typing import TypedDict
+
+PRUNED_DIRECTORY_NAMES = frozenset({".terragrunt-cache", ".terraform"})
+
+
+class DiscoveredDirectory(TypedDict):
+  path: str
+  files: frozenset[str]
+
+
+def is_pruned_directory(name: str) -> bool:
+  return name in PRUNED_DIRECTORY_NAMES or name.startswith(".")
+
+
+def scan_directories(base_dir: str) -> list[DiscoveredDirectory]:
+  # os.walk would descend into .terragrunt-cache and .terraform, which hold tens of thousands of
+  # provider and module files after init. scandir also yields file types without extra stat calls.
+  directories: list[DiscoveredDirectory] = []
+  pending = [base_dir]
+  while pending:
+    dir_path = pending.pop()
+    files = set()
+    try:
+      with os.scandir(dir_path) as entries:
+        for entry in entries:
+          if entry.is_dir(follow_symlinks=False):
+            if not is_pruned_directory(entry.name):
+              pending.append(entry.path)
+          elif entry.is_file():
+            files.add(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+      continue
+    directories.append({"path": dir_path, "files": frozenset(files)})
+
+  directories.sort(key=lambda directory: directory["path"])
+  return directories
+
+
+class AccountDirectoryIndex:
+  def __init__(self, base_dir: str, directories: list[DiscoveredDirectory]) -> None:
+    self.base_dir = base_dir
+    self.directories = directories
+    self.accounts: dict[str, DiscoveredDirectory] = {
+      os.path.basename(directory["path"]): directory
+      for directory in directories
+      if os.path.dirname(directory["path"]) == base_dir
+    }
+
+  @classmethod
+  def build(cls, base_dir: str) -> "AccountDirectoryIndex":
+    base_dir = os.path.normpath(base_dir)
+    return cls(base_dir, scan_directories(base_dir))
+
+  def has_file(self, account_name: str, filename: str) -> bool:
+    account = self.accounts.get(account_name)
+    return account is not None and filename in account["files"]
+
+  def account_file_path(self, account_name: str, filename: str) -> str:
+    return os.path.join(self.accounts[account_name]["path"], filename)
+
+  def directories_with_file(self, filename: str) -> list[str]:
+    return [
+      directory["path"]
+      for directory in self.directories
+      if directory["path"] != self.base_dir and filename in directory["files"]
+    ]
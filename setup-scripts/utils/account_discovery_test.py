@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from utils.account_discovery import AccountDirectoryIndex
+
+
+@pytest.fixture
+def accounts_dir(tmp_path: Path) -> Path:
+  accounts_dir = tmp_path / "accounts"
+  for account_name in ("account-a", "account-b"):
+    account_dir = accounts_dir / account_name
+    account_dir.mkdir(parents=True)
+    (account_dir / "terragrunt.hcl").touch()
+    (account_dir / "account_details.hcl").touch()
+
+  (accounts_dir / "account-c").mkdir()
+
+  nested_unit = accounts_dir / "account-a" / "units" / "nested"
+  nested_unit.mkdir(parents=True)
+  (nested_unit / "terragrunt.hcl").touch()
+
+  for pruned in (".terragrunt-cache/abc/module", ".terraform/modules/vpc", ".hidden"):
+    pruned_dir = accounts_dir / "account-b" / pruned
+    pruned_dir.mkdir(parents=True)
+    (pruned_dir / "terragrunt.hcl").touch()
+  return accounts_dir
+
+
+def test_index_exposes_account_file_presence(accounts_dir: Path) -> None:
+  index = AccountDirectoryIndex.build(str(accounts_dir))
+
+  assert sorted(index.accounts) == ["account-a", "account-b", "account-c"]
+  assert index.has_file("account-a", "account_details.hcl")
+  assert not index.has_file("account-c", "account_details.hcl")
+  assert not index.has_file("missing-account", "account_details.hcl")
+  assert index.account_file_path("account-a", "account_details.hcl") == str(
+    accounts_dir / "account-a" / "account_details.hcl"
+  )
+
+
+def test_index_prunes_cache_and_hidden_directories(accounts_dir: Path) -> None:
+  index = AccountDirectoryIndex.build(str(accounts_dir))
+
+  assert index.directories_with_file("terragrunt.hcl") == [
+    str(accounts_dir / "account-a"),
+    str(accounts_dir / "account-a" / "units" / "nested"),
+    str(accounts_dir / "account-b"),
+  ]
+
+
+def test_index_of_missing_directory_is_empty(tmp_path: Path) -> None:
+  index = AccountDirectoryIndex.build(str(tmp_path / "missing"))
+
+  assert index.accounts == {}
+  assert index.directories_with_file("terragrunt.hcl") == []
@@ -0,0 +1,92 @@
+import bisect
+from collections.abc import Iterator
+
+from utils.models import Account
+
+
+class DuplicateAccountError(ValueError):
+  def __init__(self, field: str, value: str, organizational_units: tuple[str, str]) -> None:
+    super().__init__(
+      f"Account {field} {value!r} is in the registry twice, in {organizational_units[0]} and {organizational_units[1]}"
+    )
+
+
+class AccountRegistry:
+  # The registry's accounts, indexed once by name, ID, OU and sorted name, so scripts look accounts up
+  # instead of scanning the list. Names and IDs are checked for duplicates while the indexes are built.
+  def __init__(self, accounts: list[Account], management_account_id: str | None = None) -> None:
+    self.accounts = accounts
+    self.management_account_id = management_account_id
+    self._by_name: dict[str, Account] = {}
+    self._by_id: dict[str, Account] = {}
+    self._by_ou: dict[str, list[Account]] = {}
+    for account in accounts:
+      self._index(account)
+    self._sorted_names = sorted(self._by_name)
+    if management_account_id is not None and management_account_id not in self._by_id:
+      error_msg = f"MANAGEMENT_ACCOUNT_ID {management_account_id} is not the ID of any account in OUS_ACCOUNTS"
+      raise ValueError(error_msg)
+
+  def _index(self, account: Account) -> None:
+    existing = self._by_name.setdefault(account.name, account)
+    if existing is not account:
+      field = "name"
+      raise DuplicateAccountError(field, account.name, (existing.organizational_unit, account.organizational_unit))
+    # IDs stay empty until an account is created, so only filled in IDs have to be unique
+    if account.id:
+      existing = self._by_id.setdefault(account.id, account)
+      if existing is not account:
+        field = "ID"
+        raise DuplicateAccountError(field, account.id, (existing.organizational_unit, account.organizational_unit))
+    self._by_ou.setdefault(account.organizational_unit, []).append(account)
+
+  def __reduce__(self) -> tuple[type["AccountRegistry"], tuple[list[Account], str | None]]:
+    # Snapshots only store the accounts, the indexes are rebuilt in a few milliseconds when loaded
+    return (AccountRegistry, (self.accounts, self.management_account_id))
+
+  def __eq__(self, other: object) -> bool:
+    return (
+      isinstance(other, AccountRegistry)
+      and self.accounts == other.accounts
+      and self.management_account_id == other.management_account_id
+    )
+
+  __hash__ = None  # type: ignore[assignment]
+
+  def __len__(self) -> int:
+    return len(self.accounts)
+
+  def __iter__(self) -> Iterator[Account]:
+    return iter(self.accounts)
+
+  def __contains__(self, name: object) -> bool:
+    return name in self._by_name
+
+  def by_name(self, name: str) -> Account | None:
+    return self._by_name.get(name)
+
+  def by_id(self, account_id: str) -> Account | None:
+    return self._by_id.get(account_id)
+
+  def in_ou(self, organizational_unit: str) -> list[Account]:
+    return list(self._by_ou.get(organizational_unit, []))
+
+  @property
+  def management_account(self) -> Account:
+    if self.management_account_id is None:
+      error_msg = "The account registry was built without a management account ID"
+      raise ValueError(error_msg)
+    return self._by_id[self.management_account_id]
+
+  @property
+  def ou_names(self) -> list[str]:
+    return sorted(self._by_ou)
+
+  def with_name_prefix(self, prefix: str) -> list[Account]:
+    start = bisect.bisect_left(self._sorted_names, prefix)
+    matches = []
+    for name in self._sorted_names[start:]:
+      if not name.startswith(prefix):
+        break
+      matches.append(self._by_name[name])
+    return matches
@@ -0,0 +1,93 @@
+# ignoring redefinition of pytest fixture functions
+# ruff: noqa: F811
+
+import pickle
+from collections.abc import Callable
+
+import pytest
+
+from tests.conftest import terraform_config, test_account_factory, test_accounts, test_data  # noqa: F401
+from tests.test_ous_accounts_registry import ACCOUNTS_PREFIX
+from utils.account_registry import AccountRegistry, DuplicateAccountError
+from utils.models import Account
+
+
+def test_registry_indexes_accounts(test_accounts: list[Account]) -> None:
+  registry = AccountRegistry(test_accounts)
+
+  assert len(registry) == len(test_accounts)
+  assert list(registry) == test_accounts
+  assert registry.by_name(f"{ACCOUNTS_PREFIX}-backup") is test_accounts[1]
+  assert registry.by_id("222222222222") is test_accounts[1]
+  assert registry.by_name("missing") is None
+  assert registry.by_id("000000000000") is None
+  assert f"{ACCOUNTS_PREFIX}-sandbox" in registry
+  assert registry.ou_names == sorted({account.organizational_unit for account in test_accounts})
+  assert [account.name for account in registry.in_ou("Workloads")] == [
+    f"{ACCOUNTS_PREFIX}-workloads-production",
+    f"{ACCOUNTS_PREFIX}-workloads-staging",
+  ]
+  assert registry.in_ou("Missing") == []
+
+
+def test_registry_finds_accounts_by_name_prefix(test_accounts: list[Account]) -> None:
+  registry = AccountRegistry(test_accounts)
+
+  assert [account.name for account in registry.with_name_prefix(f"{ACCOUNTS_PREFIX}-workloads-")] == [
+    f"{ACCOUNTS_PREFIX}-workloads-production",
+    f"{ACCOUNTS_PREFIX}-workloads-staging",
+  ]
+  assert len(registry.with_name_prefix(ACCOUNTS_PREFIX)) == len(
+    [account for account in test_accounts if account.name.startswith(ACCOUNTS_PREFIX)]
+  )
+  assert registry.with_name_prefix("zzz") == []
+
+
+@pytest.mark.parametrize(
+  ("name", "account_id", "match"),
+  [
+    ("-backup", "999999999999", "Account name '.*-backup' is in the registry twice, in Infrastructure and Sandbox"),
+    ("-other", "222222222222", "Account ID '222222222222' is in the registry twice, in Infrastructure and Sandbox"),
+  ],
+)
+def test_registry_rejects_duplicates(
+  test_accounts: list[Account],
+  test_account_factory: Callable[[str, str, str], Account],
+  name: str,
+  account_id: str,
+  match: str,
+) -> None:
+  duplicate = test_account_factory(f"{ACCOUNTS_PREFIX}{name}", account_id, "Sandbox")
+
+  with pytest.raises(DuplicateAccountError, match=match):
+    AccountRegistry([*test_accounts, duplicate])
+
+
+def test_registry_allows_accounts_without_ids(
+  test_accounts: list[Account], test_account_factory: Callable[[str, str, str], Account]
+) -> None:
+  new_accounts = [test_account_factory(f"{ACCOUNTS_PREFIX}-new-{n}", "", "Sandbox") for n in range(2)]
+
+  registry = AccountRegistry([*test_accounts, *new_accounts])
+
+  assert registry.by_id("") is None
+  assert registry.in_ou("Sandbox")[-2:] == new_accounts
+
+
+def test_registry_finds_the_management_account(test_accounts: list[Account]) -> None:
+  registry = AccountRegistry(test_accounts, test_accounts[0].id)
+
+  assert registry.management_account is test_accounts[0]
+  with pytest.raises(ValueError, match="MANAGEMENT_ACCOUNT_ID 000000000000 is not the ID of any account"):
+    AccountRegistry(test_accounts, "000000000000")
+  with pytest.raises(ValueError, match="without a management account ID"):
+    _ = AccountRegistry(test_accounts).management_account
+
+
+def test_registry_rebuilds_its_indexes_when_unpickled(test_accounts: list[Account]) -> None:
+  registry = pickle.loads(pickle.dumps(AccountRegistry(test_accounts, test_accounts[0].id)))
+
+  assert list(registry) == test_accounts
+  assert registry.management_account == test_accounts[0]
+  assert registry.by_id("444444444444") == test_accounts[3]
+  assert registry.ou_names == AccountRegistry(test_accounts).ou_names
@@ -0,0 +1,105 @@
+import threading
+from typing import TYPE_CHECKING, Any
+
+from utils import config, rate_limit
+
+# boto3 takes a large share of start-up time, so it is only imported once a client is needed
+if TYPE_CHECKING:
+  import boto3
+  from botocore.config import Config
+  from botocore.credentials import Credentials
+
+ClientKey = tuple[str, str | None, str | None]
+# The access key a cached client signs with, next to the client
+CachedClient = tuple[str | None, Any]
+
+_session: "boto3.Session | None" = None
+_clients: dict[ClientKey, CachedClient] = {}
+_max_pool_connections: int | None = None
+_lock = threading.Lock()
+
+
+def client_config() -> "Config":
+  from botocore.config import Config
+
+  return Config(
+    max_pool_connections=_max_pool_connections or config.MAX_WORKERS,
+    tcp_keepalive=True,
+    retries={"mode": config.AWS_RETRY_MODE, "total_max_attempts": config.AWS_MAX_ATTEMPTS},  # type: ignore[typeddict-item]
+  )
+
+
+def get_session() -> "boto3.Session":
+  import boto3
+
+  global _session  # noqa: PLW0603
+  with _lock:
+    if _session is None:
+      _session = boto3.Session()
+    return _session
+
+
+def use_session(session: "boto3.Session") -> None:
+  # Lets benchmarks and local stand-ins route every client through a session with their own event handlers
+  global _session  # noqa: PLW0603
+  with _lock:
+    _clients.clear()
+    _session = session
+
+
+def use_max_pool_connections(count: int) -> None:
+  # A script run with more workers than config.MAX_WORKERS needs as many connections per shared client
+  global _max_pool_connections  # noqa: PLW0603
+  with _lock:
+    _clients.clear()
+    _max_pool_connections = count
+
+
+def get_client(
+  service_name: str,
+  *,
+  region_name: str | None = None,
+  credentials: "Credentials | None" = None,
+  identity: str | None = None,
+) -> Any:
+  # Clients are cached per identity, e.g. the account whose role the credentials belong to, so every call made
+  # for one account shares one connection pool, loaded service model and rate limiter bucket. The client signs
+  # with the frozen keys it was created with. Reading them here refreshes credentials that are about to expire,
+  # and a rotated key replaces the identity's client instead of adding one next to it.
+  frozen_credentials = credentials.get_frozen_credentials() if credentials else None
+  access_key = frozen_credentials.access_key if frozen_credentials else None
+  key: ClientKey = (service_name, region_name, identity or access_key)
+
+  credential_kwargs = (
+    {
+      "aws_access_key_id": frozen_credentials.access_key,
+      "aws_secret_access_key": frozen_credentials.secret_key,
+      "aws_session_token": frozen_credentials.token,
+    }
+    if frozen_credentials
+    else {}
+  )
+  session = get_session()
+  with _lock:
+    cached = _clients.get(key)
+    if cached is not None and cached[0] == access_key:
+      return cached[1]
+    # A boto3 Session is not thread-safe, so clients of the shared session are only created under the lock
+    client = session.client(  # type: ignore[call-overload]
+      service_name,
+      region_name=region_name,
+      config=client_config(),
+      **credential_kwargs,
+    )
+    rate_limit.attach_rate_limiter(client, service_name, key[2])
+    _clients[key] = (access_key, client)
+  return client
+
+
+def clear_clients() -> None:
+  global _session, _max_pool_connections  # noqa: PLW0603
+  with _lock:
+    _clients.clear()
+    _session = None
+    _max_pool_connections = None
+  rate_limit.clear_rate_limiters()
@@ -0,0 +1,105 @@
+from collections.abc import Generator
+from typing import Any
+
+import boto3
+import pytest
+from botocore.credentials import Credentials
+from pytest_mock import MockerFixture
+
+from utils import aws_clients, rate_limit
+
+TEST_REGION = "us-west-2"
+TEST_MAX_WORKERS = 32
+TEST_ACCOUNT_ID = "111111111111"
+
+
+@pytest.fixture(autouse=True)
+def clear_clients() -> Generator[None, None, None]:
+  aws_clients.clear_clients()
+  yield
+  aws_clients.clear_clients()
+
+
+def test_get_session_is_shared() -> None:
+  assert aws_clients.get_session() is aws_clients.get_session()
+
+
+def test_use_session_replaces_session_and_clients() -> None:
+  iam_client = aws_clients.get_client("iam", region_name=TEST_REGION)
+  session = boto3.Session()
+
+  aws_clients.use_session(session)
+
+  assert aws_clients.get_session() is session
+  assert aws_clients.get_client("iam", region_name=TEST_REGION) is not iam_client
+
+
+def test_get_client_is_cached_per_service_and_region() -> None:
+  iam_client = aws_clients.get_client("iam", region_name=TEST_REGION)
+
+  assert aws_clients.get_client("iam", region_name=TEST_REGION) is iam_client
+  assert aws_clients.get_client("iam", region_name="us-east-1") is not iam_client
+  assert aws_clients.get_client("sts", region_name=TEST_REGION) is not iam_client
+
+
+def test_get_client_is_cached_per_credentials_identity() -> None:
+  first_credentials = Credentials("key-1", "secret-1", "token-1")
+  second_credentials = Credentials("key-2", "secret-2", "token-2")
+
+  first = aws_clients.get_client("iam", region_name=TEST_REGION, credentials=first_credentials)
+
+  assert aws_clients.get_client("iam", region_name=TEST_REGION, credentials=first_credentials) is first
+  assert aws_clients.get_client("iam", region_name=TEST_REGION, credentials=second_credentials) is not first
+  assert aws_clients.get_client("iam", region_name=TEST_REGION) is not first
+  assert first._request_signer._credentials.access_key == "key-1"
+
+
+def test_get_client_replaces_the_client_of_a_rotated_key() -> None:
+  first = aws_clients.get_client(
+    "iam", region_name=TEST_REGION, credentials=Credentials("key-1", "secret-1", "token-1"), identity=TEST_ACCOUNT_ID
+  )
+  rotated = aws_clients.get_client(
+    "iam", region_name=TEST_REGION, credentials=Credentials("key-2", "secret-2", "token-2"), identity=TEST_ACCOUNT_ID
+  )
+
+  assert rotated is not first
+  assert rotated._request_signer._credentials.access_key == "key-2"
+  assert list(aws_clients._clients) == [("iam", TEST_REGION, TEST_ACCOUNT_ID)]
+  assert list(rate_limit._rate_limiters) == [("iam", TEST_ACCOUNT_ID)]
+
+
+def test_get_client_creates_clients_under_the_lock(mocker: MockerFixture) -> None:
+  session = aws_clients.get_session()
+  create_client = session.client
+  lock_held = []
+
+  def client(*args: Any, **kwargs: Any) -> Any:
+    lock_held.append(aws_clients._lock.locked())
+    return create_client(*args, **kwargs)
+
+  mocker.patch.object(session, "client", side_effect=client)
+
+  aws_clients.get_client("iam", region_name=TEST_REGION)
+  aws_clients.get_client("iam", region_name=TEST_REGION)
+
+  assert lock_held == [True]
+
+
+def test_client_config_matches_concurrency(mocker: MockerFixture) -> None:
+  mocker.patch("utils.config.MAX_WORKERS", TEST_MAX_WORKERS)
+
+  client = aws_clients.get_client("s3", region_name=TEST_REGION)
+
+  assert client.meta.config.max_pool_connections == TEST_MAX_WORKERS
+  assert client.meta.config.tcp_keepalive is True
+  assert client.meta.config.retries == {"mode": "standard", "total_max_attempts": 10}
+
+
+def test_use_max_pool_connections_replaces_clients() -> None:
+  s3_client = aws_clients.get_client("s3", region_name=TEST_REGION)
+
+  aws_clients.use_max_pool_connections(TEST_MAX_WORKERS)
+
+  client = aws_clients.get_client("s3", region_name=TEST_REGION)
+  assert client is not s3_client
+  assert client.meta.config.max_pool_connections == TEST_MAX_WORKERS
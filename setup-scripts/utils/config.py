@@ -1,9 +1,35 @@
+import os
 from pathlib import Path
 
 BASE_PATH = Path(__file__).resolve().parent
 REPO_ROOT = BASE_PATH.parent.parent
 OUS_ACCOUNTS_REGISTRY_PATH = BASE_PATH.parent / "ous_accounts_registry.py"
 ACCOUNTS_DIRECTORY_PATH = str(REPO_ROOT / "accounts")
+MAX_WORKERS = int(os.environ.get("AWS_MULTI_ACCOUNT_MAX_WORKERS", "16"))
+CACHE_DIRECTORY_PATH = Path(
+  os.environ.get("AWS_MULTI_ACCOUNT_CACHE_DIR", Path.home() / ".cache" / "aws-multi-account-setup")
+)
+CREDENTIALS_CACHE_PATH = CACHE_DIRECTORY_PATH / "credentials.json"
+TERRAFORM_PLUGIN_CACHE_PATH = CACHE_DIRECTORY_PATH / "terraform-plugin-cache"
+ORG_INVENTORY_PATH = CACHE_DIRECTORY_PATH / "org-inventory.json"
+ORG_INVENTORY_TTL_SECONDS = int(os.environ.get("AWS_MULTI_ACCOUNT_ORG_INVENTORY_TTL", "3600"))
+REFRESH_ORG_INVENTORY = os.environ.get("AWS_MULTI_ACCOUNT_REFRESH_ORG_INVENTORY", "") == "1"
+FORCE_TERRAGRUNT_INIT = os.environ.get("AWS_MULTI_ACCOUNT_FORCE_INIT", "") == "1"
+EVENT_LOG_DIRECTORY_PATH = Path(os.environ.get("AWS_MULTI_ACCOUNT_EVENT_LOG_DIR", CACHE_DIRECTORY_PATH / "events"))
+EVENT_LOG_ENABLED = os.environ.get("AWS_MULTI_ACCOUNT_EVENT_LOG", "1") != "0"
+REGISTRY_SNAPSHOT_DIRECTORY_PATH = CACHE_DIRECTORY_PATH / "registry-snapshots"
+REGISTRY_SNAPSHOT_ENABLED = os.environ.get("AWS_MULTI_ACCOUNT_REGISTRY_SNAPSHOT", "1") != "0"
+TERRAGRUNT_LOG_DIRECTORY_PATH = Path(
+  os.environ.get("AWS_MULTI_ACCOUNT_TERRAGRUNT_LOG_DIR", CACHE_DIRECTORY_PATH / "terragrunt-logs")
+)
+# Requests per second per service and calling account, overridable with e.g. "iam=40,sts=200"
+AWS_RATE_LIMITS = {"iam": 20.0, "sts": 100.0, "organizations": 10.0, "s3": 50.0}
+AWS_RATE_LIMITS_OVERRIDE = os.environ.get("AWS_MULTI_ACCOUNT_RATE_LIMITS", "")
+# botocore's adaptive mode rate limits each client on its own and stacks poorly with the shared limiter, so it is opt-in
+AWS_RETRY_MODE = os.environ.get("AWS_MULTI_ACCOUNT_RETRY_MODE", "standard")
+AWS_MAX_ATTEMPTS = int(os.environ.get("AWS_MULTI_ACCOUNT_MAX_ATTEMPTS", "10"))
+THROTTLE_RETRY_ATTEMPTS = 3
+CREDENTIALS_REFRESH_MARGIN_SECONDS = int(os.environ.get("AWS_MULTI_ACCOUNT_CREDENTIALS_REFRESH_MARGIN", "600"))
 
 
 class Colors:
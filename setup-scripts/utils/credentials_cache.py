@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import threading
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, TypedDict
+
+from utils import config, file_ops
+
+if TYPE_CHECKING:
+  from botocore.credentials import RefreshableCredentials
+  from mypy_boto3_sts.type_defs import CredentialsTypeDef
+
+CREDENTIALS_METHOD = "sts-assume-role"
+IDENTITY_TTL = timedelta(hours=12)
+
+
+class SerializedCredentials(TypedDict):
+  AccessKeyId: str
+  SecretAccessKey: str
+  SessionToken: str
+  Expiration: str
+
+
+class CachedIdentity(TypedDict):
+  account_id: str
+  cached_at: str
+
+
+class CredentialsCacheFile(TypedDict):
+  credentials: dict[str, SerializedCredentials]
+  identities: dict[str, CachedIdentity]
+
+
+def credentials_cache_key(account_id: str, role_arn: str) -> str:
+  return f"{account_id}|{role_arn}"
+
+
+def serialize_credentials(credentials: "CredentialsTypeDef") -> SerializedCredentials:
+  return {
+    "AccessKeyId": credentials["AccessKeyId"],
+    "SecretAccessKey": credentials["SecretAccessKey"],
+    "SessionToken": credentials["SessionToken"],
+    "Expiration": credentials["Expiration"].isoformat(),
+  }
+
+
+def deserialize_credentials(credentials: SerializedCredentials) -> "CredentialsTypeDef":
+  return {
+    "AccessKeyId": credentials["AccessKeyId"],
+    "SecretAccessKey": credentials["SecretAccessKey"],
+    "SessionToken": credentials["SessionToken"],
+    "Expiration": datetime.fromisoformat(credentials["Expiration"]),
+  }
+
+
+def credentials_metadata(credentials: "CredentialsTypeDef") -> dict[str, str]:
+  return {
+    "access_key": credentials["AccessKeyId"],
+    "secret_key": credentials["SecretAccessKey"],
+    "token": credentials["SessionToken"],
+    "expiry_time": credentials["Expiration"].isoformat(),
+  }
+
+
+class CredentialsCache:
+  def __init__(self, path: Path, refresh_margin: timedelta) -> None:
+    self.path = path
+    self.refresh_margin = refresh_margin
+    self._lock = threading.Lock()
+    self._loaded = False
+    self._dirty = False
+    self._credentials: dict[str, SerializedCredentials] = {}
+    self._identities: dict[str, CachedIdentity] = {}
+    self._refreshable: dict[str, RefreshableCredentials] = {}
+
+  def _load(self) -> None:
+    if self._loaded:
+      return
+    self._loaded = True
+    try:
+      with open(self.path) as file:
+        data: CredentialsCacheFile = json.load(file)
+    except (OSError, ValueError):
+      return
+    self._credentials = data.get("credentials", {})
+    self._identities = data.get("identities", {})
+
+  def _is_fresh(self, credentials: SerializedCredentials) -> bool:
+    expiration = datetime.fromisoformat(credentials["Expiration"])
+    return expiration - self.refresh_margin > datetime.now(timezone.utc)
+
+  def get(self, key: str) -> "CredentialsTypeDef | None":
+    with self._lock:
+      self._load()
+      cached = self._credentials.get(key)
+    if cached is None or not self._is_fresh(cached):
+      return None
+    return deserialize_credentials(cached)
+
+  def put(self, key: str, credentials: "CredentialsTypeDef") -> None:
+    with self._lock:
+      self._load()
+      self._credentials[key] = serialize_credentials(credentials)
+      self._dirty = True
+
+  def get_or_fetch(self, key: str, fetch: Callable[[], "CredentialsTypeDef"]) -> "CredentialsTypeDef":
+    cached = self.get(key)
+    if cached is not None:
+      return cached
+    credentials = fetch()
+    self.put(key, credentials)
+    return credentials
+
+  def refreshable(self, key: str, fetch: Callable[[], "CredentialsTypeDef"]) -> "RefreshableCredentials":
+    from botocore.credentials import RefreshableCredentials
+
+    with self._lock:
+      existing = self._refreshable.get(key)
+    if existing is not None:
+      return existing
+
+    def refresh() -> dict[str, str]:
+      return credentials_metadata(self.get_or_fetch(key, fetch))
+
+    refresh_margin_seconds = int(self.refresh_margin.total_seconds())
+    credentials = RefreshableCredentials.create_from_metadata(
+      metadata=refresh(),
+      refresh_using=refresh,
+      method=CREDENTIALS_METHOD,
+      advisory_timeout=refresh_margin_seconds,
+      mandatory_timeout=refresh_margin_seconds,
+    )
+    with self._lock:
+      return self._refreshable.setdefault(key, credentials)
+
+  def get_identity(self, key: str) -> str | None:
+    with self._lock:
+      self._load()
+      cached = self._identities.get(key)
+    if cached is None:
+      return None
+    if datetime.fromisoformat(cached["cached_at"]) + IDENTITY_TTL < datetime.now(timezone.utc):
+      return None
+    return cached["account_id"]
+
+  def put_identity(self, key: str, account_id: str) -> None:
+    with self._lock:
+      self._load()
+      self._identities[key] = {"account_id": account_id, "cached_at": datetime.now(timezone.utc).isoformat()}
+      self._dirty = True
+
+  def flush(self) -> None:
+    with self._lock:
+      if not self._dirty:
+        return
+      now = datetime.now(timezone.utc)
+      data: CredentialsCacheFile = {
+        "credentials": {
+          key: credentials
+          for key, credentials in self._credentials.items()
+          if datetime.fromisoformat(credentials["Expiration"]) > now
+        },
+        "identities": {
+          key: identity
+          for key, identity in self._identities.items()
+          if datetime.fromisoformat(identity["cached_at"]) + IDENTITY_TTL > now
+        },
+      }
+      file_ops.write_private_file(str(self.path), json.dumps(data))
+      self._dirty = False
+
+
+_credentials_cache: CredentialsCache | None = None
+_credentials_cache_lock = threading.Lock()
+
+
+def get_credentials_cache() -> CredentialsCache:
+  global _credentials_cache  # noqa: PLW0603
+  with _credentials_cache_lock:
+    if _credentials_cache is None:
+      _credentials_cache = CredentialsCache(
+        Path(config.CREDENTIALS_CACHE_PATH),
+        timedelta(seconds=config.CREDENTIALS_REFRESH_MARGIN_SECONDS),
+      )
+      atexit.register(_credentials_cache.flush)
+    return _credentials_cache
+
+
+def clear_credentials_cache(*, remove_persisted: bool = False) -> None:
+  global _credentials_cache  # noqa: PLW0603
+  with _credentials_cache_lock:
+    if _credentials_cache is not None:
+      atexit.unregister(_credentials_cache.flush)
+    _credentials_cache = None
+  if remove_persisted and os.path.exists(config.CREDENTIALS_CACHE_PATH):
+    os.remove(config.CREDENTIALS_CACHE_PATH)
@@ -0,0 +1,91 @@
+import os
+import stat
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils.credentials_cache import CredentialsCache, credentials_cache_key
+
+if TYPE_CHECKING:
+  from mypy_boto3_sts.type_defs import CredentialsTypeDef
+
+REFRESH_MARGIN = timedelta(minutes=10)
+EXPECTED_FETCH_COUNT = 2
+PRIVATE_FILE_MODE = 0o600
+PRIVATE_DIRECTORY_MODE = 0o700
+CACHE_KEY = credentials_cache_key("222222222222", "arn:aws:iam::222222222222:role/OrganizationAccountAccessRole")
+
+
+def make_credentials(expires_in: timedelta, suffix: str = "1") -> "CredentialsTypeDef":
+  return {
+    "AccessKeyId": f"key-{suffix}",
+    "SecretAccessKey": f"secret-{suffix}",
+    "SessionToken": f"token-{suffix}",
+    "Expiration": datetime.now(timezone.utc) + expires_in,
+  }
+
+
+@pytest.fixture
+def cache_path(tmp_path: Path) -> Path:
+  return tmp_path / "cache" / "credentials.json"
+
+
+@pytest.fixture
+def cache(cache_path: Path) -> CredentialsCache:
+  return CredentialsCache(cache_path, REFRESH_MARGIN)
+
+
+def test_get_or_fetch_reuses_fresh_credentials(cache: CredentialsCache) -> None:
+  fetch = MagicMock(return_value=make_credentials(timedelta(hours=1)))
+
+  first = cache.get_or_fetch(CACHE_KEY, fetch)
+  second = cache.get_or_fetch(CACHE_KEY, fetch)
+
+  assert first["AccessKeyId"] == second["AccessKeyId"] == "key-1"
+  fetch.assert_called_once_with()
+
+
+def test_get_ignores_credentials_inside_refresh_margin(cache: CredentialsCache) -> None:
+  cache.put(CACHE_KEY, make_credentials(REFRESH_MARGIN - timedelta(minutes=1)))
+
+  assert cache.get(CACHE_KEY) is None
+
+
+def test_flush_persists_with_private_permissions(cache: CredentialsCache, cache_path: Path) -> None:
+  cache.put(CACHE_KEY, make_credentials(timedelta(hours=1)))
+  cache.put_identity("session-key", "111111111111")
+  cache.flush()
+
+  assert stat.S_IMODE(os.stat(cache_path).st_mode) == PRIVATE_FILE_MODE
+  assert stat.S_IMODE(os.stat(cache_path.parent).st_mode) == PRIVATE_DIRECTORY_MODE
+
+  reloaded = CredentialsCache(cache_path, REFRESH_MARGIN)
+  cached = reloaded.get(CACHE_KEY)
+  assert cached is not None
+  assert cached["SessionToken"] == "token-1"
+  assert reloaded.get_identity("session-key") == "111111111111"
+
+
+def test_flush_drops_expired_credentials(cache: CredentialsCache, cache_path: Path) -> None:
+  cache.put(CACHE_KEY, make_credentials(timedelta(minutes=-5)))
+  cache.flush()
+
+  assert '"credentials": {}' in cache_path.read_text()
+
+
+def test_refreshable_credentials_refresh_before_expiry(cache: CredentialsCache) -> None:
+  fetch = MagicMock(
+    side_effect=[
+      make_credentials(REFRESH_MARGIN - timedelta(minutes=1), "1"),
+      make_credentials(timedelta(hours=1), "2"),
+    ]
+  )
+
+  credentials = cache.refreshable(CACHE_KEY, fetch)
+
+  assert cache.refreshable(CACHE_KEY, fetch) is credentials
+  assert credentials.get_frozen_credentials().access_key == "key-2"
+  assert fetch.call_count == EXPECTED_FETCH_COUNT
@@ -1,18 +1,74 @@
+import hashlib
 import os
+import stat
+import threading
+from typing import Literal
 
 from utils.config import BASE_PATH, Colors
 
+WriteStatus = Literal["created", "written", "unchanged"]
 
-def create_directory(path: str) -> str:
+
+def create_directory(path: str, *, verbose: bool = True) -> str:
   if not os.path.exists(path):
-    os.makedirs(path)
-    repo_root = BASE_PATH.parent
-    dir_name = os.path.relpath(path, repo_root)
-    print(f"\n{Colors.GREEN}Created directory: {dir_name}{Colors.RESET}")
+    os.makedirs(path, exist_ok=True)
+    if verbose:
+      repo_root = BASE_PATH.parent
+      dir_name = os.path.relpath(path, repo_root)
+      print(f"\n{Colors.GREEN}Created directory: {dir_name}{Colors.RESET}")
   return path
 
 
-def write_account_file(path: str, content: str, filename: str, account_name: str) -> None:
-  with open(path, "w") as file:
-    file.write(content)
+def content_hash(content: bytes) -> str:
+  return hashlib.sha256(content).hexdigest()
+
+
+def atomic_write(path: str, content: bytes, mode: int = 0o666, *, preserve_mode: bool = False) -> None:
+  # Write to a sibling temp file and rename it over the target, so a crash never leaves a partly written file
+  tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+  existing_mode = stat.S_IMODE(os.stat(path).st_mode) if preserve_mode and os.path.exists(path) else None
+  fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+  try:
+    with os.fdopen(fd, "wb") as file:
+      file.write(content)
+    if existing_mode is not None:
+      os.chmod(tmp_path, existing_mode)
+    os.replace(tmp_path, path)
+  except BaseException:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    raise
+
+
+def write_file_if_changed(path: str, content: str) -> WriteStatus:
+  encoded = content.encode()
+  try:
+    with open(path, "rb") as file:
+      existing = file.read()
+  except FileNotFoundError:
+    atomic_write(path, encoded)
+    return "created"
+
+  if len(existing) == len(encoded) and content_hash(existing) == content_hash(encoded):
+    return "unchanged"
+
+  atomic_write(path, encoded, preserve_mode=True)
+  return "written"
+
+
+def write_account_file(
+  path: str, content: str, filename: str, account_name: str, *, verbose: bool = True
+) -> WriteStatus:
+  status = write_file_if_changed(path, content)
+  if not verbose:
+    return status
+  if status == "created":
     print(f"{Colors.GREEN}Created {filename} in {account_name} directory{Colors.RESET}")
+  elif status == "written":
+    print(f"{Colors.GREEN}Updated {filename} in {account_name} directory{Colors.RESET}")
+  return status
+
+
+def write_private_file(path: str, content: str) -> None:
+  os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+  atomic_write(path, content.encode(), 0o600)
@@ -0,0 +1,59 @@
+import os
+import stat
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from utils import file_ops
+
+EXECUTABLE_FILE_MODE = 0o755
+
+
+def test_create_directory(tmp_path: Path) -> None:
+  new_dir = tmp_path / "accounts" / "test-account"
+
+  assert file_ops.create_directory(str(new_dir)) == str(new_dir)
+  assert new_dir.is_dir()
+  assert file_ops.create_directory(str(new_dir)) == str(new_dir)
+
+
+def test_write_account_file_reports_status(tmp_path: Path) -> None:
+  path = tmp_path / "account_details.hcl"
+
+  assert file_ops.write_account_file(str(path), "locals {}\n", path.name, "test-account") == "created"
+  assert file_ops.write_account_file(str(path), "locals {}\n", path.name, "test-account") == "unchanged"
+  assert file_ops.write_account_file(str(path), "locals {\n}\n", path.name, "test-account") == "written"
+  assert path.read_text() == "locals {\n}\n"
+
+
+def test_write_account_file_skips_identical_content(tmp_path: Path) -> None:
+  path = tmp_path / "terragrunt.hcl"
+  path.write_text("include {}\n")
+  os.utime(path, ns=(0, 0))
+
+  file_ops.write_account_file(str(path), "include {}\n", path.name, "test-account")
+
+  assert path.stat().st_mtime_ns == 0
+
+
+def test_write_account_file_preserves_mode(tmp_path: Path) -> None:
+  path = tmp_path / "script.sh"
+  path.write_text("echo old\n")
+  path.chmod(EXECUTABLE_FILE_MODE)
+
+  file_ops.write_account_file(str(path), "echo new\n", path.name, "test-account")
+
+  assert stat.S_IMODE(path.stat().st_mode) == EXECUTABLE_FILE_MODE
+
+
+def test_atomic_write_leaves_original_on_failure(tmp_path: Path, mocker: MockerFixture) -> None:
+  path = tmp_path / "locals.tf"
+  path.write_text("original\n")
+  mocker.patch("os.replace", side_effect=OSError("Disk full"))
+
+  with pytest.raises(OSError, match="Disk full"):
+    file_ops.write_account_file(str(path), "updated\n", path.name, "test-management")
+
+  assert path.read_text() == "original\n"
+  assert [entry.name for entry in tmp_path.iterdir()] == ["locals.tf"]
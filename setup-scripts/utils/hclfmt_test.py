@@ -0,0 +1,137 @@
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from setup_account_directories import ACCOUNT_DETAILS_HCL, TERRAGRUNT_HCL
+from utils.hclfmt import UnsupportedHclError, format_file, format_hcl, format_tree
+
+ACCOUNT_DETAILS = {
+  "account_name": "test-account",
+  "account_id": "111111111111",
+  "organizational_unit": "Workloads",
+  "aws_region": "us-west-2",
+  "terraform_admin_role_name": "TerraformAdminRole",
+  "s3_backend_bucket_name": "test-terraform-state",
+}
+UNFORMATTED_ACCOUNT_DETAILS = """locals {
+  account_name = "test-account"
+  account_id = "111111111111"
+    organizational_unit   = "Workloads"
+  aws_region = "us-west-2"
+  terraform_admin_role_name = "TerraformAdminRole"
+  s3_backend_bucket_name= "test-terraform-state"
+}
+"""
+FORMATTED_ACCOUNT_DETAILS = """locals {
+  account_name              = "test-account"
+  account_id                = "111111111111"
+  organizational_unit       = "Workloads"
+  aws_region                = "us-west-2"
+  terraform_admin_role_name = "TerraformAdminRole"
+  s3_backend_bucket_name    = "test-terraform-state"
+}
+"""
+
+UNFORMATTED_BLOCKS = """generate "provider" {
+path = "provider.tf"
+    if_exists="overwrite"
+  contents = <<EOF
+provider "aws" {
+    region = "us-west-2"
+}
+EOF
+}
+
+include   {
+  path = find_in_parent_folders( "root.hcl" )
+  # Comments are indented with the block
+      tags = ["a","b" , local.names[0]]
+  hashes = [
+  "h1:abc",
+  ]
+}
+"""
+FORMATTED_BLOCKS = """generate "provider" {
+  path      = "provider.tf"
+  if_exists = "overwrite"
+  contents  = <<EOF
+provider "aws" {
+    region = "us-west-2"
+}
+EOF
+}
+
+include {
+  path = find_in_parent_folders("root.hcl")
+  # Comments are indented with the block
+  tags   = ["a", "b", local.names[0]]
+  hashes = [
+    "h1:abc",
+  ]
+}
+"""
+
+
+def test_generated_account_details_are_aligned() -> None:
+  assert ACCOUNT_DETAILS_HCL.format(**ACCOUNT_DETAILS) == FORMATTED_ACCOUNT_DETAILS
+  assert format_hcl(UNFORMATTED_ACCOUNT_DETAILS) == FORMATTED_ACCOUNT_DETAILS
+  assert format_hcl(FORMATTED_ACCOUNT_DETAILS) == FORMATTED_ACCOUNT_DETAILS
+  assert format_hcl(TERRAGRUNT_HCL) == TERRAGRUNT_HCL
+
+
+def test_indentation_spacing_and_heredocs() -> None:
+  assert format_hcl(UNFORMATTED_BLOCKS) == FORMATTED_BLOCKS
+  assert format_hcl(FORMATTED_BLOCKS) == FORMATTED_BLOCKS
+
+
+@pytest.mark.parametrize(
+  "content",
+  [
+    'inputs = {\n  name = "a"\n}\n',
+    "count = var.enabled ? 1 : 0\n",
+    'name = "a" # trailing comment\n',
+    "/* block comment */\n",
+    'path = "${ local.name }"\n',
+    "contents = <<EOF\nno end\n",
+    "locals {\n",
+  ],
+  ids=["nested-object", "conditional", "trailing-comment", "block-comment", "interpolation", "heredoc", "unclosed"],
+)
+def test_unsupported_syntax_is_rejected(content: str) -> None:
+  with pytest.raises(UnsupportedHclError):
+    format_hcl(content)
+
+
+def test_format_tree_rewrites_only_unformatted_files(tmp_path: Path, mocker: MockerFixture) -> None:
+  mock_run = mocker.patch("subprocess.run")
+  account_dir = tmp_path / "test-account"
+  (account_dir / ".terragrunt-cache").mkdir(parents=True)
+  (account_dir / ".terragrunt-cache" / "terragrunt.hcl").write_text("ignored {}\n")
+  (account_dir / "account_details.hcl").write_text(UNFORMATTED_ACCOUNT_DETAILS)
+  (account_dir / "terragrunt.hcl").write_text(TERRAGRUNT_HCL)
+  (account_dir / "main.tf").write_text("unrelated  =  1\n")
+
+  checked = format_tree(str(tmp_path), check=True)
+  formatted = format_tree(str(tmp_path))
+
+  assert [(Path(result["path"]).name, result["changed"]) for result in checked] == [
+    ("account_details.hcl", True),
+    ("terragrunt.hcl", False),
+  ]
+  assert [result["changed"] for result in formatted] == [True, False]
+  assert (account_dir / "account_details.hcl").read_text() == FORMATTED_ACCOUNT_DETAILS
+  assert (account_dir / "main.tf").read_text() == "unrelated  =  1\n"
+  mock_run.assert_not_called()
+
+
+def test_format_file_falls_back_to_terragrunt(tmp_path: Path, mocker: MockerFixture) -> None:
+  mock_run = mocker.patch("subprocess.run", return_value=MagicMock(returncode=1, stderr="unformatted"))
+  root_hcl = tmp_path / "root.hcl"
+  root_hcl.write_text('inputs = {\n  name = "a"\n}\n')
+
+  result = format_file(str(root_hcl), check=True)
+
+  assert result == {"path": str(root_hcl), "formatter": "terragrunt", "changed": True, "error": None}
+  assert mock_run.call_args.args[0] == ["terragrunt", "hclfmt", "--file", str(root_hcl), "--check"]
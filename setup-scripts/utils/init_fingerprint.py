@@ -0,0 +1,94 @@
+import hashlib
+import os
+import shutil
+from functools import cache
+
+from utils import file_ops
+
+INIT_FINGERPRINT_FILENAME = ".init-fingerprint"
+ROOT_HCL_FILENAME = "root.hcl"
+TERRAFORM_DATA_DIRNAME = ".terraform"
+FINGERPRINT_INPUT_FILENAMES = (
+  "account_details.hcl",
+  "terragrunt.hcl",
+  "provider.tf",
+  "backend.tf",
+  ".terraform.lock.hcl",
+)
+FINGERPRINT_TOOLS = ("terraform", "terragrunt")
+
+
+def find_root_hcl(dir_path: str) -> str | None:
+  current = os.path.abspath(dir_path)
+  while True:
+    candidate = os.path.join(current, ROOT_HCL_FILENAME)
+    if os.path.isfile(candidate):
+      return candidate
+    parent = os.path.dirname(current)
+    if parent == current:
+      return None
+    current = parent
+
+
+@cache
+def tool_versions_fingerprint() -> str:
+  # Stat the resolved binaries instead of running `terraform version`, so an upgrade changes the
+  # fingerprint without adding two subprocess launches to every run.
+  parts = []
+  for tool in FINGERPRINT_TOOLS:
+    tool_path = shutil.which(tool)
+    if tool_path is None:
+      parts.append(f"{tool}:missing")
+      continue
+    tool_stat = os.stat(tool_path)
+    parts.append(f"{tool}:{os.path.realpath(tool_path)}:{tool_stat.st_size}:{tool_stat.st_mtime_ns}")
+  return "|".join(parts)
+
+
+def compute_init_fingerprint(dir_path: str) -> str:
+  digest = hashlib.sha256()
+  input_paths = [os.path.join(dir_path, filename) for filename in FINGERPRINT_INPUT_FILENAMES]
+  root_hcl_path = find_root_hcl(dir_path)
+  if root_hcl_path:
+    input_paths.append(root_hcl_path)
+
+  for input_path in input_paths:
+    digest.update(os.path.basename(input_path).encode())
+    try:
+      with open(input_path, "rb") as file:
+        digest.update(hashlib.sha256(file.read()).digest())
+    except FileNotFoundError:
+      digest.update(b"missing")
+
+  digest.update(tool_versions_fingerprint().encode())
+  return digest.hexdigest()
+
+
+def fingerprint_path(dir_path: str) -> str:
+  return os.path.join(dir_path, TERRAFORM_DATA_DIRNAME, INIT_FINGERPRINT_FILENAME)
+
+
+def terraform_data_dir_intact(dir_path: str) -> bool:
+  terraform_dir = os.path.join(dir_path, TERRAFORM_DATA_DIRNAME)
+  return os.path.isfile(os.path.join(terraform_dir, "terraform.tfstate")) and os.path.isdir(
+    os.path.join(terraform_dir, "providers")
+  )
+
+
+def read_init_fingerprint(dir_path: str) -> str | None:
+  try:
+    with open(fingerprint_path(dir_path)) as file:
+      return file.read().strip()
+  except FileNotFoundError:
+    return None
+
+
+def init_is_current(dir_path: str) -> bool:
+  if not terraform_data_dir_intact(dir_path):
+    return False
+  recorded = read_init_fingerprint(dir_path)
+  return recorded is not None and recorded == compute_init_fingerprint(dir_path)
+
+
+def record_init_fingerprint(dir_path: str) -> None:
+  file_ops.write_private_file(fingerprint_path(dir_path), compute_init_fingerprint(dir_path) + "\n")
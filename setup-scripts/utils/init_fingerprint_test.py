@@ -0,0 +1,64 @@
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+
+from utils import init_fingerprint
+
+
+@pytest.fixture(autouse=True)
+def clear_tool_fingerprint() -> Generator[None, None, None]:
+  init_fingerprint.tool_versions_fingerprint.cache_clear()
+  yield
+  init_fingerprint.tool_versions_fingerprint.cache_clear()
+
+
+@pytest.fixture
+def account_dir(tmp_path: Path) -> Path:
+  (tmp_path / "root.hcl").write_text('locals {\n  terraform_version = "~> 1.12.2"\n}\n')
+  account_dir = tmp_path / "accounts" / "test-account"
+  account_dir.mkdir(parents=True)
+  (account_dir / "account_details.hcl").write_text('locals {\n  account_id = "222222222222"\n}\n')
+  (account_dir / "terragrunt.hcl").write_text('include {\n  path = find_in_parent_folders("root.hcl")\n}\n')
+  return account_dir
+
+
+def initialize(account_dir: Path) -> None:
+  terraform_dir = account_dir / ".terraform"
+  (terraform_dir / "providers").mkdir(parents=True)
+  (terraform_dir / "terraform.tfstate").write_text("{}")
+
+
+def test_find_root_hcl(account_dir: Path, tmp_path: Path) -> None:
+  assert init_fingerprint.find_root_hcl(str(account_dir)) == str(tmp_path / "root.hcl")
+
+
+def test_fingerprint_tracks_account_and_root_inputs(account_dir: Path, tmp_path: Path) -> None:
+  original = init_fingerprint.compute_init_fingerprint(str(account_dir))
+  assert init_fingerprint.compute_init_fingerprint(str(account_dir)) == original
+
+  (account_dir / "account_details.hcl").write_text('locals {\n  account_id = "333333333333"\n}\n')
+  account_changed = init_fingerprint.compute_init_fingerprint(str(account_dir))
+  assert account_changed != original
+
+  (tmp_path / "root.hcl").write_text('locals {\n  terraform_version = "~> 1.13.0"\n}\n')
+  assert init_fingerprint.compute_init_fingerprint(str(account_dir)) != account_changed
+
+
+def test_init_is_current_requires_recorded_fingerprint(account_dir: Path) -> None:
+  initialize(account_dir)
+  assert not init_fingerprint.init_is_current(str(account_dir))
+
+  init_fingerprint.record_init_fingerprint(str(account_dir))
+  assert init_fingerprint.init_is_current(str(account_dir))
+
+  (account_dir / "account_details.hcl").write_text('locals {\n  account_id = "333333333333"\n}\n')
+  assert not init_fingerprint.init_is_current(str(account_dir))
+
+
+def test_init_is_current_requires_intact_terraform_dir(account_dir: Path) -> None:
+  initialize(account_dir)
+  init_fingerprint.record_init_fingerprint(str(account_dir))
+  (account_dir / ".terraform" / "providers").rmdir()
+
+  assert not init_fingerprint.init_is_current(str(account_dir))
@@ -0,0 +1,213 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Literal, TypedDict
+
+from utils import config
+
+SpanStatus = Literal["ok", "error"]
+
+
+class SpanEvent(TypedDict):
+  event: Literal["span"]
+  run_id: str
+  name: str
+  account: str | None
+  started_at: float
+  duration_seconds: float
+  status: SpanStatus
+  error: str | None
+
+
+class RunEvent(TypedDict):
+  event: Literal["run_started", "run_finished"]
+  run_id: str
+  name: str
+  timestamp: float
+  duration_seconds: float | None
+
+
+class PhaseSummary(TypedDict):
+  name: str
+  calls: int
+  errors: int
+  total_seconds: float
+  max_seconds: float
+
+
+class AccountSummary(TypedDict):
+  account: str
+  total_seconds: float
+  slowest_phase: str
+  slowest_phase_seconds: float
+
+
+class EventLog:
+  # Spans are kept in memory for the end-of-run summary and appended to a JSON-lines file. Writes go
+  # through one buffered handle under a lock, so a span costs about as much as one small print.
+  def __init__(self, name: str, path: Path | None) -> None:
+    self.name = name
+    self.path = path
+    self.run_id = uuid.uuid4().hex[:12]
+    self.started_at = time.time()
+    self.spans: list[SpanEvent] = []
+    self._file: IO[str] | None = None
+    self._lock = threading.Lock()
+
+  def record(self, event: SpanEvent | RunEvent) -> None:
+    with self._lock:
+      if event["event"] == "span":
+        self.spans.append(event)
+      if self.path is None:
+        return
+      if self._file is None:
+        os.makedirs(self.path.parent, mode=0o700, exist_ok=True)
+        self._file = open(self.path, "a")  # noqa: SIM115
+      self._file.write(json.dumps(event) + "\n")
+
+  def close(self) -> None:
+    with self._lock:
+      if self._file is not None:
+        self._file.close()
+        self._file = None
+
+
+_active_event_log: EventLog | None = None
+
+
+def active_event_log() -> EventLog | None:
+  return _active_event_log
+
+
+def event_log_path(name: str) -> Path | None:
+  if not config.EVENT_LOG_ENABLED:
+    return None
+  timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+  return Path(config.EVENT_LOG_DIRECTORY_PATH) / f"{name}-{timestamp}-{os.getpid()}.jsonl"
+
+
+@contextlib.contextmanager
+def span(name: str, *, account: str | None = None) -> Iterator[None]:
+  event_log = _active_event_log
+  if event_log is None:
+    yield
+    return
+
+  started_at = time.time()
+  start = time.perf_counter()
+  status: SpanStatus = "ok"
+  error = None
+  try:
+    yield
+  except BaseException as e:
+    status = "error"
+    error = f"{type(e).__name__}: {e}"
+    raise
+  finally:
+    event_log.record(
+      {
+        "event": "span",
+        "run_id": event_log.run_id,
+        "name": name,
+        "account": account,
+        "started_at": started_at,
+        "duration_seconds": time.perf_counter() - start,
+        "status": status,
+        "error": error,
+      }
+    )
+
+
+@contextlib.contextmanager
+def run(name: str) -> Iterator[EventLog]:
+  global _active_event_log  # noqa: PLW0603
+  event_log = EventLog(name, event_log_path(name))
+  previous_event_log = _active_event_log
+  _active_event_log = event_log
+  event_log.record(
+    {
+      "event": "run_started",
+      "run_id": event_log.run_id,
+      "name": name,
+      "timestamp": time.time(),
+      "duration_seconds": None,
+    }
+  )
+  try:
+    yield event_log
+  finally:
+    finished_at = time.time()
+    event_log.record(
+      {
+        "event": "run_finished",
+        "run_id": event_log.run_id,
+        "name": name,
+        "timestamp": finished_at,
+        "duration_seconds": finished_at - event_log.started_at,
+      }
+    )
+    event_log.close()
+    _active_event_log = previous_event_log
+    print_run_summary(event_log)
+
+
+def summarize_phases(spans: list[SpanEvent]) -> list[PhaseSummary]:
+  phases: dict[str, PhaseSummary] = {}
+  for event in spans:
+    phase = phases.setdefault(
+      event["name"], {"name": event["name"], "calls": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+    )
+    phase["calls"] += 1
+    phase["errors"] += event["status"] == "error"
+    phase["total_seconds"] += event["duration_seconds"]
+    phase["max_seconds"] = max(phase["max_seconds"], event["duration_seconds"])
+  return sorted(phases.values(), key=lambda phase: phase["total_seconds"], reverse=True)
+
+
+def summarize_accounts(spans: list[SpanEvent]) -> list[AccountSummary]:
+  accounts: dict[str, AccountSummary] = {}
+  for event in spans:
+    if event["account"] is None:
+      continue
+    account = accounts.setdefault(
+      event["account"],
+      {"account": event["account"], "total_seconds": 0.0, "slowest_phase": "", "slowest_phase_seconds": 0.0},
+    )
+    account["total_seconds"] += event["duration_seconds"]
+    if event["duration_seconds"] >= account["slowest_phase_seconds"]:
+      account["slowest_phase"] = event["name"]
+      account["slowest_phase_seconds"] = event["duration_seconds"]
+  return sorted(accounts.values(), key=lambda account: account["total_seconds"], reverse=True)
+
+
+def print_run_summary(event_log: EventLog, slowest_count: int = 5) -> None:
+  if not event_log.spans:
+    return
+
+  # Per-account spans run in parallel, so a phase's total can exceed the wall time of the run
+  print(f"\nSlowest phases ({time.time() - event_log.started_at:.1f}s total run time):")
+  print(f"  {'Phase':<32}{'Calls':>7}{'Errors':>8}{'Total':>10}{'Max':>10}")
+  for phase in summarize_phases(event_log.spans)[:slowest_count]:
+    print(
+      f"  {phase['name']:<32}{phase['calls']:>7}{phase['errors']:>8}"
+      f"{phase['total_seconds']:>9.2f}s{phase['max_seconds']:>9.2f}s"
+    )
+
+  accounts = summarize_accounts(event_log.spans)
+  if accounts:
+    print("\nSlowest accounts:")
+    print(f"  {'Account':<40}{'Total':>10}  Slowest phase")
+    for account in accounts[:slowest_count]:
+      print(
+        f"  {account['account']:<40}{account['total_seconds']:>9.2f}s  "
+        f"{account['slowest_phase']} ({account['slowest_phase_seconds']:.2f}s)"
+      )
+
+  if event_log.path is not None:
+    print(f"\nEvent log: {event_log.path}")
@@ -0,0 +1,101 @@
+import json
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from tests.conftest import isolated_event_log  # noqa: F401
+from utils import instrumentation
+
+
+def read_events(event_log_dir: Path) -> list[dict]:
+  (log_path,) = event_log_dir.glob("*.jsonl")
+  return [json.loads(line) for line in log_path.read_text().splitlines()]
+
+
+def test_span_without_run_is_not_recorded(isolated_event_log: Path) -> None:  # noqa: F811
+  with instrumentation.span("load_registry"):
+    pass
+
+  assert instrumentation.active_event_log() is None
+  assert not isolated_event_log.exists()
+
+
+def test_run_writes_json_lines_event_log(isolated_event_log: Path) -> None:  # noqa: F811
+  with instrumentation.run("setup_test") as event_log:
+    with instrumentation.span("load_registry"):
+      pass
+    with instrumentation.span("assume_role", account="111111111111"):
+      pass
+
+  events = read_events(isolated_event_log)
+  assert [event["event"] for event in events] == ["run_started", "span", "span", "run_finished"]
+  assert {event["run_id"] for event in events} == {event_log.run_id}
+  assert events[2]["name"] == "assume_role"
+  assert events[2]["account"] == "111111111111"
+  assert events[2]["status"] == "ok"
+  assert events[3]["duration_seconds"] >= events[2]["duration_seconds"]
+  assert instrumentation.active_event_log() is None
+
+
+def create_role_in_span() -> None:
+  with instrumentation.span("create_role", account="222222222222"):
+    error_msg = "boom"
+    raise ValueError(error_msg)
+
+
+def test_failed_span_records_error(isolated_event_log: Path) -> None:  # noqa: F811
+  with instrumentation.run("setup_test"), pytest.raises(ValueError, match="boom"):
+    create_role_in_span()
+
+  span_event = read_events(isolated_event_log)[1]
+  assert span_event["status"] == "error"
+  assert span_event["error"] == "ValueError: boom"
+
+
+def test_event_log_can_be_disabled(isolated_event_log: Path, mocker: MockerFixture) -> None:  # noqa: F811
+  mocker.patch("utils.config.EVENT_LOG_ENABLED", False)
+
+  with instrumentation.run("setup_test") as event_log, instrumentation.span("init", account="account-a"):
+    pass
+
+  assert event_log.path is None
+  assert len(event_log.spans) == 1
+  assert not isolated_event_log.exists()
+
+
+def test_run_summary_lists_slowest_phases_and_accounts(capsys: pytest.CaptureFixture[str]) -> None:
+  event_log = instrumentation.EventLog("setup_test", None)
+  for name, account, duration_seconds in [
+    ("assume_role", "account-a", 0.5),
+    ("create_role", "account-a", 2.0),
+    ("assume_role", "account-b", 1.0),
+    ("init", "account-c", 4.0),
+  ]:
+    event_log.record(
+      {
+        "event": "span",
+        "run_id": event_log.run_id,
+        "name": name,
+        "account": account,
+        "started_at": 0.0,
+        "duration_seconds": duration_seconds,
+        "status": "ok",
+        "error": None,
+      }
+    )
+
+  assert [phase["name"] for phase in instrumentation.summarize_phases(event_log.spans)] == [
+    "init",
+    "create_role",
+    "assume_role",
+  ]
+  accounts = instrumentation.summarize_accounts(event_log.spans)
+  assert [account["account"] for account in accounts] == ["account-c", "account-a", "account-b"]
+  assert accounts[1]["slowest_phase"] == "create_role"
+
+  instrumentation.print_run_summary(event_log)
+
+  output = capsys.readouterr().out
+  assert "Slowest phases" in output
+  assert "Slowest accounts" in output
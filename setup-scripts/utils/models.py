@@ -1,4 +1,9 @@
-from pydantic import BaseModel, field_validator
+from typing import Annotated
+
+from pydantic import BaseModel, StringConstraints, TypeAdapter, field_validator
+
+# Checked by pydantic-core itself, where a field_validator calls back into Python for every account
+NonEmptyStr = Annotated[str, StringConstraints(min_length=1)]
 
 
 class TerraformBackendConfig(BaseModel):
@@ -34,26 +39,48 @@ class TerraformBackendConfig(BaseModel):
 
 
 class Account(BaseModel):
-  name: str
+  name: NonEmptyStr
   id: str
-  organizational_unit: str
+  organizational_unit: NonEmptyStr
   terraform_backend_config: TerraformBackendConfig
 
-  @field_validator("name")
-  @classmethod
-  def validate_name(cls, v: str) -> str:
-    error_msg = "Account name cannot be empty"
-    if not v:
-      raise ValueError(error_msg)
-    return v
 
-  @field_validator("organizational_unit")
+# Validates a whole registry's accounts in one call. Backend config instances are reused as they are, not copied.
+ACCOUNT_LIST_ADAPTER = TypeAdapter(list[Account])
+
+
+class AccountView:
+  # A read-only account with a fraction of a model's memory, for code that holds or indexes every account.
+  # All views of a registry share its one TerraformBackendConfig.
+  __slots__ = ("id", "name", "organizational_unit", "terraform_backend_config")
+
+  def __init__(
+    self, name: str, id: str, organizational_unit: str, terraform_backend_config: TerraformBackendConfig
+  ) -> None:
+    self.name = name
+    self.id = id
+    self.organizational_unit = organizational_unit
+    self.terraform_backend_config = terraform_backend_config
+
   @classmethod
-  def validate_ou(cls, v: str) -> str:
-    error_msg = "Organizational unit cannot be empty"
-    if not v:
-      raise ValueError(error_msg)
-    return v
+  def from_account(cls, account: Account) -> "AccountView":
+    return cls(account.name, account.id, account.organizational_unit, account.terraform_backend_config)
+
+  def __repr__(self) -> str:
+    return f"AccountView(name={self.name!r}, id={self.id!r}, organizational_unit={self.organizational_unit!r})"
+
+  def __eq__(self, other: object) -> bool:
+    if not isinstance(other, AccountView):
+      return NotImplemented
+    return (self.name, self.id, self.organizational_unit, self.terraform_backend_config) == (
+      other.name,
+      other.id,
+      other.organizational_unit,
+      other.terraform_backend_config,
+    )
+
+  def __hash__(self) -> int:
+    return hash((self.name, self.id, self.organizational_unit))
 
 
 class ManagementAccountDetails(Account):
@@ -61,6 +88,7 @@ class ManagementAccountDetails(Account):
   id: str
   email: str
   parent_ou_id: str
+  shard_state_by_ou: bool = False
 
   @field_validator("name")
   @classmethod
@@ -0,0 +1,156 @@
+import json
+from collections.abc import Collection
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, TypedDict
+
+from utils import aws_clients, config, file_ops, instrumentation, rate_limit
+
+if TYPE_CHECKING:
+  from mypy_boto3_organizations.client import OrganizationsClient
+  from mypy_boto3_organizations.type_defs import AccountTypeDef
+
+ACTIVE_STATUS = "ACTIVE"
+
+
+class OrgAccount(TypedDict):
+  id: str
+  name: str
+  email: str
+  status: str
+  # Only known when the inventory was fetched with OU membership
+  parent_id: str | None
+  organizational_unit: str | None
+
+
+class OrgInventoryFile(TypedDict):
+  management_account_id: str
+  fetched_at: str
+  membership: bool
+  accounts: list[OrgAccount]
+
+
+ParentListing = tuple[list[OrgAccount], list[tuple[str, str]]]
+
+
+def org_account(account: "AccountTypeDef", parent_id: str | None, parent_name: str | None) -> OrgAccount:
+  return {
+    "id": account["Id"],
+    "name": account["Name"],
+    "email": account["Email"],
+    "status": account["Status"],
+    "parent_id": parent_id,
+    "organizational_unit": parent_name,
+  }
+
+
+def list_org_accounts(org_client: "OrganizationsClient") -> list[OrgAccount]:
+  accounts: list[OrgAccount] = []
+
+  def list_accounts() -> None:
+    accounts.clear()
+    for page in org_client.get_paginator("list_accounts").paginate():
+      accounts.extend(org_account(account, None, None) for account in page["Accounts"])
+
+  with instrumentation.span("list_accounts"):
+    rate_limit.retry_throttled(list_accounts)
+  return accounts
+
+
+def list_parent(org_client: "OrganizationsClient", parent_id: str, parent_name: str | None) -> ParentListing:
+  accounts: list[OrgAccount] = []
+  child_units: list[tuple[str, str]] = []
+
+  def list_accounts() -> None:
+    accounts.clear()
+    for page in org_client.get_paginator("list_accounts_for_parent").paginate(ParentId=parent_id):
+      accounts.extend(org_account(account, parent_id, parent_name) for account in page["Accounts"])
+
+  def list_child_units() -> None:
+    child_units.clear()
+    for page in org_client.get_paginator("list_organizational_units_for_parent").paginate(ParentId=parent_id):
+      child_units.extend((unit["Id"], unit["Name"]) for unit in page["OrganizationalUnits"])
+
+  with instrumentation.span("list_parent"):
+    rate_limit.retry_throttled(list_accounts)
+    rate_limit.retry_throttled(list_child_units)
+  return accounts, child_units
+
+
+def fetch_org_inventory(max_workers: int = config.MAX_WORKERS, *, membership: bool = False) -> list[OrgAccount]:
+  org_client: OrganizationsClient = aws_clients.get_client("organizations")
+  # Names, IDs and statuses come from ListAccounts, a page of 20 accounts per call, where walking the OU tree
+  # costs two calls per OU on the Organizations API's low rate limit
+  if not membership:
+    return sorted(list_org_accounts(org_client), key=lambda account: account["name"])
+
+  roots = rate_limit.retry_throttled(org_client.list_roots)["Roots"]
+
+  accounts: list[OrgAccount] = []
+  with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    # Each OU is listed as soon as its parent returns it, so separate branches of the tree are walked concurrently
+    pending: set[Future[ParentListing]] = {executor.submit(list_parent, org_client, root["Id"], None) for root in roots}
+    while pending:
+      done, pending = wait(pending, return_when=FIRST_COMPLETED)
+      for future in done:
+        parent_accounts, child_units = future.result()
+        accounts.extend(parent_accounts)
+        pending |= {executor.submit(list_parent, org_client, unit_id, name) for unit_id, name in child_units}
+
+  return sorted(accounts, key=lambda account: account["name"])
+
+
+def load_org_inventory(management_account_id: str, *, membership: bool = False) -> list[OrgAccount] | None:
+  try:
+    with open(config.ORG_INVENTORY_PATH) as file:
+      data: OrgInventoryFile = json.load(file)
+  except (OSError, ValueError):
+    return None
+
+  if data.get("management_account_id") != management_account_id:
+    return None
+  if membership and not data.get("membership", False):
+    return None
+  try:
+    fetched_at = datetime.fromisoformat(data["fetched_at"])
+  except (KeyError, ValueError):
+    return None
+  if fetched_at + timedelta(seconds=config.ORG_INVENTORY_TTL_SECONDS) < datetime.now(timezone.utc):
+    return None
+  return data.get("accounts")
+
+
+def save_org_inventory(management_account_id: str, accounts: list[OrgAccount], *, membership: bool = False) -> None:
+  data: OrgInventoryFile = {
+    "management_account_id": management_account_id,
+    "fetched_at": datetime.now(timezone.utc).isoformat(),
+    "membership": membership,
+    "accounts": accounts,
+  }
+  file_ops.write_private_file(str(config.ORG_INVENTORY_PATH), json.dumps(data))
+
+
+def get_org_inventory(
+  management_account_id: str,
+  expected_names: Collection[str] = (),
+  *,
+  refresh: bool = config.REFRESH_ORG_INVENTORY,
+  membership: bool = False,
+) -> list[OrgAccount]:
+  if not refresh:
+    cached = load_org_inventory(management_account_id, membership=membership)
+    # Accounts created since the inventory was cached, e.g. by the terragrunt apply that precedes the
+    # roles script, would otherwise stay invisible until the TTL runs out
+    if cached is not None and set(expected_names) <= {account["name"] for account in cached}:
+      print(f"Using cached organization inventory of {len(cached)} accounts")
+      return cached
+
+  accounts = fetch_org_inventory(membership=membership)
+  save_org_inventory(management_account_id, accounts, membership=membership)
+  return accounts
+
+
+def account_ids(accounts: list[OrgAccount], *, active_only: bool = False) -> dict[str, str]:
+  return {
+    account["name"]: account["id"] for account in accounts if not active_only or account["status"] == ACTIVE_STATUS
+  }
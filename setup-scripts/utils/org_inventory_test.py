@@ -0,0 +1,136 @@
+# ignoring redefinition of pytest fixture functions
+# ruff: noqa: F811
+
+import json
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from tests.conftest import isolated_org_inventory  # noqa: F401
+from utils.org_inventory import OrgAccount, account_ids, fetch_org_inventory, get_org_inventory
+
+MANAGEMENT_ACCOUNT_ID = "111111111111"
+PRIVATE_FILE_MODE = 0o600
+EXPECTED_FETCHES = 2
+# Root -> Workloads -> Production, with one account on each level
+ORGANIZATION: dict[str, dict[str, list[dict[str, Any]]]] = {
+  "r-root": {
+    "Accounts": [{"Id": MANAGEMENT_ACCOUNT_ID, "Name": "management", "Email": "m@example.com", "Status": "ACTIVE"}],
+    "OrganizationalUnits": [{"Id": "ou-workloads", "Name": "Workloads"}],
+  },
+  "ou-workloads": {
+    "Accounts": [{"Id": "222222222222", "Name": "sandbox", "Email": "s@example.com", "Status": "SUSPENDED"}],
+    "OrganizationalUnits": [{"Id": "ou-production", "Name": "Production"}],
+  },
+  "ou-production": {
+    "Accounts": [{"Id": "333333333333", "Name": "production", "Email": "p@example.com", "Status": "ACTIVE"}],
+    "OrganizationalUnits": [],
+  },
+}
+
+
+@pytest.fixture
+def org_client(mocker: MockerFixture) -> MagicMock:
+  client = MagicMock()
+  client.list_roots.return_value = {"Roots": [{"Id": "r-root"}]}
+
+  def get_paginator(operation_name: str) -> MagicMock:
+    paginator = MagicMock()
+    if operation_name == "list_accounts":
+      paginator.paginate.return_value = [{"Accounts": parent["Accounts"]} for parent in ORGANIZATION.values()]
+      return paginator
+    key = "Accounts" if operation_name == "list_accounts_for_parent" else "OrganizationalUnits"
+    paginator.paginate.side_effect = lambda ParentId: [{key: ORGANIZATION[ParentId][key]}]  # noqa: N803
+    return paginator
+
+  client.get_paginator.side_effect = get_paginator
+  mocker.patch("utils.aws_clients.get_client", return_value=client)
+  return client
+
+
+def test_fetch_lists_accounts_without_walking_the_tree(org_client: MagicMock) -> None:
+  accounts = fetch_org_inventory()
+
+  assert [(account["name"], account["id"], account["status"]) for account in accounts] == [
+    ("management", MANAGEMENT_ACCOUNT_ID, "ACTIVE"),
+    ("production", "333333333333", "ACTIVE"),
+    ("sandbox", "222222222222", "SUSPENDED"),
+  ]
+  assert {account["organizational_unit"] for account in accounts} == {None}
+  org_client.list_roots.assert_not_called()
+
+
+def test_fetch_walks_nested_organizational_units(org_client: MagicMock) -> None:
+  accounts = fetch_org_inventory(max_workers=2, membership=True)
+
+  assert [(account["name"], account["organizational_unit"], account["parent_id"]) for account in accounts] == [
+    ("management", None, "r-root"),
+    ("production", "Production", "ou-production"),
+    ("sandbox", "Workloads", "ou-workloads"),
+  ]
+  assert accounts[2]["status"] == "SUSPENDED"
+  assert accounts[2]["email"] == "s@example.com"
+
+
+def test_inventory_is_persisted_and_reused(org_client: MagicMock, isolated_org_inventory: Path) -> None:
+  first = get_org_inventory(MANAGEMENT_ACCOUNT_ID)
+  second = get_org_inventory(MANAGEMENT_ACCOUNT_ID, ["sandbox"])
+
+  assert first == second
+  assert org_client.get_paginator.call_count == 1
+  assert isolated_org_inventory.stat().st_mode & 0o777 == PRIVATE_FILE_MODE
+
+
+@pytest.mark.parametrize(
+  ("expected_names", "refresh", "management_account_id"),
+  [
+    (["new-account"], False, MANAGEMENT_ACCOUNT_ID),
+    ([], True, MANAGEMENT_ACCOUNT_ID),
+    ([], False, "999999999999"),
+  ],
+  ids=["unknown-account", "refresh", "other-organization"],
+)
+def test_inventory_is_fetched_again(
+  org_client: MagicMock, expected_names: list[str], refresh: bool, management_account_id: str
+) -> None:
+  get_org_inventory(MANAGEMENT_ACCOUNT_ID)
+
+  get_org_inventory(management_account_id, expected_names, refresh=refresh)
+
+  assert org_client.get_paginator.call_count == EXPECTED_FETCHES
+
+
+def test_expired_inventory_is_fetched_again(org_client: MagicMock, isolated_org_inventory: Path) -> None:
+  get_org_inventory(MANAGEMENT_ACCOUNT_ID)
+  data = json.loads(isolated_org_inventory.read_text())
+  data["fetched_at"] = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+  isolated_org_inventory.write_text(json.dumps(data))
+
+  get_org_inventory(MANAGEMENT_ACCOUNT_ID)
+
+  assert org_client.get_paginator.call_count == EXPECTED_FETCHES
+
+
+def test_inventory_without_membership_is_fetched_again_for_membership(org_client: MagicMock) -> None:
+  get_org_inventory(MANAGEMENT_ACCOUNT_ID)
+
+  accounts = get_org_inventory(MANAGEMENT_ACCOUNT_ID, membership=True)
+  cached = get_org_inventory(MANAGEMENT_ACCOUNT_ID)
+
+  assert cached == accounts
+  assert accounts[2]["organizational_unit"] == "Workloads"
+  org_client.list_roots.assert_called_once()
+
+
+def test_account_ids_can_skip_inactive_accounts() -> None:
+  accounts: list[OrgAccount] = [
+    {"id": "1", "name": "active", "email": "", "status": "ACTIVE", "parent_id": "r", "organizational_unit": None},
+    {"id": "2", "name": "closed", "email": "", "status": "SUSPENDED", "parent_id": "r", "organizational_unit": None},
+  ]
+
+  assert account_ids(accounts) == {"active": "1", "closed": "2"}
+  assert account_ids(accounts, active_only=True) == {"active": "1"}
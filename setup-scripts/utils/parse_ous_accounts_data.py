@@ -1,10 +1,32 @@
+import functools
+import hashlib
+import importlib
 import importlib.util
+import json
 import os
-from typing import TypedDict
+import pickle
+import sys
+import threading
+from types import ModuleType
+from typing import Any
 
-from utils.models import Account, ManagementAccountDetails, TerraformBackendConfig
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import TypedDict  # pydantic only validates typing_extensions TypedDicts before Python 3.12
+
+from utils import account_registry, config, file_ops, instrumentation, models
+from utils.account_registry import AccountRegistry
+from utils.models import (
+  ACCOUNT_LIST_ADAPTER,
+  Account,
+  AccountView,
+  ManagementAccountDetails,
+  TerraformBackendConfig,
+)
 
 OUS_ACCOUNTS_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), "..", "ous_accounts_registry.py")
+DECLARATIVE_REGISTRY_SUFFIXES = (".yaml", ".yml", ".json", ".toml")
+# Bump when the snapshot layout changes, so snapshots written by older code are not unpickled
+REGISTRY_SNAPSHOT_VERSION = 2
 
 
 class OUSAccountsRegistryError(ImportError):
@@ -12,6 +34,11 @@ class OUSAccountsRegistryError(ImportError):
     super().__init__("Could not load OU accounts registry")
 
 
+class RegistryFormatError(ValueError):
+  def __init__(self, registry_path: str, reason: str) -> None:
+    super().__init__(f"Invalid OU accounts registry {registry_path}: {reason}")
+
+
 class OUSAccountsData(TypedDict):
   name: str
   id: str
@@ -28,25 +55,59 @@ class OUSAccountsRegistryData(TypedDict):
   MANAGEMENT_ACCOUNT_ID: str
   MANAGEMENT_ACCOUNT_EMAIL: str
   PARENT_OU_ID: str
+  SHARD_MANAGEMENT_STATE_BY_OU: bool
   OUS_ACCOUNTS: dict[str, list[OUSAccountsData]]
 
 
 class AccountsData(TypedDict):
   terraform_backend_config: TerraformBackendConfig
   accounts_data: list[Account]
+  account_registry: AccountRegistry
   management_account_details: ManagementAccountDetails
 
 
-def load_ous_accounts_data() -> OUSAccountsRegistryData:
+# The modification and change times, size and inode of the registry file
+RegistryFileStat = tuple[int, int, int, int]
+
+
+class RegistryCacheEntry(TypedDict):
+  file_stat: RegistryFileStat
+  content_hash: str
+  accounts_data: AccountsData
+
+
+_registry_cache: dict[str, RegistryCacheEntry] = {}
+_registry_cache_lock = threading.Lock()
+_account_views: tuple[list[Account], list[AccountView]] | None = None
+
+
+def find_registry_path() -> str:
+  # ous_accounts_registry.py can be replaced by a .yaml, .yml, .json or .toml file with the same name
+  base_path, _ = os.path.splitext(OUS_ACCOUNTS_REGISTRY_PATH)
+  candidates = [OUS_ACCOUNTS_REGISTRY_PATH, *(f"{base_path}{suffix}" for suffix in DECLARATIVE_REGISTRY_SUFFIXES)]
+  existing = [path for path in dict.fromkeys(candidates) if os.path.exists(path)]
+  if len(existing) > 1:
+    error_msg = f"Found more than one OU accounts registry, keep only one of: {', '.join(existing)}"
+    raise ValueError(error_msg)
+  return existing[0] if existing else OUS_ACCOUNTS_REGISTRY_PATH
+
+
+def load_ous_accounts_data(registry_path: str | None = None) -> OUSAccountsRegistryData:
+  registry_path = registry_path or find_registry_path()
+  if os.path.splitext(registry_path)[1] in DECLARATIVE_REGISTRY_SUFFIXES:
+    return load_declarative_registry(registry_path)
+
   spec = importlib.util.spec_from_file_location(
     "ous_accounts_registry",
-    OUS_ACCOUNTS_REGISTRY_PATH,
+    registry_path,
   )
   if not spec or not spec.loader:
     raise OUSAccountsRegistryError()
 
   module = importlib.util.module_from_spec(spec)
-  spec.loader.exec_module(module)
+  # Compiled from source on every load, since __pycache__ bytecode is only checked against the mtime and size
+  with open(registry_path, "rb") as file:
+    exec(compile(file.read(), registry_path, "exec"), module.__dict__)
   return {
     "ACCOUNTS_PREFIX": module.ACCOUNTS_PREFIX,
     "AWS_REGION": module.AWS_REGION,
@@ -58,13 +119,200 @@ def load_ous_accounts_data() -> OUSAccountsRegistryData:
     "MANAGEMENT_ACCOUNT_ID": module.MANAGEMENT_ACCOUNT_ID,
     "MANAGEMENT_ACCOUNT_EMAIL": module.MANAGEMENT_ACCOUNT_EMAIL,
     "PARENT_OU_ID": module.PARENT_OU_ID,
+    # Optional, so registries written before the sharded layout existed still load
+    "SHARD_MANAGEMENT_STATE_BY_OU": getattr(module, "SHARD_MANAGEMENT_STATE_BY_OU", False),
     "OUS_ACCOUNTS": module.OUS_ACCOUNTS,
   }
 
 
+def parse_yaml(content: str, registry_path: str) -> object:
+  try:
+    yaml = importlib.import_module("yaml")
+  except ImportError as e:
+    raise RegistryFormatError(
+      registry_path, "YAML registries need PyYAML, install it with `uv pip install pyyaml`"
+    ) from e
+  try:
+    return yaml.load(content, Loader=yaml_registry_loader(yaml))
+  except yaml.YAMLError as e:
+    raise RegistryFormatError(registry_path, str(e)) from e
+
+
+@functools.cache
+def yaml_registry_loader(yaml: ModuleType) -> type:
+  # The C loader parses large registries several times faster, when PyYAML was built with libyaml
+  base_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+  # No registry setting is a number, so unquoted account IDs are kept exactly as written. Read as ints they
+  # would lose their leading zeros, or be read as octal when every digit is below 8.
+  number_tags = {"tag:yaml.org,2002:int", "tag:yaml.org,2002:float"}
+  resolvers = {
+    first_char: [(tag, pattern) for tag, pattern in char_resolvers if tag not in number_tags]
+    for first_char, char_resolvers in base_loader.yaml_implicit_resolvers.items()
+  }
+  return type("RegistryYAMLLoader", (base_loader,), {"yaml_implicit_resolvers": resolvers})
+
+
+def parse_toml(content: str, registry_path: str) -> object:
+  try:
+    toml = importlib.import_module("tomllib" if sys.version_info >= (3, 11) else "tomli")
+  except ImportError as e:
+    reason = "TOML registries need tomli before Python 3.11, install it with `uv pip install tomli`"
+    raise RegistryFormatError(registry_path, reason) from e
+  try:
+    return toml.loads(content)
+  except toml.TOMLDecodeError as e:
+    raise RegistryFormatError(registry_path, str(e)) from e
+
+
+def parse_json(content: str, registry_path: str) -> object:
+  try:
+    return json.loads(content)
+  except json.JSONDecodeError as e:
+    raise RegistryFormatError(registry_path, str(e)) from e
+
+
+def load_declarative_registry(registry_path: str) -> OUSAccountsRegistryData:
+  with open(registry_path, encoding="utf-8") as file:
+    content = file.read()
+
+  parsers = {".json": parse_json, ".toml": parse_toml}
+  raw = parsers.get(os.path.splitext(registry_path)[1], parse_yaml)(content, registry_path)
+  if not isinstance(raw, dict):
+    raise RegistryFormatError(registry_path, "the top level must be a mapping of the registry settings")
+  # Optional, like in the Python registry
+  raw.setdefault("SHARD_MANAGEMENT_STATE_BY_OU", False)
+  account_ids_as_strings(raw)
+  try:
+    return registry_data_adapter().validate_python(raw)
+  except ValidationError as e:
+    raise RegistryFormatError(registry_path, str(e)) from e
+
+
+def account_id_as_string(account_id: object) -> object:
+  # JSON and TOML read unquoted account IDs as numbers, which drop the leading zeros of the 12 digit IDs
+  if isinstance(account_id, int) and not isinstance(account_id, bool):
+    return f"{account_id:012d}"
+  return account_id
+
+
+def account_ids_as_strings(raw: dict[str, Any]) -> None:
+  if "MANAGEMENT_ACCOUNT_ID" in raw:
+    raw["MANAGEMENT_ACCOUNT_ID"] = account_id_as_string(raw["MANAGEMENT_ACCOUNT_ID"])
+  ous_accounts = raw.get("OUS_ACCOUNTS")
+  accounts = ous_accounts.values() if isinstance(ous_accounts, dict) else []
+  for account in (account for ou_accounts in accounts if isinstance(ou_accounts, list) for account in ou_accounts):
+    if isinstance(account, dict) and "id" in account:
+      account["id"] = account_id_as_string(account["id"])
+
+
+@functools.cache
+def registry_data_adapter() -> TypeAdapter[OUSAccountsRegistryData]:
+  return TypeAdapter(OUSAccountsRegistryData)
+
+
+def registry_content_hash(registry_path: str) -> str:
+  with open(registry_path, "rb") as file:
+    return hashlib.sha256(file.read()).hexdigest()
+
+
+def clear_ous_accounts_data_cache() -> None:
+  global _account_views  # noqa: PLW0603
+  with _registry_cache_lock:
+    _registry_cache.clear()
+    _account_views = None
+
+
+@functools.cache
+def models_fingerprint() -> str:
+  # Snapshots hold pickled models and the registry, which must not outlive a change to their definitions
+  sources = []
+  for source_path in (models.__file__, account_registry.__file__):
+    with open(str(source_path), "rb") as file:
+      sources.append(file.read())
+  return file_ops.content_hash(b"\0".join(sources))
+
+
+def registry_snapshot_path(content_hash: str) -> str:
+  key = file_ops.content_hash(f"{REGISTRY_SNAPSHOT_VERSION}:{models_fingerprint()}:{content_hash}".encode())
+  return str(config.REGISTRY_SNAPSHOT_DIRECTORY_PATH / f"{key}.pickle")
+
+
+def load_registry_snapshot(content_hash: str) -> AccountsData | None:
+  try:
+    with open(registry_snapshot_path(content_hash), "rb") as file:
+      # Unpickling runs code from the file, so only snapshots no other user could have written are trusted
+      file_stat = os.fstat(file.fileno())
+      if file_stat.st_uid != os.getuid() or file_stat.st_mode & 0o077:
+        return None
+      accounts_data: AccountsData = pickle.load(file)
+  except FileNotFoundError:
+    return None
+  except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+    # A damaged or outdated snapshot is rebuilt from the registry
+    return None
+  return accounts_data
+
+
+def save_registry_snapshot(content_hash: str, accounts_data: AccountsData) -> None:
+  path = registry_snapshot_path(content_hash)
+  try:
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    file_ops.atomic_write(path, pickle.dumps(accounts_data, protocol=pickle.HIGHEST_PROTOCOL), 0o600)
+  except OSError:
+    # The snapshot only speeds up the next run, so an unwritable cache directory is not an error
+    return
+
+
+def build_registry(registry_path: str, content_hash: str) -> AccountsData:
+  # Declarative registries are plain data, so their validated models can be reused by later runs until the file
+  # changes. A Python registry can compute its values, e.g. from the environment, and is always executed.
+  use_snapshot = config.REGISTRY_SNAPSHOT_ENABLED and registry_path.endswith(DECLARATIVE_REGISTRY_SUFFIXES)
+  if use_snapshot:
+    with instrumentation.span("load_registry_snapshot"):
+      snapshot = load_registry_snapshot(content_hash)
+    if snapshot is not None:
+      return snapshot
+
+  with instrumentation.span("load_registry"):
+    accounts_data = build_ous_accounts_data(load_ous_accounts_data(registry_path))
+  if use_snapshot:
+    save_registry_snapshot(content_hash, accounts_data)
+  return accounts_data
+
+
+def registry_file_stat(registry_path: str) -> RegistryFileStat:
+  stat = os.stat(registry_path)
+  return (stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size, stat.st_ino)
+
+
 def ous_accounts_data() -> AccountsData:
-  data = load_ous_accounts_data()
+  # The registry is loaded and validated once per process. The content hash is only computed when the file's
+  # mtime, ctime, size or inode changed. Restoring the mtime after an edit still changes the ctime, and replacing
+  # the file changes the inode. A changed stat only forces a reload when the content hash changed as well, so
+  # touching the file does not rebuild every model.
+  registry_path = os.path.realpath(find_registry_path())
+  file_stat = registry_file_stat(registry_path)
+
+  with _registry_cache_lock:
+    cached = _registry_cache.get(registry_path)
+    if cached and cached["file_stat"] == file_stat:
+      return cached["accounts_data"]
+
+    content_hash = registry_content_hash(registry_path)
+    if cached and cached["content_hash"] == content_hash:
+      cached["file_stat"] = file_stat
+      return cached["accounts_data"]
+
+    accounts_data = build_registry(registry_path, content_hash)
+    _registry_cache[registry_path] = {
+      "file_stat": file_stat,
+      "content_hash": content_hash,
+      "accounts_data": accounts_data,
+    }
+    return accounts_data
 
+
+def build_ous_accounts_data(data: OUSAccountsRegistryData) -> AccountsData:
   terraform_backend_config = TerraformBackendConfig(
     aws_region=data["AWS_REGION"],
     create_terraform_admin_role=data["CREATE_TERRAFORM_ADMIN_ROLE"],
@@ -73,36 +321,36 @@ def ous_accounts_data() -> AccountsData:
     s3_backend_bucket_name=data["S3_BACKEND_BUCKET_NAME"],
   )
 
-  accounts_data = []
-  for ou_name, accounts in data["OUS_ACCOUNTS"].items():
-    for account in accounts:
-      accounts_data.append(
-        Account(
-          name=account["name"],
-          id=account["id"],
-          organizational_unit=ou_name,
-          terraform_backend_config=terraform_backend_config,
-        )
-      )
-
-  management_ou_name = next(
-    ou_name
-    for ou_name, accounts in data["OUS_ACCOUNTS"].items()
-    if any(account["id"] == data["MANAGEMENT_ACCOUNT_ID"] for account in accounts)
+  # One pydantic-core call validates every account, instead of one Account() call per registry entry
+  accounts_data = ACCOUNT_LIST_ADAPTER.validate_python(
+    [
+      {
+        "name": account["name"],
+        "id": account["id"],
+        "organizational_unit": ou_name,
+        "terraform_backend_config": terraform_backend_config,
+      }
+      for ou_name, accounts in data["OUS_ACCOUNTS"].items()
+      for account in accounts
+    ]
   )
 
+  registry = AccountRegistry(accounts_data, data["MANAGEMENT_ACCOUNT_ID"])
+
   management_account_details = ManagementAccountDetails(
     name=data["MANAGEMENT_ACCOUNT_NAME"],
     id=data["MANAGEMENT_ACCOUNT_ID"],
     email=data["MANAGEMENT_ACCOUNT_EMAIL"],
     parent_ou_id=data["PARENT_OU_ID"],
-    organizational_unit=management_ou_name,
+    shard_state_by_ou=data["SHARD_MANAGEMENT_STATE_BY_OU"],
+    organizational_unit=registry.management_account.organizational_unit,
     terraform_backend_config=terraform_backend_config,
   )
 
   return {
     "terraform_backend_config": terraform_backend_config,
     "accounts_data": accounts_data,
+    "account_registry": registry,
     "management_account_details": management_account_details,
   }
 
@@ -112,6 +360,21 @@ def get_accounts_data() -> list[Account]:
   return data["accounts_data"]
 
 
+def get_account_registry() -> AccountRegistry:
+  data = ous_accounts_data()
+  return data["account_registry"]
+
+
+def get_account_views() -> list[AccountView]:
+  # Built once per loaded registry, and again when the registry changed
+  global _account_views  # noqa: PLW0603
+  accounts = get_accounts_data()
+  with _registry_cache_lock:
+    if _account_views is None or _account_views[0] is not accounts:
+      _account_views = (accounts, [AccountView.from_account(account) for account in accounts])
+    return _account_views[1]
+
+
 def get_terraform_backend_config() -> TerraformBackendConfig:
   data = ous_accounts_data()
   return data["terraform_backend_config"]
@@ -1,13 +1,28 @@
+# ignoring redefinition of pytest fixture functions
+# ruff: noqa: F811
+
 import importlib.util
+import json
+import os
+import shutil
+from collections.abc import Generator
 from pathlib import Path
 from types import ModuleType
+from typing import Any
 
 import pytest
 from pytest_mock import MockerFixture
 
-from tests.conftest import TEST_ACCOUNT_COUNT
-from utils.models import Account, ManagementAccountDetails, TerraformBackendConfig
+from tests.conftest import TEST_ACCOUNT_COUNT, isolated_registry_snapshots  # noqa: F401
+from utils import parse_ous_accounts_data
+from utils.account_registry import DuplicateAccountError
+from utils.models import Account, AccountView, ManagementAccountDetails, TerraformBackendConfig
 from utils.parse_ous_accounts_data import (
+  RegistryFormatError,
+  build_ous_accounts_data,
+  clear_ous_accounts_data_cache,
+  get_account_registry,
+  get_account_views,
   get_accounts_data,
   get_management_account_details,
   get_terraform_backend_config,
@@ -33,6 +48,40 @@ def load_test_registry_data() -> ModuleType:
 
 
 TEST_REGISTRY = load_test_registry_data()
+REGISTRY_SETTINGS = [
+  "ACCOUNTS_PREFIX",
+  "AWS_REGION",
+  "CREATE_TERRAFORM_ADMIN_ROLE",
+  "TERRAFORM_ADMIN_ROLE_NAME",
+  "CREATE_S3_BACKEND_BUCKET",
+  "S3_BACKEND_BUCKET_NAME",
+  "MANAGEMENT_ACCOUNT_NAME",
+  "MANAGEMENT_ACCOUNT_ID",
+  "MANAGEMENT_ACCOUNT_EMAIL",
+  "PARENT_OU_ID",
+]
+PRIVATE_FILE_MODE = 0o600
+
+
+def registry_as_toml(registry: dict[str, Any]) -> str:
+  lines = [f"{name} = {json.dumps(registry[name])}" for name in REGISTRY_SETTINGS]
+  for ou_name, accounts in registry["OUS_ACCOUNTS"].items():
+    for account in accounts:
+      lines.extend(["", f"[[OUS_ACCOUNTS.{ou_name}]]", f'name = "{account["name"]}"', f'id = "{account["id"]}"'])
+  return "\n".join(lines) + "\n"
+
+
+def write_declarative_registry(tmp_path: Path, suffix: str) -> Path:
+  registry = {name: getattr(TEST_REGISTRY, name) for name in [*REGISTRY_SETTINGS, "OUS_ACCOUNTS"]}
+  registry_path = tmp_path / f"ous_accounts_registry{suffix}"
+  if suffix == ".json":
+    registry_path.write_text(json.dumps(registry))
+  elif suffix == ".toml":
+    registry_path.write_text(registry_as_toml(registry))
+  else:
+    yaml = pytest.importorskip("yaml")
+    registry_path.write_text(yaml.safe_dump(registry, sort_keys=False))
+  return registry_path
 
 
 @pytest.fixture
@@ -45,6 +94,21 @@ def mock_config_path(mocker: MockerFixture, test_registry_path: Path) -> None:
   mocker.patch("utils.parse_ous_accounts_data.OUS_ACCOUNTS_REGISTRY_PATH", str(test_registry_path))
 
 
+@pytest.fixture(autouse=True)
+def clear_registry_cache() -> Generator[None, None, None]:
+  clear_ous_accounts_data_cache()
+  yield
+  clear_ous_accounts_data_cache()
+
+
+@pytest.fixture
+def tmp_registry_path(tmp_path: Path, test_registry_path: Path, mocker: MockerFixture) -> Path:
+  registry_path = tmp_path / "ous_accounts_registry.py"
+  shutil.copy(test_registry_path, registry_path)
+  mocker.patch("utils.parse_ous_accounts_data.OUS_ACCOUNTS_REGISTRY_PATH", str(registry_path))
+  return registry_path
+
+
 def test_load_ous_accounts_data() -> None:
   result = load_ous_accounts_data()
 
@@ -121,3 +185,192 @@ def test_get_management_account_details() -> None:
   assert result.parent_ou_id == TEST_REGISTRY.PARENT_OU_ID
   assert result.name == f"{TEST_REGISTRY.ACCOUNTS_PREFIX}-management"
   assert result.organizational_unit == "Management"
+  assert result.shard_state_by_ou is getattr(TEST_REGISTRY, "SHARD_MANAGEMENT_STATE_BY_OU", False)
+
+
+def test_ous_accounts_data_is_cached(mocker: MockerFixture) -> None:
+  load_spy = mocker.spy(parse_ous_accounts_data, "load_ous_accounts_data")
+
+  first = ous_accounts_data()
+  get_accounts_data()
+  get_terraform_backend_config()
+  get_management_account_details()
+
+  assert ous_accounts_data() is first
+  assert load_spy.call_count == 1
+
+
+def test_ous_accounts_data_reloads_on_content_change(tmp_registry_path: Path) -> None:
+  first = ous_accounts_data()
+
+  content = tmp_registry_path.read_text().replace('AWS_REGION = "us-west-2"', 'AWS_REGION = "eu-west-1"')
+  tmp_registry_path.write_text(content)
+  stat = tmp_registry_path.stat()
+  os.utime(tmp_registry_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+  second = ous_accounts_data()
+  assert second is not first
+  assert second["terraform_backend_config"].aws_region == "eu-west-1"
+
+
+def test_ous_accounts_data_reloads_when_the_mtime_is_restored(tmp_registry_path: Path) -> None:
+  stat = tmp_registry_path.stat()
+  ous_accounts_data()
+
+  content = tmp_registry_path.read_text().replace('AWS_REGION = "us-west-2"', 'AWS_REGION = "eu-west-1"')
+  tmp_registry_path.write_text(content)
+  os.utime(tmp_registry_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+  assert tmp_registry_path.stat().st_mtime_ns == stat.st_mtime_ns
+  assert ous_accounts_data()["terraform_backend_config"].aws_region == "eu-west-1"
+
+
+def test_ous_accounts_data_ignores_touch_without_content_change(tmp_registry_path: Path, mocker: MockerFixture) -> None:
+  first = ous_accounts_data()
+  load_spy = mocker.spy(parse_ous_accounts_data, "load_ous_accounts_data")
+
+  stat = tmp_registry_path.stat()
+  os.utime(tmp_registry_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+  assert ous_accounts_data() is first
+  load_spy.assert_not_called()
+
+
+def test_clear_ous_accounts_data_cache(mocker: MockerFixture) -> None:
+  first = ous_accounts_data()
+  clear_ous_accounts_data_cache()
+  load_spy = mocker.spy(parse_ous_accounts_data, "load_ous_accounts_data")
+
+  assert ous_accounts_data() is not first
+  assert load_spy.call_count == 1
+
+
+@pytest.mark.parametrize("suffix", [".json", ".yaml", ".toml"])
+def test_declarative_registry_matches_python_registry(tmp_path: Path, mocker: MockerFixture, suffix: str) -> None:
+  expected = ous_accounts_data()
+  write_declarative_registry(tmp_path, suffix)
+  mocker.patch("utils.parse_ous_accounts_data.OUS_ACCOUNTS_REGISTRY_PATH", str(tmp_path / "ous_accounts_registry.py"))
+
+  assert ous_accounts_data() == expected
+
+
+@pytest.mark.parametrize("account_id", ["123456789012", "012345670123", "098765432109"])
+def test_unquoted_yaml_account_ids_are_kept_as_written(tmp_path: Path, account_id: str) -> None:
+  registry_path = write_declarative_registry(tmp_path, ".yaml")
+  registry_path.write_text(registry_path.read_text().replace("id: '222222222222'", f"id: {account_id}"))
+
+  registry = load_ous_accounts_data(str(registry_path))
+
+  assert registry["OUS_ACCOUNTS"]["Infrastructure"][0]["id"] == account_id
+
+
+def test_numeric_json_account_ids_are_read_as_strings(tmp_path: Path) -> None:
+  registry_path = write_declarative_registry(tmp_path, ".json")
+  registry = json.loads(registry_path.read_text())
+  registry["MANAGEMENT_ACCOUNT_ID"] = int(registry["MANAGEMENT_ACCOUNT_ID"])
+  registry["OUS_ACCOUNTS"]["Infrastructure"][0]["id"] = 12345678901
+  registry_path.write_text(json.dumps(registry))
+
+  loaded = load_ous_accounts_data(str(registry_path))
+
+  assert loaded["MANAGEMENT_ACCOUNT_ID"] == TEST_REGISTRY.MANAGEMENT_ACCOUNT_ID
+  assert loaded["OUS_ACCOUNTS"]["Infrastructure"][0]["id"] == "012345678901"
+
+
+def test_declarative_registry_snapshot_is_reused(
+  tmp_path: Path, mocker: MockerFixture, isolated_registry_snapshots: Path
+) -> None:
+  write_declarative_registry(tmp_path, ".json")
+  mocker.patch("utils.parse_ous_accounts_data.OUS_ACCOUNTS_REGISTRY_PATH", str(tmp_path / "ous_accounts_registry.py"))
+  first = ous_accounts_data()
+  clear_ous_accounts_data_cache()
+  load_spy = mocker.spy(parse_ous_accounts_data, "load_ous_accounts_data")
+
+  second = ous_accounts_data()
+
+  assert second == first
+  assert second is not first
+  load_spy.assert_not_called()
+  [snapshot] = isolated_registry_snapshots.iterdir()
+  assert snapshot.stat().st_mode & 0o777 == PRIVATE_FILE_MODE
+
+
+def test_declarative_registry_snapshot_follows_content_changes(tmp_path: Path, mocker: MockerFixture) -> None:
+  registry_path = write_declarative_registry(tmp_path, ".json")
+  mocker.patch("utils.parse_ous_accounts_data.OUS_ACCOUNTS_REGISTRY_PATH", str(tmp_path / "ous_accounts_registry.py"))
+  ous_accounts_data()
+  clear_ous_accounts_data_cache()
+
+  registry_path.write_text(registry_path.read_text().replace('"us-west-2"', '"eu-west-1"'))
+
+  assert get_terraform_backend_config().aws_region == "eu-west-1"
+
+
+@pytest.mark.parametrize(
+  ("content", "match"),
+  [
+    ("{", "Expecting property name"),
+    ("[]", "must be a mapping"),
+    ('{"AWS_REGION": "us-west-2"}', "MANAGEMENT_ACCOUNT_ID"),
+  ],
+  ids=["syntax", "not-a-mapping", "missing-settings"],
+)
+def test_invalid_declarative_registry(tmp_path: Path, content: str, match: str) -> None:
+  registry_path = tmp_path / "ous_accounts_registry.json"
+  registry_path.write_text(content)
+
+  with pytest.raises(RegistryFormatError, match=match):
+    load_ous_accounts_data(str(registry_path))
+
+
+def test_more_than_one_registry_is_rejected(tmp_registry_path: Path) -> None:
+  write_declarative_registry(tmp_registry_path.parent, ".json")
+
+  with pytest.raises(ValueError, match="more than one OU accounts registry"):
+    ous_accounts_data()
+
+
+def test_accounts_are_validated_together() -> None:
+  registry = load_ous_accounts_data()
+  registry["OUS_ACCOUNTS"]["Sandbox"].append({"name": "", "id": ""})
+
+  with pytest.raises(ValueError, match=r"(?s)\d+\.name\n.*at least 1 character"):
+    build_ous_accounts_data(registry)
+
+
+def test_account_registry_is_built_from_the_loaded_accounts() -> None:
+  registry = get_account_registry()
+
+  assert registry.accounts is get_accounts_data()
+  assert registry.by_id(TEST_REGISTRY.MANAGEMENT_ACCOUNT_ID) is not None
+  assert get_management_account_details().organizational_unit == "Management"
+
+
+def test_registry_without_the_management_account_is_rejected() -> None:
+  registry = load_ous_accounts_data()
+  registry["MANAGEMENT_ACCOUNT_ID"] = "000000000000"
+
+  with pytest.raises(ValueError, match="MANAGEMENT_ACCOUNT_ID 000000000000 is not the ID of any account"):
+    build_ous_accounts_data(registry)
+
+
+def test_registry_with_duplicate_account_names_is_rejected() -> None:
+  registry = load_ous_accounts_data()
+  registry["OUS_ACCOUNTS"]["Sandbox"].append({"name": registry["OUS_ACCOUNTS"]["Security"][0]["name"], "id": ""})
+
+  with pytest.raises(DuplicateAccountError, match="in the registry twice, in Sandbox and Security"):
+    build_ous_accounts_data(registry)
+
+
+def test_account_views_share_one_backend_config() -> None:
+  accounts = get_accounts_data()
+  views = get_account_views()
+
+  assert all(isinstance(view, AccountView) for view in views)
+  assert [(view.name, view.id, view.organizational_unit) for view in views] == [
+    (account.name, account.id, account.organizational_unit) for account in accounts
+  ]
+  assert {id(view.terraform_backend_config) for view in views} == {id(get_terraform_backend_config())}
+  assert get_account_views() is views
+  clear_ous_accounts_data_cache()
+  assert get_account_views() is not views
@@ -0,0 +1,197 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from utils import config
+
+if TYPE_CHECKING:
+  from botocore.exceptions import ClientError
+
+T = TypeVar("T")
+
+# Error codes AWS services use for request throttling, matching botocore's own retry rules
+THROTTLING_ERROR_CODES = frozenset(
+  {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "SlowDown",
+    "PriorRequestNotComplete",
+    "BandwidthLimitExceeded",
+  }
+)
+MIN_RATE_FRACTION = 0.05
+RATE_DECREASE_FACTOR = 0.5
+RATE_INCREASE_FRACTION = 0.05
+RATE_DECREASE_INTERVAL_SECONDS = 1.0
+THROTTLE_PAUSE_SECONDS = 0.5
+THROTTLE_BACKOFF_BASE_SECONDS = 0.5
+THROTTLE_BACKOFF_CAP_SECONDS = 20.0
+
+
+class InvalidRateLimitError(ValueError):
+  def __init__(self, entry: str) -> None:
+    super().__init__(f"Invalid rate limit '{entry}', expected <service>=<requests per second>")
+
+
+def is_throttling_error(error: Exception) -> bool:
+  from botocore.exceptions import ClientError
+
+  return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+def throttling_backoff_seconds(attempt: int) -> float:
+  # Full jitter, so callers that were throttled together do not retry together
+  return random.uniform(0, min(THROTTLE_BACKOFF_CAP_SECONDS, THROTTLE_BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+class TokenBucket:
+  # Shared by every client of a service, so a fan-out across hundreds of per-account clients is held to one
+  # request rate. Throttles halve the rate and pause all callers for a jittered moment, successes raise it
+  # back towards the configured rate.
+  def __init__(self, rate: float, burst: float | None = None) -> None:
+    self.max_rate = rate
+    self.rate = rate
+    self.min_rate = rate * MIN_RATE_FRACTION
+    self.capacity = burst if burst is not None else max(1.0, rate)
+    self.tokens = self.capacity
+    self.updated = time.monotonic()
+    self.paused_until = 0.0
+    self.last_decrease = 0.0
+    self._lock = threading.Lock()
+
+  def _refill(self, now: float) -> None:
+    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+    self.updated = now
+
+  def acquire(self) -> float:
+    waited = 0.0
+    while True:
+      with self._lock:
+        now = time.monotonic()
+        self._refill(now)
+        wait = self.paused_until - now
+        if wait <= 0:
+          if self.tokens >= 1:
+            self.tokens -= 1
+            return waited
+          wait = (1 - self.tokens) / self.rate
+      time.sleep(wait)
+      waited += wait
+
+  def on_throttle(self) -> None:
+    with self._lock:
+      now = time.monotonic()
+      self._refill(now)
+      # Concurrent callers are throttled together, which is one signal rather than one per caller
+      if now - self.last_decrease < RATE_DECREASE_INTERVAL_SECONDS:
+        return
+      self.rate = max(self.min_rate, self.rate * RATE_DECREASE_FACTOR)
+      self.last_decrease = now
+      self.paused_until = now + random.uniform(0, THROTTLE_PAUSE_SECONDS)
+
+  def on_success(self) -> None:
+    with self._lock:
+      if self.rate < self.max_rate:
+        self._refill(time.monotonic())
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_INCREASE_FRACTION)
+
+
+def parse_rate_limits(value: str) -> dict[str, float]:
+  rate_limits: dict[str, float] = {}
+  for entry in value.split(","):
+    if not entry.strip():
+      continue
+    service, _, rate = entry.partition("=")
+    try:
+      rate_limits[service.strip()] = float(rate)
+    except ValueError as e:
+      raise InvalidRateLimitError(entry) from e
+    if rate_limits[service.strip()] <= 0:
+      raise InvalidRateLimitError(entry)
+  return rate_limits
+
+
+def service_rate_limits() -> dict[str, float]:
+  return {**config.AWS_RATE_LIMITS, **parse_rate_limits(config.AWS_RATE_LIMITS_OVERRIDE)}
+
+
+RateLimiterKey = tuple[str, str | None]
+
+_rate_limiters: dict[RateLimiterKey, TokenBucket] = {}
+_lock = threading.Lock()
+
+
+def get_rate_limiter(service_name: str, identity: str | None = None) -> TokenBucket | None:
+  # AWS throttles per calling account, so calls made with the same credentials share a bucket. STS,
+  # Organizations and S3 all run as the management account and share one bucket each, while IAM calls
+  # into member accounts are limited per account.
+  key: RateLimiterKey = (service_name, identity)
+  with _lock:
+    if key not in _rate_limiters:
+      rate = service_rate_limits().get(service_name)
+      if rate is None:
+        return None
+      _rate_limiters[key] = TokenBucket(rate)
+    return _rate_limiters[key]
+
+
+def clear_rate_limiters() -> None:
+  with _lock:
+    _rate_limiters.clear()
+
+
+def observe_response(rate_limiter: TokenBucket, response: tuple[Any, dict[str, Any]] | None) -> None:
+  if response is None:
+    return
+  # Any answer other than a throttle, including errors like EntityAlreadyExists, means the rate was accepted
+  _, parsed_response = response
+  if parsed_response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+    rate_limiter.on_throttle()
+  else:
+    rate_limiter.on_success()
+
+
+def attach_rate_limiter(client: Any, service_name: str, identity: str | None = None) -> None:
+  rate_limiter = get_rate_limiter(service_name, identity)
+  if rate_limiter is None:
+    return
+
+  # before-send runs once per attempt, so botocore's own retries are rate limited as well
+  def acquire(**_kwargs: Any) -> None:
+    rate_limiter.acquire()
+
+  def observe(response: tuple[Any, dict[str, Any]] | None = None, **_kwargs: Any) -> None:
+    observe_response(rate_limiter, response)
+
+  client.meta.events.register_first("before-send", acquire, unique_id="rate-limit-acquire")
+  client.meta.events.register_first("needs-retry", observe, unique_id="rate-limit-observe")
+
+
+def botocore_retries_exhausted(error: "ClientError") -> bool:
+  # RetryAttempts counts botocore's retries of the failed request, so a request that used every attempt is
+  # not retried again on top of them
+  retry_attempts = error.response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+  return retry_attempts >= config.AWS_MAX_ATTEMPTS - 1
+
+
+def retry_throttled(call: Callable[[], T], attempts: int = config.THROTTLE_RETRY_ATTEMPTS) -> T:
+  # botocore retries each request on its own. In standard and adaptive mode it stops early once a throttled
+  # fan-out has drained its shared retry quota. Only then is one account's step retried after a jittered pause.
+  # A request that already used all of botocore's attempts fails the step right away.
+  from botocore.exceptions import ClientError
+
+  for attempt in range(attempts - 1):
+    try:
+      return call()
+    except ClientError as e:
+      if not is_throttling_error(e) or botocore_retries_exhausted(e):
+        raise
+      time.sleep(throttling_backoff_seconds(attempt))
+  return call()
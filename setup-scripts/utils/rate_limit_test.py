@@ -0,0 +1,152 @@
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+from pytest_mock import MockerFixture
+
+from utils import aws_clients, rate_limit
+from utils.rate_limit import InvalidRateLimitError, TokenBucket
+
+TEST_RATE = 10.0
+EXPECTED_CALL_ATTEMPTS = 3
+
+
+class FakeClock:
+  def __init__(self) -> None:
+    self.now = 1000.0
+    self.sleeps: list[float] = []
+
+  def monotonic(self) -> float:
+    return self.now
+
+  def sleep(self, seconds: float) -> None:
+    self.sleeps.append(seconds)
+    self.now += seconds
+
+
+@pytest.fixture
+def clock(mocker: MockerFixture) -> FakeClock:
+  clock = FakeClock()
+  mocker.patch("utils.rate_limit.time", clock)
+  return clock
+
+
+def client_error(code: str, retry_attempts: int = 0) -> ClientError:
+  return ClientError(
+    {
+      "Error": {"Code": code, "Message": code},
+      "ResponseMetadata": {
+        "RequestId": "request-id",
+        "HostId": "",
+        "HTTPStatusCode": 400,
+        "HTTPHeaders": {},
+        "RetryAttempts": retry_attempts,
+      },
+    },
+    "CreateRole",
+  )
+
+
+def test_parse_rate_limits() -> None:
+  assert rate_limit.parse_rate_limits("iam=40, sts=200,") == {"iam": 40.0, "sts": 200.0}
+  assert rate_limit.parse_rate_limits("") == {}
+
+
+@pytest.mark.parametrize("value", ["iam", "iam=fast", "iam=0"])
+def test_parse_rate_limits_rejects_invalid_entries(value: str) -> None:
+  with pytest.raises(InvalidRateLimitError, match="expected <service>=<requests per second>"):
+    rate_limit.parse_rate_limits(value)
+
+
+def test_token_bucket_paces_requests_after_burst(clock: FakeClock) -> None:
+  bucket = TokenBucket(TEST_RATE, burst=2)
+
+  waits = [bucket.acquire() for _ in range(4)]
+
+  assert waits[:2] == [0.0, 0.0]
+  assert waits[2:] == pytest.approx([1 / TEST_RATE, 1 / TEST_RATE])
+
+
+def test_token_bucket_backs_off_on_throttle_and_recovers(clock: FakeClock) -> None:
+  bucket = TokenBucket(TEST_RATE)
+
+  bucket.on_throttle()
+  bucket.on_throttle()
+
+  assert bucket.rate == TEST_RATE * rate_limit.RATE_DECREASE_FACTOR
+  assert bucket.paused_until >= clock.now
+
+  for _ in range(100):
+    bucket.on_success()
+  assert bucket.rate == TEST_RATE
+
+
+def test_retry_throttled_retries_only_throttling(clock: FakeClock) -> None:
+  call = MagicMock(side_effect=[client_error("Throttling"), client_error("TooManyRequestsException"), "created"])
+
+  assert rate_limit.retry_throttled(call) == "created"
+  assert call.call_count == EXPECTED_CALL_ATTEMPTS
+  assert len(clock.sleeps) == EXPECTED_CALL_ATTEMPTS - 1
+
+  failing_call = MagicMock(side_effect=client_error("AccessDenied"))
+  with pytest.raises(ClientError, match="AccessDenied"):
+    rate_limit.retry_throttled(failing_call)
+  assert failing_call.call_count == 1
+
+
+def test_retry_throttled_raises_after_last_attempt(clock: FakeClock) -> None:
+  call = MagicMock(side_effect=client_error("Throttling"))
+
+  with pytest.raises(ClientError, match="Throttling"):
+    rate_limit.retry_throttled(call)
+  assert call.call_count == EXPECTED_CALL_ATTEMPTS
+
+
+def test_retry_throttled_leaves_requests_botocore_retried_fully(clock: FakeClock, mocker: MockerFixture) -> None:
+  mocker.patch("utils.config.AWS_MAX_ATTEMPTS", 10)
+  exhausted_call = MagicMock(side_effect=client_error("Throttling", retry_attempts=9))
+
+  with pytest.raises(ClientError, match="Throttling"):
+    rate_limit.retry_throttled(exhausted_call)
+  assert exhausted_call.call_count == 1
+  assert clock.sleeps == []
+
+  # botocore stopped after two retries because its retry quota ran out, so the step is retried
+  quota_drained_call = MagicMock(side_effect=[client_error("Throttling", retry_attempts=2), "created"])
+  assert rate_limit.retry_throttled(quota_drained_call) == "created"
+
+
+def test_clients_of_a_service_share_one_rate_limiter(mocker: MockerFixture) -> None:
+  mocker.patch("utils.config.AWS_RATE_LIMITS_OVERRIDE", f"iam={TEST_RATE}")
+  aws_clients.clear_clients()
+  first = aws_clients.get_client("iam", region_name="us-west-2")
+  second = aws_clients.get_client("iam", region_name="us-east-1")
+  bucket = rate_limit.get_rate_limiter("iam")
+  assert bucket is not None
+  assert bucket.max_rate == TEST_RATE
+
+  # Emitting the bare event name reaches only the handlers registered for every operation
+  first.meta.events.emit("before-send", request=MagicMock())
+  second.meta.events.emit("before-send", request=MagicMock())
+  assert bucket.tokens < TEST_RATE - 1
+
+  aws_clients.clear_clients()
+
+
+def test_observe_response_feeds_back_throttles_and_successes(clock: FakeClock) -> None:
+  bucket = TokenBucket(TEST_RATE)
+
+  rate_limit.observe_response(bucket, (MagicMock(status_code=400), {"Error": {"Code": "Throttling"}}))
+  assert bucket.rate == TEST_RATE * rate_limit.RATE_DECREASE_FACTOR
+
+  rate_limit.observe_response(bucket, (MagicMock(status_code=200), {}))
+  assert bucket.rate > TEST_RATE * rate_limit.RATE_DECREASE_FACTOR
+
+  rate_limit.observe_response(bucket, None)
+
+
+def test_services_without_a_limit_are_not_rate_limited(mocker: MockerFixture) -> None:
+  mocker.patch("utils.config.AWS_RATE_LIMITS", {})
+  rate_limit.clear_rate_limiters()
+
+  assert rate_limit.get_rate_limiter("iam") is None
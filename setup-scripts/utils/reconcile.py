@@ -0,0 +1,203 @@
+import json
+from collections import Counter
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any, Literal, TypedDict
+from urllib.parse import unquote
+
+from utils import rate_limit
+from utils.config import Colors
+
+if TYPE_CHECKING:
+  from botocore.exceptions import ClientError
+  from mypy_boto3_iam.client import IAMClient
+  from mypy_boto3_s3.client import S3Client
+
+ActionName = Literal[
+  "create_role",
+  "update_trust_policy",
+  "attach_policy",
+  "create_bucket",
+  "enable_bucket_encryption",
+  "enable_bucket_versioning",
+]
+
+NEW_BUCKET_ACTIONS: tuple[ActionName, ...] = ("create_bucket", "enable_bucket_encryption", "enable_bucket_versioning")
+MISSING_ROLE_ERROR_CODES = frozenset({"NoSuchEntity"})
+MISSING_BUCKET_ERROR_CODES = frozenset({"404", "NoSuchBucket", "NotFound"})
+MISSING_ENCRYPTION_ERROR_CODES = frozenset({"ServerSideEncryptionConfigurationNotFoundError"})
+
+
+class PlannedAction(TypedDict):
+  account: str
+  action: ActionName
+  resource: str
+  reason: str
+
+
+class RoleState(TypedDict):
+  exists: bool
+  trust_policy: dict[str, Any] | None
+  inline_policy: dict[str, Any] | None
+
+
+class BucketState(TypedDict):
+  exists: bool
+  encryption_algorithm: str | None
+  versioning_status: str | None
+
+
+def error_code(error: "ClientError") -> str:
+  return str(error.response.get("Error", {}).get("Code", ""))
+
+
+def policy_document(document: str | Mapping[str, Any]) -> dict[str, Any]:
+  # botocore already decodes IAM policy documents, but the stubs also allow the URL-encoded JSON AWS returns
+  if isinstance(document, str):
+    decoded: dict[str, Any] = json.loads(unquote(document))
+    return decoded
+  return dict(document)
+
+
+def normalize_policy(value: Any) -> Any:
+  # IAM accepts a single value wherever it accepts a list, so ["sts:AssumeRole"] and "sts:AssumeRole" are equal
+  if isinstance(value, Mapping):
+    return {key: normalize_policy(item) for key, item in value.items()}
+  if isinstance(value, list):
+    items = [normalize_policy(item) for item in value]
+    return items[0] if len(items) == 1 else items
+  return value
+
+
+def policies_match(current: Mapping[str, Any] | None, desired: Mapping[str, Any]) -> bool:
+  return current is not None and normalize_policy(current) == normalize_policy(desired)
+
+
+def read_role_state(iam_client: "IAMClient", role_name: str, policy_name: str) -> RoleState:
+  from botocore.exceptions import ClientError
+
+  try:
+    role = rate_limit.retry_throttled(lambda: iam_client.get_role(RoleName=role_name))["Role"]
+  except ClientError as e:
+    if error_code(e) in MISSING_ROLE_ERROR_CODES:
+      return {"exists": False, "trust_policy": None, "inline_policy": None}
+    raise
+
+  try:
+    inline_policy = policy_document(
+      rate_limit.retry_throttled(lambda: iam_client.get_role_policy(RoleName=role_name, PolicyName=policy_name))[
+        "PolicyDocument"
+      ]
+    )
+  except ClientError as e:
+    if error_code(e) not in MISSING_ROLE_ERROR_CODES:
+      raise
+    inline_policy = None
+
+  trust_policy = role.get("AssumeRolePolicyDocument")
+  return {
+    "exists": True,
+    "trust_policy": policy_document(trust_policy) if trust_policy is not None else None,
+    "inline_policy": inline_policy,
+  }
+
+
+def read_bucket_state(s3_client: "S3Client", bucket_name: str) -> BucketState:
+  from botocore.exceptions import ClientError
+
+  try:
+    rate_limit.retry_throttled(lambda: s3_client.head_bucket(Bucket=bucket_name))
+  except ClientError as e:
+    if error_code(e) in MISSING_BUCKET_ERROR_CODES:
+      return {"exists": False, "encryption_algorithm": None, "versioning_status": None}
+    raise
+
+  try:
+    rules = rate_limit.retry_throttled(lambda: s3_client.get_bucket_encryption(Bucket=bucket_name))[
+      "ServerSideEncryptionConfiguration"
+    ]["Rules"]
+    default_encryption = rules[0].get("ApplyServerSideEncryptionByDefault") if rules else None
+    encryption_algorithm = default_encryption["SSEAlgorithm"] if default_encryption else None
+  except ClientError as e:
+    if error_code(e) not in MISSING_ENCRYPTION_ERROR_CODES:
+      raise
+    encryption_algorithm = None
+
+  versioning = rate_limit.retry_throttled(lambda: s3_client.get_bucket_versioning(Bucket=bucket_name))
+  return {
+    "exists": True,
+    "encryption_algorithm": encryption_algorithm,
+    "versioning_status": versioning.get("Status"),
+  }
+
+
+def plan_role(  # noqa: PLR0913
+  account: str,
+  role_name: str,
+  state: RoleState,
+  trust_policy: Mapping[str, Any],
+  policy_name: str,
+  policy: Mapping[str, Any],
+) -> list[PlannedAction]:
+  if not state["exists"]:
+    return [
+      {"account": account, "action": "create_role", "resource": role_name, "reason": "role does not exist"},
+      {"account": account, "action": "attach_policy", "resource": policy_name, "reason": "role does not exist"},
+    ]
+
+  actions: list[PlannedAction] = []
+  if not policies_match(state["trust_policy"], trust_policy):
+    actions.append(
+      {"account": account, "action": "update_trust_policy", "resource": role_name, "reason": "trust policy differs"}
+    )
+  if state["inline_policy"] is None:
+    actions.append(
+      {"account": account, "action": "attach_policy", "resource": policy_name, "reason": "inline policy missing"}
+    )
+  elif not policies_match(state["inline_policy"], policy):
+    actions.append(
+      {"account": account, "action": "attach_policy", "resource": policy_name, "reason": "inline policy differs"}
+    )
+  return actions
+
+
+def plan_bucket(account: str, bucket_name: str, state: BucketState) -> list[PlannedAction]:
+  if not state["exists"]:
+    return [
+      {"account": account, "action": action, "resource": bucket_name, "reason": "bucket does not exist"}
+      for action in NEW_BUCKET_ACTIONS
+    ]
+
+  actions: list[PlannedAction] = []
+  # Any default encryption is kept, so a bucket moved to KMS is not downgraded to AES256
+  if state["encryption_algorithm"] is None:
+    actions.append(
+      {
+        "account": account,
+        "action": "enable_bucket_encryption",
+        "resource": bucket_name,
+        "reason": "default encryption missing",
+      }
+    )
+  if state["versioning_status"] != "Enabled":
+    actions.append(
+      {
+        "account": account,
+        "action": "enable_bucket_versioning",
+        "resource": bucket_name,
+        "reason": f"versioning is {state['versioning_status'] or 'disabled'}",
+      }
+    )
+  return actions
+
+
+def print_plan(actions: list[PlannedAction]) -> None:
+  if not actions:
+    print(f"{Colors.GREEN}Plan: no changes, AWS resources are up to date{Colors.RESET}")
+    return
+
+  print("Plan:")
+  for action in actions:
+    print(f"  {action['account']}: {action['action']} {action['resource']} ({action['reason']})")
+  counts = Counter(action["action"] for action in actions)
+  summary = ", ".join(f"{count} {action}" for action, count in sorted(counts.items()))
+  print(f"Plan: {len(actions)} change(s) in {len({action['account'] for action in actions})} account(s): {summary}")
@@ -0,0 +1,130 @@
+import json
+from unittest.mock import MagicMock
+from urllib.parse import quote
+
+from botocore.exceptions import ClientError
+
+from utils.reconcile import (
+  RoleState,
+  plan_bucket,
+  plan_role,
+  policies_match,
+  policy_document,
+  read_bucket_state,
+  read_role_state,
+)
+
+ACCOUNT_ID = "111111111111"
+ROLE_NAME = "TerraformAdminRole"
+POLICY_NAME = "TerraformAdmin"
+BUCKET_NAME = "test-terraform-state"
+TRUST_POLICY = {
+  "Version": "2012-10-17",
+  "Statement": [
+    {"Effect": "Allow", "Principal": {"AWS": f"arn:aws:iam::{ACCOUNT_ID}:root"}, "Action": "sts:AssumeRole"}
+  ],
+}
+ADMIN_POLICY = {"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "*", "Resource": "*"}]}
+
+
+def client_error(code: str, operation: str) -> ClientError:
+  return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+def test_policy_document_decodes_url_encoded_json() -> None:
+  assert policy_document(quote(json.dumps(TRUST_POLICY))) == TRUST_POLICY
+  assert policy_document(TRUST_POLICY) == TRUST_POLICY
+
+
+def test_policies_match_treats_single_values_as_lists() -> None:
+  equivalent = {
+    "Version": "2012-10-17",
+    "Statement": {"Effect": "Allow", "Action": ["*"], "Resource": ["*"]},
+  }
+
+  assert policies_match(equivalent, ADMIN_POLICY)
+  assert not policies_match(None, ADMIN_POLICY)
+  assert not policies_match({**ADMIN_POLICY, "Statement": []}, ADMIN_POLICY)
+
+
+def test_plan_role_for_missing_role_creates_and_attaches() -> None:
+  state: RoleState = {"exists": False, "trust_policy": None, "inline_policy": None}
+
+  actions = plan_role(ACCOUNT_ID, ROLE_NAME, state, TRUST_POLICY, POLICY_NAME, ADMIN_POLICY)
+
+  assert [action["action"] for action in actions] == ["create_role", "attach_policy"]
+
+
+def test_plan_role_only_fixes_divergent_parts() -> None:
+  in_sync: RoleState = {"exists": True, "trust_policy": TRUST_POLICY, "inline_policy": ADMIN_POLICY}
+  missing_policy: RoleState = {"exists": True, "trust_policy": TRUST_POLICY, "inline_policy": None}
+  wrong_trust: RoleState = {"exists": True, "trust_policy": {"Statement": []}, "inline_policy": ADMIN_POLICY}
+
+  assert plan_role(ACCOUNT_ID, ROLE_NAME, in_sync, TRUST_POLICY, POLICY_NAME, ADMIN_POLICY) == []
+  assert plan_role(ACCOUNT_ID, ROLE_NAME, missing_policy, TRUST_POLICY, POLICY_NAME, ADMIN_POLICY) == [
+    {"account": ACCOUNT_ID, "action": "attach_policy", "resource": POLICY_NAME, "reason": "inline policy missing"}
+  ]
+  assert plan_role(ACCOUNT_ID, ROLE_NAME, wrong_trust, TRUST_POLICY, POLICY_NAME, ADMIN_POLICY) == [
+    {"account": ACCOUNT_ID, "action": "update_trust_policy", "resource": ROLE_NAME, "reason": "trust policy differs"}
+  ]
+
+
+def test_plan_bucket_keeps_existing_encryption() -> None:
+  missing = plan_bucket(
+    ACCOUNT_ID, BUCKET_NAME, {"exists": False, "encryption_algorithm": None, "versioning_status": None}
+  )
+  kms_unversioned = plan_bucket(
+    ACCOUNT_ID, BUCKET_NAME, {"exists": True, "encryption_algorithm": "aws:kms", "versioning_status": None}
+  )
+  in_sync = plan_bucket(
+    ACCOUNT_ID, BUCKET_NAME, {"exists": True, "encryption_algorithm": "AES256", "versioning_status": "Enabled"}
+  )
+
+  assert [action["action"] for action in missing] == [
+    "create_bucket",
+    "enable_bucket_encryption",
+    "enable_bucket_versioning",
+  ]
+  assert [action["action"] for action in kms_unversioned] == ["enable_bucket_versioning"]
+  assert in_sync == []
+
+
+def test_read_role_state_for_missing_role_skips_policy_read() -> None:
+  iam_client = MagicMock()
+  iam_client.get_role.side_effect = client_error("NoSuchEntity", "GetRole")
+
+  assert read_role_state(iam_client, ROLE_NAME, POLICY_NAME) == {
+    "exists": False,
+    "trust_policy": None,
+    "inline_policy": None,
+  }
+  iam_client.get_role_policy.assert_not_called()
+
+
+def test_read_role_state_without_inline_policy() -> None:
+  iam_client = MagicMock()
+  iam_client.get_role.return_value = {"Role": {"AssumeRolePolicyDocument": quote(json.dumps(TRUST_POLICY))}}
+  iam_client.get_role_policy.side_effect = client_error("NoSuchEntity", "GetRolePolicy")
+
+  assert read_role_state(iam_client, ROLE_NAME, POLICY_NAME) == {
+    "exists": True,
+    "trust_policy": TRUST_POLICY,
+    "inline_policy": None,
+  }
+
+
+def test_read_bucket_state() -> None:
+  s3_client = MagicMock()
+  s3_client.get_bucket_encryption.side_effect = client_error(
+    "ServerSideEncryptionConfigurationNotFoundError", "GetBucketEncryption"
+  )
+  s3_client.get_bucket_versioning.return_value = {}
+
+  assert read_bucket_state(s3_client, BUCKET_NAME) == {
+    "exists": True,
+    "encryption_algorithm": None,
+    "versioning_status": None,
+  }
+
+  s3_client.head_bucket.side_effect = client_error("404", "HeadBucket")
+  assert read_bucket_state(s3_client, BUCKET_NAME)["exists"] is False
@@ -1,10 +1,30 @@
+import importlib
 import os
+import re
 import subprocess
+import sys
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from types import ModuleType
+from typing import Any
 
 import hcl2
 import pytest
 
+HCL_FILES = ("terragrunt.hcl", "account_details.hcl", "ous_accounts.tf")
+# Stored under .pytest_cache, so unchanged files are not parsed again on the next run. Running with
+# -p no:cacheprovider or --cache-clear parses everything afresh.
+HCL_CACHE_KEY = "infrastructure/parsed-hcl"
+# Below this many files the process pool costs more to start than the parsing it spreads out
+MIN_FILES_FOR_PROCESS_POOL = 8
+HCLFMT_CHECK_COMMAND = ["terragrunt", "hclfmt", "--check"]
+# "native" checks every file in-process with the setup scripts' formatter, which only starts terragrunt for files it
+# cannot handle. "tree" checks all of accounts/ with one terragrunt run. "per-account" runs one check per account
+# directory in a pool of INFRA_HCLFMT_WORKERS, for when a directory has to be checked in isolation.
+HCLFMT_MODE = os.environ.get("INFRA_HCLFMT_MODE", "native")
+HCLFMT_WORKERS = int(os.environ.get("INFRA_HCLFMT_WORKERS", str(os.cpu_count() or 1)))
+
 
 class AccountDirError(RuntimeError):
   MISSING_DIR = "accounts directory is missing"
@@ -16,6 +36,37 @@ def load_hcl_file(file_path: str | Path) -> dict:
     return hcl2.load(f)
 
 
+class HclCache:
+  # python-hcl2 parses with lark, which is slow, so each file is parsed once per session (or once until it
+  # changes, with the pytest cache) instead of once per test that reads it
+  def __init__(self, entries: dict[str, Any] | None = None) -> None:
+    self.entries: dict[str, Any] = entries or {}
+
+  @staticmethod
+  def mtime_ns(file_path: Path) -> int:
+    return file_path.stat().st_mtime_ns
+
+  def is_fresh(self, file_path: Path) -> bool:
+    entry = self.entries.get(str(file_path))
+    return entry is not None and entry.get("mtime_ns") == self.mtime_ns(file_path)
+
+  def warm(self, file_paths: Iterable[Path]) -> None:
+    stale = [file_path for file_path in file_paths if file_path.exists() and not self.is_fresh(file_path)]
+    if len(stale) < MIN_FILES_FOR_PROCESS_POOL:
+      trees = [load_hcl_file(file_path) for file_path in stale]
+    else:
+      with ProcessPoolExecutor() as executor:
+        trees = list(executor.map(load_hcl_file, stale))
+    for file_path, tree in zip(stale, trees, strict=True):
+      self.entries[str(file_path)] = {"mtime_ns": self.mtime_ns(file_path), "tree": tree}
+
+  def load(self, file_path: Path) -> dict:
+    if not self.is_fresh(file_path):
+      self.warm([file_path])
+    tree: dict = self.entries[str(file_path)]["tree"]
+    return tree
+
+
 def get_account_dirs() -> list[Path]:
   base_path = Path(__file__).parent / "accounts"
   if not base_path.exists() or not base_path.is_dir():
@@ -28,9 +79,22 @@ def get_account_dirs() -> list[Path]:
   return account_dirs
 
 
-def test_account_structure_consistency() -> None:
-  account_dirs = get_account_dirs()
+@pytest.fixture(scope="session")
+def account_dirs() -> list[Path]:
+  return get_account_dirs()
+
+
+@pytest.fixture(scope="session")
+def hcl_cache(request: pytest.FixtureRequest, account_dirs: list[Path]) -> Iterable[HclCache]:
+  pytest_cache = getattr(request.config, "cache", None)
+  cache = HclCache(pytest_cache.get(HCL_CACHE_KEY, None) if pytest_cache is not None else None)
+  cache.warm(account_dir / file_name for account_dir in account_dirs for file_name in HCL_FILES)
+  yield cache
+  if pytest_cache is not None:
+    pytest_cache.set(HCL_CACHE_KEY, cache.entries)
 
+
+def test_account_structure_consistency(account_dirs: list[Path]) -> None:
   required_files = [
     "account_details.hcl",
     "terragrunt.hcl",
@@ -44,25 +108,23 @@ def test_account_structure_consistency() -> None:
       assert file_path.exists(), f"{required_file} missing in {account_dir}"
 
 
-def test_backend_configuration() -> None:
-  account_dirs = get_account_dirs()
-
+def test_backend_configuration(account_dirs: list[Path], hcl_cache: HclCache) -> None:
   for account_dir in account_dirs:
     terragrunt_file = account_dir / "terragrunt.hcl"
-    config = load_hcl_file(terragrunt_file)
+    config = hcl_cache.load(terragrunt_file)
 
     assert "include" in config, f"Missing include block in {terragrunt_file}"
     include = config["include"][0]
     assert include["path"] == '${find_in_parent_folders("root.hcl")}'
 
 
-def test_organization_structure() -> None:
-  management_dirs = [d for d in get_account_dirs() if "ous_accounts.tf" in os.listdir(d)]
+def test_organization_structure(account_dirs: list[Path], hcl_cache: HclCache) -> None:
+  management_dirs = [d for d in account_dirs if "ous_accounts.tf" in os.listdir(d)]
   if not management_dirs:
     pytest.skip("No management account with ous_accounts.tf found")
 
   ous_file = management_dirs[0] / "ous_accounts.tf"
-  config = load_hcl_file(ous_file)
+  config = hcl_cache.load(ous_file)
 
   found_ous = set()
   for resource in config.get("resource", []):
@@ -73,12 +135,10 @@ def test_organization_structure() -> None:
   assert len(found_ous) > 0, "No Organization Units defined in ous_accounts.tf"
 
 
-def test_account_configuration() -> None:
-  account_dirs = get_account_dirs()
-
+def test_account_configuration(account_dirs: list[Path], hcl_cache: HclCache) -> None:
   for account_dir in account_dirs:
     account_details = account_dir / "account_details.hcl"
-    config = load_hcl_file(account_details)
+    config = hcl_cache.load(account_details)
 
     account_locals = config.get("locals", [{}])[0]
     assert "account_name" in account_locals, f"Account {account_dir} missing account_name"
@@ -90,18 +150,84 @@ def find_relative_path(target_file: str) -> str:
   return str(Path("..") / target_file)
 
 
-def test_terragrunt_validate() -> None:
-  account_dirs = get_account_dirs()
+def run_hclfmt_check(working_dir: Path) -> subprocess.CompletedProcess[str]:
+  return subprocess.run(
+    HCLFMT_CHECK_COMMAND,
+    cwd=working_dir,
+    capture_output=True,
+    text=True,
+    check=False,
+  )
+
+
+def failing_account_dirs(output: str, account_dirs: list[Path]) -> dict[Path, str]:
+  # terragrunt names each badly formatted file, so every line of its output is attributed to the account
+  # directory in that file's path
+  failures: dict[Path, list[str]] = {}
+  for line in output.splitlines():
+    for account_dir in account_dirs:
+      if re.search(rf"(?:^|[\s/\\\"']){re.escape(account_dir.name)}[/\\]", line):
+        failures.setdefault(account_dir, []).append(line)
+  return {account_dir: "\n".join(lines) for account_dir, lines in failures.items()}
+
+
+def load_native_hclfmt() -> ModuleType:
+  setup_scripts_path = str(Path(__file__).parent / "setup-scripts")
+  if setup_scripts_path not in sys.path:
+    sys.path.append(setup_scripts_path)
+  return importlib.import_module("utils.hclfmt")
+
 
+def native_hclfmt_failures(account_dirs: list[Path]) -> dict[Path, str]:
+  hclfmt = load_native_hclfmt()
+  failures: dict[Path, str] = {}
   for account_dir in account_dirs:
-    result = subprocess.run(
-      ["terragrunt", "hclfmt", "--check"],
-      cwd=account_dir,
-      capture_output=True,
-      text=True,
-      check=False,
-    )
-    assert result.returncode == 0, f"Terragrunt format check failed in {account_dir}:\\n{result.stderr}"
+    results = hclfmt.format_tree(str(account_dir), check=True)
+    messages = [
+      f"{result['path']} is not formatted ({result['formatter']})"
+      if result["error"] is None
+      else f"{result['path']}: {result['error']}"
+      for result in results
+      if result["changed"] or result["error"]
+    ]
+    if messages:
+      failures[account_dir] = "\n".join(messages)
+  return failures
+
+
+def hclfmt_failures(account_dirs: list[Path]) -> dict[Path, str]:
+  if HCLFMT_MODE == "native":
+    return native_hclfmt_failures(account_dirs)
+  if HCLFMT_MODE == "per-account":
+    with ThreadPoolExecutor(max_workers=HCLFMT_WORKERS) as executor:
+      results = dict(zip(account_dirs, executor.map(run_hclfmt_check, account_dirs), strict=True))
+    return {account_dir: result.stderr for account_dir, result in results.items() if result.returncode != 0}
+
+  accounts_dir = account_dirs[0].parent
+  result = run_hclfmt_check(accounts_dir)
+  if result.returncode == 0:
+    return {}
+  # Errors that name no account, like a terragrunt crash, are reported against accounts/ as a whole
+  return failing_account_dirs(f"{result.stdout}\n{result.stderr}", account_dirs) or {accounts_dir: result.stderr}
+
+
+def test_failing_account_dirs_matches_whole_directory_names() -> None:
+  base_path = Path("/repo/accounts")
+  account_dirs = [base_path / "dev", base_path / "workloads-dev", base_path / "prod"]
+  output = "ERROR invalid file format /repo/accounts/workloads-dev/terragrunt.hcl\nERROR prod/account_details.hcl"
+
+  assert failing_account_dirs(output, account_dirs) == {
+    base_path / "workloads-dev": "ERROR invalid file format /repo/accounts/workloads-dev/terragrunt.hcl",
+    base_path / "prod": "ERROR prod/account_details.hcl",
+  }
+
+
+def test_terragrunt_validate(account_dirs: list[Path]) -> None:
+  failures = hclfmt_failures(account_dirs)
+
+  assert not failures, "HCL format check failed in:\n" + "\n".join(
+    f"{account_dir}:\n{stderr}" for account_dir, stderr in failures.items()
+  )
 
 
 def test_accounts_directory() -> None: